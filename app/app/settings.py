@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -45,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,16 +84,107 @@ AUTH_USER_MODEL = 'core.User'
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
+# Connections stay open for DB_CONN_MAX_AGE seconds (0 closes them after
+# each request, empty never does) and with DB_CONN_HEALTH_CHECKS are
+# tested when a request first uses them, see core.database
+
+DB_CONN_MAX_AGE = os.environ.get('DB_CONN_MAX_AGE', '60')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(DB_CONN_MAX_AGE) if DB_CONN_MAX_AGE else None,
+        'CONN_HEALTH_CHECKS': bool(
+            int(os.environ.get('DB_CONN_HEALTH_CHECKS', 1))),
+    }
+}
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# Use a shared backend (e.g. memcached) when running several workers
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+RECIPE_CACHE_ALIAS = os.environ.get('RECIPE_CACHE_ALIAS', 'default')
+RECIPE_CACHE_TIMEOUT = int(os.environ.get('RECIPE_CACHE_TIMEOUT', 300))
+
+# Text search configuration used for recipe search on PostgreSQL
+RECIPE_SEARCH_CONFIG = os.environ.get('RECIPE_SEARCH_CONFIG', 'english')
+
+# Recipe image processing
+# 'thread' processes uploads in a pool inside the web process, 'worker'
+# leaves them to the process_images management command
+
+RECIPE_IMAGE_PROCESSING = os.environ.get('RECIPE_IMAGE_PROCESSING', 'thread')
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+# seconds after which an upload still processing is claimed again, as
+# its worker is assumed to have died
+RECIPE_IMAGE_PROCESSING_TIMEOUT = int(
+    os.environ.get('RECIPE_IMAGE_PROCESSING_TIMEOUT', 600))
+RECIPE_IMAGE_THUMBNAIL_SIZES = (128, 512)
+# 'uuid' stores every processed image under a new name, 'content' under
+# the hash of its bytes, shared and reference counted between recipes
+RECIPE_IMAGE_STORAGE = os.environ.get('RECIPE_IMAGE_STORAGE', 'uuid')
+
+# Build recipe list and detail responses from rows instead of running
+# the serializers on model instances
+RECIPE_ROW_SERIALIZATION = bool(
+    int(os.environ.get('RECIPE_ROW_SERIALIZATION', 1)))
+
+# Resumable uploads are assembled here before entering the pipeline
+RECIPE_UPLOAD_TEMP_DIR = os.environ.get(
+    'RECIPE_UPLOAD_TEMP_DIR', os.path.join(tempfile.gettempdir(), 'uploads'))
+RECIPE_UPLOAD_CHUNK_SIZE = int(
+    os.environ.get('RECIPE_UPLOAD_CHUNK_SIZE', 1024 * 1024))
+RECIPE_UPLOAD_MAX_SIZE = int(
+    os.environ.get('RECIPE_UPLOAD_MAX_SIZE', 20 * 1024 * 1024))
+RECIPE_UPLOAD_LIFETIME = int(
+    os.environ.get('RECIPE_UPLOAD_LIFETIME', 24 * 60 * 60))
+
+# Token authentication
+# 'db' looks every token up in the authtoken table, 'signed' issues
+# short-lived HMAC signed tokens verified without a database query; their
+# revocations are kept in AUTH_TOKEN_CACHE_ALIAS, which must be a cache
+# shared by every worker
+
+AUTH_TOKEN_MODE = os.environ.get('AUTH_TOKEN_MODE', 'db')
+AUTH_ACCESS_TOKEN_LIFETIME = int(
+    os.environ.get('AUTH_ACCESS_TOKEN_LIFETIME', 15 * 60))
+AUTH_REFRESH_TOKEN_LIFETIME = int(
+    os.environ.get('AUTH_REFRESH_TOKEN_LIFETIME', 14 * 24 * 60 * 60))
+AUTH_TOKEN_CACHE_ALIAS = os.environ.get('AUTH_TOKEN_CACHE_ALIAS', 'default')
+
+# Open database connections and load the url patterns and serializers
+# before app/wsgi.py or app/asgi.py serve the first request
+WARM_UP = bool(int(os.environ.get('WARM_UP', 1)))
+
+# Threads running the views of app/asgi.py, bodies are received and
+# responses sent without one
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 8))
+
+# Report request phases in a Server-Timing header and a log line
+SERVER_TIMING = bool(int(os.environ.get('SERVER_TIMING', 0)))
+
+# Request metrics served at /metrics/ to holders of METRICS_TOKEN.
+# Workers of one server share them through files in METRICS_DIR, which
+# should be emptied when the server starts; without it every process
+# reports its own requests only
+METRICS_ENABLED = bool(int(os.environ.get('METRICS_ENABLED', 1)))
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -132,3 +226,32 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
+
+# Media transfer delegated to the front proxy: '' streams files from
+# Django, 'x-accel-redirect' (nginx) redirects to the internal
+# MEDIA_ACCEL_LOCATION, 'x-sendfile' (Apache, lighttpd) names the file
+MEDIA_ACCEL = os.environ.get('MEDIA_ACCEL', '')
+MEDIA_ACCEL_LOCATION = os.environ.get('MEDIA_ACCEL_LOCATION',
+                                      '/protected-media/')
+MEDIA_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# JSON is encoded with orjson and MessagePack is offered to clients
+# sending or accepting application/msgpack
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.ORJSONParser',
+        'core.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'TEST_REQUEST_RENDERER_CLASSES': [
+        'rest_framework.renderers.MultiPartRenderer',
+        'rest_framework.renderers.JSONRenderer',
+        'core.renderers.MessagePackRenderer',
+    ],
+}
@@ -2,6 +2,9 @@
 WSGI config for app project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
+With WARM_UP the process connects to the database and loads the url
+patterns before serving, see core.warmup. Recipe images left pending by
+an earlier process are processed again, see recipe.images.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.0/howto/deployment/wsgi/
@@ -9,8 +12,17 @@ https://docs.djangoproject.com/en/3.0/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+from recipe import images  # noqa: E402
+
+images.resume()
+
+if settings.WARM_UP:
+    from core import warmup
+    warmup.warm_up()
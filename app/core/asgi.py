@@ -0,0 +1,127 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core import signals
+from django.core.exceptions import RequestAborted
+from django.core.handlers import asgi
+from django.db import close_old_connections
+from django.http import FileResponse
+from django.urls import set_script_prefix
+
+from core import warmup
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """Serve requests with views running on a bounded thread pool
+
+    Request bodies are received and responses sent by the event loop, so
+    slow clients hold no thread while they upload or download; only the
+    view and its response run on one of the `threads` (ASGI_THREADS)
+    threads, which also bound the database connections of the process.
+    Each request is started on its thread and its database connection
+    closed or kept there once the response is produced. Streaming
+    responses setting `uses_database`, whose content is read from a
+    cursor of that connection, keep their thread until sent; other
+    streams, such as files, are sent by the event loop.
+    """
+
+    def __init__(self, threads=None):
+        super().__init__()
+        self.threads = threads or settings.ASGI_THREADS
+        self.executor = ThreadPoolExecutor(self.threads,
+                                           thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            raise ValueError(
+                f'Django can only handle ASGI/HTTP connections, not '
+                f'{scope["type"]}.')
+        try:
+            body_file = await self.read_body(receive)
+        except RequestAborted:
+            return
+        set_script_prefix(self.get_script_prefix(scope))
+        loop = asyncio.get_event_loop()
+        response = await loop.run_in_executor(
+            self.executor, self.respond, scope, body_file, loop, send)
+        if response is None:
+            return
+        try:
+            await self.send_response(response, send)
+        finally:
+            if response.streaming:
+                response.close()
+
+    def respond(self, scope, body_file, loop, send):
+        """Run the request on a pool thread
+
+        A complete response is closed, ending the request, and returned
+        to be sent by the event loop, as is a stream not using the
+        database once the connections are released; a stream using the
+        database is sent from here.
+        """
+        signals.request_started.send(sender=self.__class__, scope=scope)
+        request, response = self.create_request(scope, body_file)
+        if request is not None:
+            response = self.get_response(request)
+            response._handler_class = self.__class__
+        if not response.streaming:
+            response.close()
+            return response
+        if isinstance(response, FileResponse):
+            response.block_size = self.chunk_size
+        if not getattr(response, 'uses_database', False):
+            # released as request_finished would on this thread, as the
+            # response only sends it from the event loop once closed
+            close_old_connections()
+            return response
+        try:
+            for message in self.messages(response):
+                asyncio.run_coroutine_threadsafe(
+                    send(message), loop).result()
+        finally:
+            response.close()
+
+    async def send_response(self, response, send):
+        for message in self.messages(response):
+            await send(message)
+
+    def messages(self, response):
+        """Yield the ASGI messages sending `response`"""
+        headers = [
+            (header.encode('ascii') if isinstance(header, str) else header,
+             value.encode('latin1') if isinstance(value, str) else value)
+            for header, value in response.items()
+        ]
+        headers.extend(
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+            for cookie in response.cookies.values())
+        yield {
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        }
+        if not response.streaming:
+            for chunk, last in self.chunk_bytes(response.content):
+                yield {'type': 'http.response.body', 'body': chunk,
+                       'more_body': not last}
+            return
+        for part in response:
+            for chunk, last in self.chunk_bytes(part):
+                yield {'type': 'http.response.body', 'body': chunk,
+                       'more_body': True}
+        yield {'type': 'http.response.body'}
+
+
+def get_asgi_application(threads=None):
+    """Set Django up and return the pooled ASGI handler
+
+    With WARM_UP the pool threads connect to the databases first.
+    """
+    django.setup(set_prefix=False)
+    handler = ASGIHandler(threads)
+    if settings.WARM_UP:
+        warmup.warm_up(handler.executor, handler.threads)
+    return handler
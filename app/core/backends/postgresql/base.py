@@ -0,0 +1,7 @@
+from django.db.backends.postgresql import base
+
+from core.database import HealthCheckMixin
+
+
+class DatabaseWrapper(HealthCheckMixin, base.DatabaseWrapper):
+    """PostgreSQL backend testing reused connections, see core.database"""
@@ -0,0 +1,664 @@
+import asyncio
+import http.client
+import io
+import json
+import math
+import random
+import statistics
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from socketserver import ThreadingMixIn
+from urllib.parse import unquote, urlencode, urlsplit
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.urls import reverse
+from PIL import Image
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.asgi import ASGIHandler
+from core.parsers import MessagePackParser, ORJSONParser
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+from recipe import imports, serializers
+
+DOMAIN = '@benchmark.test'
+EMAIL = 'bench{}' + DOMAIN
+PASSWORD = 'benchmarkpass'
+QUERY_COUNT_HEADER = 'X-Query-Count'
+# query count in the header of core.timing.ServerTimingMiddleware
+SERVER_TIMING_QUERIES = re.compile(r'\bdb;[^,]*desc="(\d+) queries"')
+PERCENTILES = (50, 95, 99)
+# (renderer, parser) pairs compared by compare_formats, default first
+FORMATS = (
+    (JSONRenderer, JSONParser),
+    (ORJSONRenderer, ORJSONParser),
+    (MessagePackRenderer, MessagePackParser),
+)
+
+
+def seed(users, recipes, tags, ingredients, links, seed=0):
+    """Create `users` benchmark users, each with the same sized library
+
+    Every recipe links `links` random tags and ingredients; the same
+    `seed` always produces the same data. Existing benchmark users are
+    replaced.
+    """
+    rng = random.Random(seed)
+    get_user_model().objects.filter(
+        email__endswith=DOMAIN).delete()
+    password = make_password(PASSWORD)
+    get_user_model().objects.bulk_create(
+        get_user_model()(email=EMAIL.format(i), name=f'bench {i}',
+                         password=password)
+        for i in range(users)
+    )
+    names = {
+        'tags': [f'tag {n}' for n in range(tags)],
+        'ingredients': [f'ingredient {n}' for n in range(ingredients)],
+    }
+    for i in range(users):
+        user = get_user_model().objects.get(email=EMAIL.format(i))
+        importer = imports.Importer(user)
+        for field, values in names.items():
+            importer.resolve(field, values)
+        rows = ((n, {
+            'title': f'recipe {n} of {user.name}',
+            'time_minutes': rng.randint(1, 240),
+            'price': f'{rng.uniform(1, 100):.2f}',
+            **{field: rng.sample(values, min(links, len(values)))
+               for field, values in names.items()},
+        }) for n in range(recipes))
+        for _ in importer.run(rows):
+            pass
+        yield user
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadedWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def counting_queries(application):
+    """Wrap a WSGI application to report its queries in a header
+
+    Only queries made before the response starts are counted, so the
+    count of a streamed response leaves out those of its body.
+    """
+    def counted(environ, start_response):
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        def start(status, headers, exc_info=None):
+            headers.append((QUERY_COUNT_HEADER, str(len(queries))))
+            return start_response(status, headers, exc_info)
+
+        with connection.execute_wrapper(count):
+            return application(environ, start)
+    return counted
+
+
+class PooledWSGIServer(ThreadingMixIn, WSGIServer):
+    """WSGI server handling connections on a fixed number of threads"""
+
+    def __init__(self, address, handler_class, threads):
+        super().__init__(address, handler_class)
+        self.executor = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request,
+                             client_address)
+
+
+def serve(threads=None):
+    """Start the project on a free local port, returning the server
+
+    Every connection gets a thread, or waits for one of `threads`.
+    """
+    application = counting_queries(get_wsgi_application())
+    if threads is None:
+        server = make_server('localhost', 0, application,
+                             server_class=ThreadedWSGIServer,
+                             handler_class=QuietHandler)
+    else:
+        server = PooledWSGIServer(('localhost', 0), QuietHandler, threads)
+        server.set_app(application)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class ASGIServer:
+    """HTTP/1.1 server of an ASGI application, on its own event loop
+
+    Just enough of a server to measure the application: every
+    connection carries one request with a Content-Length body and is
+    closed after the response.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+        threading.Thread(target=self.run, args=(started,),
+                         daemon=True).start()
+        started.wait()
+
+    def run(self, started):
+        asyncio.set_event_loop(self.loop)
+        server = self.loop.run_until_complete(asyncio.start_server(
+            self.handle, 'localhost', 0, backlog=1024))
+        self.server_port = server.sockets[0].getsockname()[1]
+        started.set()
+        self.loop.run_forever()
+
+    def shutdown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+        request_line, *lines = head.decode('latin1').split('\r\n')
+        method, target, version = request_line.split(' ', 2)
+        headers = [
+            (name.strip().lower().encode('latin1'),
+             value.strip().encode('latin1'))
+            for name, value in (line.split(':', 1) for line in lines if line)
+        ]
+        remaining = int(dict(headers).get(b'content-length', 0))
+        path, _, query = target.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': unquote(path),
+            'raw_path': path.encode('latin1'),
+            'query_string': query.encode('latin1'),
+            'root_path': '',
+            'headers': headers,
+            'client': writer.get_extra_info('peername')[:2],
+            'server': writer.get_extra_info('sockname')[:2],
+        }
+
+        async def receive():
+            nonlocal remaining
+            body = await reader.read(min(remaining, 65536)) \
+                if remaining else b''
+            if remaining and not body:
+                return {'type': 'http.disconnect'}
+            remaining -= len(body)
+            return {'type': 'http.request', 'body': body,
+                    'more_body': remaining > 0}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                phrase = HTTPStatus(status).phrase \
+                    if status in HTTPStatus._value2member_map_ else ''
+                writer.write(
+                    f'HTTP/1.1 {status} {phrase}\r\n'.encode() +
+                    b''.join(name + b': ' + value + b'\r\n'
+                             for name, value in message['headers']) +
+                    b'Connection: close\r\n\r\n')
+            else:
+                writer.write(message.get('body', b''))
+            await writer.drain()
+
+        try:
+            await self.application(scope, receive, send)
+        finally:
+            writer.close()
+
+
+def serve_asgi(threads=None):
+    """Start the project under core.asgi on a free local port"""
+    return ASGIServer(ASGIHandler(threads))
+
+
+def multipart(field, name, data):
+    """Encode one file as a multipart body, returning its content type"""
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+        f'filename="{name}"\r\nContent-Type: application/octet-stream'
+        f'\r\n\r\n'
+    ).encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def sample_image():
+    buffer = io.BytesIO()
+    Image.effect_noise((64, 48), 32).convert('RGB').save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class Session:
+    """HTTP client keeping one connection per thread to a server"""
+
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        self.host = url.netloc
+        self.https = url.scheme == 'https'
+        self.local = threading.local()
+
+    def connection(self):
+        if getattr(self.local, 'connection', None) is None:
+            cls = (http.client.HTTPSConnection if self.https
+                   else http.client.HTTPConnection)
+            self.local.connection = cls(self.host, timeout=60)
+        return self.local.connection
+
+    def send(self, method, path, body=None, content_type=None, token=None):
+        """Perform a request, returning `(status, seconds, queries, data)`
+
+        `queries` is None unless the server reports its query count,
+        as the local server does or in a Server-Timing header.
+        """
+        headers = {'Accept': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Token {token}'
+        if body is not None and content_type is None:
+            body, content_type = json.dumps(body), 'application/json'
+        if content_type:
+            headers['Content-Type'] = content_type
+        started = time.perf_counter()
+        try:
+            conn = self.connection()
+            conn.request(method.upper(), path, body, headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.local.connection = None
+            raise
+        elapsed = time.perf_counter() - started
+        queries = response.getheader(QUERY_COUNT_HEADER)
+        if queries is None:
+            match = SERVER_TIMING_QUERIES.search(
+                response.getheader('Server-Timing', ''))
+            queries = match and match.group(1)
+        if response.getheader('Connection', '').lower() == 'close':
+            conn.close()
+            self.local.connection = None
+        return (response.status, elapsed,
+                int(queries) if queries is not None else None, data)
+
+    def json(self, method, path, body=None, token=None):
+        """Perform an untimed request, returning its decoded JSON"""
+        status, elapsed, queries, data = self.send(method, path, body,
+                                                   token=token)
+        if status >= 400:
+            raise RuntimeError(f'{method.upper()} {path}: {status} {data}')
+        return json.loads(data) if data else None
+
+
+class Fixture:
+    """Logged in benchmark user with ids to address in requests"""
+
+    def __init__(self, session, email, rng):
+        self.session = session
+        self.email = email
+        self.rng = rng
+        auth = session.json('post', reverse('user:token'),
+                            {'email': email, 'password': PASSWORD})
+        self.token = auth['token']
+        self.refresh = auth.get('refresh')
+        self.ids = {
+            kind: [item['id'] for item in session.json(
+                'get', reverse(f'recipe:{kind}-list'),
+                token=self.token)['results']]
+            for kind in ('tag', 'ingredient', 'recipe')
+        }
+        self.image = sample_image()
+
+    def pick(self, kind, count=1):
+        ids = self.ids[kind]
+        return self.rng.sample(ids, min(count, len(ids)))
+
+    def recipe(self):
+        return self.pick('recipe')[0]
+
+    def recipe_data(self):
+        return {
+            'title': f'benchmark {uuid.uuid4().hex[:8]}',
+            'time_minutes': self.rng.randint(1, 240),
+            'price': '5.00',
+            'tags': self.pick('tag', 3),
+            'ingredients': self.pick('ingredient', 3),
+        }
+
+    def new_recipe(self):
+        return self.session.json('post', reverse('recipe:recipe-list'),
+                                 self.recipe_data(), self.token)['id']
+
+    def new_upload(self, complete=False):
+        recipe = self.recipe()
+        upload = self.session.json(
+            'post', reverse('recipe:recipe-upload-start', args=[recipe]),
+            {'file_name': 'benchmark.jpg', 'size': len(self.image)},
+            self.token)
+        if complete:
+            self.session.send(
+                'put', reverse('recipe:recipe-upload-chunk',
+                               args=[recipe, upload['id'], 0]),
+                self.image, 'application/octet-stream', self.token)
+        return [recipe, upload['id']]
+
+    def new_login(self):
+        """Return the token of a new user, to be spent on revocation"""
+        email = uuid.uuid4().hex[:12] + DOMAIN
+        self.session.json('post', reverse('user:create'), {
+            'email': email, 'password': PASSWORD, 'name': 'revoked'})
+        return self.session.json('post', reverse('user:token'), {
+            'email': email, 'password': PASSWORD})['token']
+
+
+def request(name, args=(), body=None, content_type=None, query=None,
+            token=True):
+    """Describe one request of a scenario"""
+    return {'name': name, 'args': list(args), 'body': body,
+            'content_type': content_type, 'query': query, 'token': token}
+
+
+# url name: [(method, builder of the request from a Fixture)]; every
+# url of recipe/urls.py and user/urls.py must be listed
+SCENARIOS = {
+    'recipe:api-root': [
+        ('get', lambda f: request('recipe:api-root')),
+    ],
+    'recipe:tag-list': [
+        ('get', lambda f: request('recipe:tag-list')),
+        ('post', lambda f: request('recipe:tag-list', body={
+            'name': f'tag {uuid.uuid4().hex[:8]}'})),
+    ],
+    'recipe:ingredient-list': [
+        ('get', lambda f: request('recipe:ingredient-list',
+                                  query={'assigned_only': 1})),
+        ('post', lambda f: request('recipe:ingredient-list', body={
+            'name': f'ingredient {uuid.uuid4().hex[:8]}'})),
+    ],
+    'recipe:tag-bulk': [
+        ('post', lambda f: request('recipe:tag-bulk', body=[
+            {'name': f'tag {uuid.uuid4().hex[:8]}'} for _ in range(5)])),
+    ],
+    'recipe:ingredient-bulk': [
+        ('post', lambda f: request('recipe:ingredient-bulk', body=[
+            {'name': f'ingredient {uuid.uuid4().hex[:8]}'}
+            for _ in range(5)])),
+    ],
+    'recipe:recipe-list': [
+        ('get', lambda f: request('recipe:recipe-list')),
+        ('get', lambda f: request('recipe:recipe-list', query={
+            'tags': ','.join(map(str, f.pick('tag', 2)))})),
+        ('get', lambda f: request('recipe:recipe-list', query={
+            'search': 'recipe'})),
+        ('post', lambda f: request('recipe:recipe-list',
+                                   body=f.recipe_data())),
+    ],
+    'recipe:recipe-bulk': [
+        ('post', lambda f: request('recipe:recipe-bulk', body=[
+            f.recipe_data() for _ in range(5)])),
+    ],
+    'recipe:recipe-detail': [
+        ('get', lambda f: request('recipe:recipe-detail', [f.recipe()])),
+        ('patch', lambda f: request('recipe:recipe-detail', [f.recipe()],
+                                    {'title': 'patched'})),
+        ('put', lambda f: request('recipe:recipe-detail', [f.recipe()],
+                                  f.recipe_data())),
+        ('delete', lambda f: request('recipe:recipe-detail',
+                                     [f.new_recipe()])),
+    ],
+    'recipe:recipe-export': [
+        ('get', lambda f: request('recipe:recipe-export')),
+    ],
+    'recipe:recipe-upload-image': [
+        ('post', lambda f: request(
+            'recipe:recipe-upload-image', [f.recipe()],
+            *multipart('image', 'benchmark.jpg', f.image))),
+    ],
+    'recipe:recipe-upload-start': [
+        ('post', lambda f: request(
+            'recipe:recipe-upload-start', [f.recipe()],
+            {'file_name': 'benchmark.jpg', 'size': len(f.image)})),
+    ],
+    'recipe:recipe-upload': [
+        ('get', lambda f: request('recipe:recipe-upload', f.new_upload())),
+    ],
+    'recipe:recipe-upload-chunk': [
+        ('put', lambda f: request(
+            'recipe:recipe-upload-chunk', f.new_upload() + [0], f.image,
+            'application/octet-stream')),
+    ],
+    'recipe:recipe-upload-finalize': [
+        ('post', lambda f: request('recipe:recipe-upload-finalize',
+                                   f.new_upload(complete=True))),
+    ],
+    'user:create': [
+        ('post', lambda f: request('user:create', token=False, body={
+            'email': uuid.uuid4().hex[:12] + DOMAIN,
+            'password': PASSWORD, 'name': 'created'})),
+    ],
+    'user:token': [
+        ('post', lambda f: request('user:token', token=False, body={
+            'email': f.email, 'password': PASSWORD})),
+    ],
+    'user:token-refresh': [
+        # refresh tokens are only issued with AUTH_TOKEN_MODE = 'signed'
+        ('post', lambda f: f.refresh and request(
+            'user:token-refresh', token=False, body={'refresh': f.refresh})),
+    ],
+    'user:token-revoke': [
+        ('post', lambda f: request('user:token-revoke',
+                                   token=f.new_login())),
+    ],
+    'user:me': [
+        ('get', lambda f: request('user:me')),
+        ('patch', lambda f: request('user:me', body={'name': 'bench'})),
+    ],
+}
+
+
+def percentile(values, p):
+    """Return the nearest-rank `p` percentile of sorted `values`"""
+    if not values:
+        return None
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def summarize(results, wall):
+    """Aggregate `(status, seconds, queries)` results of one scenario"""
+    latencies = sorted(seconds * 1000 for status, seconds, queries in results)
+    queries = [queries for status, seconds, queries in results
+               if queries is not None]
+    summary = {
+        'requests': len(results),
+        'errors': sum(1 for status, seconds, queries in results
+                      if status >= 400),
+        'throughput': round(len(results) / wall, 1) if wall else None,
+        'mean_ms': round(sum(latencies) / len(latencies), 2)
+        if latencies else None,
+        'queries_mean': round(sum(queries) / len(queries), 2)
+        if queries else None,
+        'queries_max': max(queries) if queries else None,
+    }
+    for p in PERCENTILES:
+        value = percentile(latencies, p)
+        summary[f'p{p}_ms'] = round(value, 2) if value is not None else None
+    return summary
+
+
+class Runner:
+    """Drive every scenario concurrently with the benchmark users"""
+
+    def __init__(self, session, fixtures, requests=100, concurrency=8):
+        self.session = session
+        self.fixtures = fixtures
+        self.requests = requests
+        self.concurrency = concurrency
+
+    def run_scenario(self, method, build):
+        """Send the requests of one scenario, returning their summary"""
+        def one(index):
+            fixture = self.fixtures[index % len(self.fixtures)]
+            try:
+                spec = build(fixture)
+            except RuntimeError:
+                return False
+            if not spec:
+                return None
+            path = reverse(spec['name'], args=spec['args'])
+            if spec['query']:
+                path = f'{path}?{urlencode(spec["query"])}'
+            token = fixture.token if spec['token'] is True else spec['token']
+            return self.session.send(method, path, spec['body'],
+                                     spec['content_type'], token)[:3]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            results = list(executor.map(one, range(self.requests)))
+        wall = time.perf_counter() - started
+        if not any(results):
+            return {'skipped': True}
+        summary = summarize([result for result in results if result], wall)
+        # requests that could not be prepared, their setup request failed
+        summary['setup_errors'] = results.count(False)
+        return summary
+
+    def run(self, only=None):
+        """Run the scenarios of every url, or of the `only` url names"""
+        report = {}
+        for name, cases in SCENARIOS.items():
+            if only and name not in only:
+                continue
+            for method, build in cases:
+                key = f'{method.upper()} {name}'
+                suffix = 2
+                while key in report:
+                    key = f'{method.upper()} {name} #{suffix}'
+                    suffix += 1
+                report[key] = self.run_scenario(method, build)
+                yield key, report[key]
+
+
+def recipe_payload(user, count, detail=False):
+    """Return `count` recipes of `user` serialized as the API lists them"""
+    serializer = (serializers.RecipeDetailSerializer if detail
+                  else serializers.RecipeSerializer)
+    recipes = serializer.select(user.recipes.order_by('-id'))[:count]
+    return serializer(recipes, many=True).data
+
+
+def compare_formats(data, repeat):
+    """Encode and decode `data` `repeat` times with every format
+
+    Each renderer is reported with its payload size and median encode
+    and decode times, both also relative to the first, default, one.
+    """
+    report = {}
+    for renderer_class, parser_class in FORMATS:
+        renderer, parser = renderer_class(), parser_class()
+        encode, decode = [], []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            content = renderer.render(data, renderer.media_type)
+            encode.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            parser.parse(io.BytesIO(content), renderer.media_type)
+            decode.append(time.perf_counter() - started)
+        report[renderer_class.__name__] = {
+            'media_type': renderer.media_type,
+            'bytes': len(content),
+            'encode_ms': round(statistics.median(encode) * 1000, 3),
+            'decode_ms': round(statistics.median(decode) * 1000, 3),
+        }
+    default = next(iter(report.values()))
+    for summary in report.values():
+        summary['size_ratio'] = round(summary['bytes'] / default['bytes'], 3)
+        summary['encode_speedup'] = round(
+            default['encode_ms'] / summary['encode_ms'], 2) \
+            if summary['encode_ms'] else None
+    return report
+
+
+def slow_upload(url, token, size, seconds):
+    """Create a tag with a `size` byte body trickled over `seconds`
+
+    Returns the response status, or None when the connection failed.
+    """
+    name = f'slow {uuid.uuid4().hex[:8]}'
+    body = json.dumps({'name': name}).encode().ljust(size)
+    steps = 20
+    step = -(-len(body) // steps)
+
+    def trickle():
+        for start in range(0, len(body), step):
+            yield body[start:start + step]
+            time.sleep(seconds / steps)
+
+    conn = http.client.HTTPConnection(urlsplit(url).netloc,
+                                      timeout=seconds + 60)
+    try:
+        conn.request('POST', reverse('recipe:tag-list'), trickle(), {
+            'Authorization': f'Token {token}',
+            'Content-Type': 'application/json',
+            'Content-Length': str(len(body)),
+        })
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    except (OSError, http.client.HTTPException):
+        return None
+    finally:
+        conn.close()
+
+
+def measure_serving(url, fixtures, slow, seconds, requests, concurrency):
+    """Time recipe lists served while `slow` clients trickle uploads
+
+    The summary of the list requests also counts the slow uploads that
+    failed; with fewer server threads than slow clients a thread per
+    connection server only answers lists once uploads complete.
+    """
+    session = Session(url)
+    with ThreadPoolExecutor(max(slow, 1)) as uploads:
+        statuses = [
+            uploads.submit(slow_upload, url,
+                           fixtures[i % len(fixtures)].token, 4096, seconds)
+            for i in range(slow)
+        ]
+        # let every slow client connect and start sending
+        time.sleep(min(seconds / 4, 0.5))
+
+        def one(index):
+            fixture = fixtures[index % len(fixtures)]
+            return session.send('get', reverse('recipe:recipe-list'),
+                                token=fixture.token)[:3]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(one, range(requests)))
+        wall = time.perf_counter() - started
+        statuses = [future.result() for future in statuses]
+    summary = summarize(results, wall)
+    summary['slow_clients'] = slow
+    summary['slow_errors'] = sum(1 for status in statuses
+                                 if status is None or status >= 400)
+    return summary
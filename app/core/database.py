@@ -0,0 +1,48 @@
+from django.core.signals import request_started
+from django.db import connections
+from django.db.utils import OperationalError
+from django.dispatch import receiver
+
+
+def ping(connection):
+    """Run a trivial query, raising OperationalError if the database is down
+
+    A failed connection is closed, so the next ping connects again.
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except OperationalError:
+        connection.close()
+        raise
+
+
+class HealthCheckMixin:
+    """Test a persistent connection when a request first uses it
+
+    For databases with CONN_HEALTH_CHECKS, as in later Django versions:
+    `request_started` flags the connections kept from earlier requests,
+    and the first cursor or transaction of the request tests its
+    connection, reconnecting if it stopped working after a database
+    restart or a proxy dropped it. Requests that never use the database
+    pay nothing; connections inside a transaction are left alone.
+    """
+    health_check_pending = False
+
+    def ensure_connection(self):
+        if self.health_check_pending:
+            self.health_check_pending = False
+            if self.connection is not None \
+                    and not self.in_atomic_block \
+                    and not self.is_usable():
+                self.close()
+        super().ensure_connection()
+
+
+@receiver(request_started)
+def flag_connections(**kwargs):
+    """Have the connections kept from earlier requests tested on use"""
+    for connection in connections.all():
+        if connection.settings_dict.get('CONN_HEALTH_CHECKS') \
+                and connection.connection is not None:
+            connection.health_check_pending = True
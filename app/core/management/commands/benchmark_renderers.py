@@ -0,0 +1,53 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    """Django command to compare the response formats of the API"""
+
+    help = ('Encode and decode a page of seeded recipes with the default '
+            'JSON renderer, orjson and MessagePack, reporting payload '
+            'sizes and median times')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, default=0,
+                            help='Seeded benchmark user whose recipes to '
+                                 'encode')
+        parser.add_argument('--recipes', type=int, default=100)
+        parser.add_argument('--detail', action='store_true',
+                            help='Encode recipe details with nested tags '
+                                 'and ingredients')
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--output', help='Write the JSON report here')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        email = benchmark.EMAIL.format(options['user'])
+        try:
+            user = get_user_model().objects.get(email=email)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'Run seed_benchmark first ({email} '
+                               f'does not exist)')
+        data = benchmark.recipe_payload(user, options['recipes'],
+                                        options['detail'])
+        report = benchmark.compare_formats(data, max(options['repeat'], 1))
+
+        self.stdout.write(f'{"renderer":<22}{"bytes":>10}{"size":>8}'
+                          f'{"encode ms":>11}{"speedup":>9}'
+                          f'{"decode ms":>11}')
+        for name, summary in report.items():
+            self.stdout.write(
+                f'{name:<22}{summary["bytes"]:>10}'
+                f'{summary["size_ratio"]:>8}{summary["encode_ms"]:>11}'
+                f'{summary["encode_speedup"]:>9}{summary["decode_ms"]:>11}')
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'recipes': len(data), 'detail': options['detail'],
+                           'formats': report}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Report written to {options["output"]}'))
@@ -0,0 +1,76 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark
+
+MODES = {
+    'wsgi': benchmark.serve,
+    'asgi': benchmark.serve_asgi,
+}
+
+
+class Command(BaseCommand):
+    """Django command to compare the WSGI and ASGI serving modes"""
+
+    help = ('Serve the project with THREADS threads under WSGI and under '
+            'core.asgi, and time recipe lists while SLOW clients trickle '
+            'uploads to each')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Server threads of both modes')
+        parser.add_argument('--slow', type=int, default=32,
+                            help='Clients uploading slowly meanwhile')
+        parser.add_argument('--seconds', type=float, default=2.0,
+                            help='Time each slow upload takes')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Recipe list requests to time')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--users', type=int, default=4,
+                            help='Seeded users to spread requests over')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report here')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        self.stdout.write(f'{"mode":<8}{"p50 ms":>10}{"p95 ms":>10}'
+                          f'{"p99 ms":>10}{"req/s":>8}{"errors":>8}'
+                          f'{"slow errors":>13}')
+        report = {}
+        for mode, serve in MODES.items():
+            server = serve(options['threads'])
+            try:
+                report[mode] = self.measure(server, options)
+            finally:
+                server.shutdown()
+            summary = report[mode]
+            self.stdout.write(
+                f'{mode:<8}{summary["p50_ms"]:>10}{summary["p95_ms"]:>10}'
+                f'{summary["p99_ms"]:>10}{summary["throughput"]:>8}'
+                f'{summary["errors"]:>8}{summary["slow_errors"]:>13}')
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'options': {
+                    name: options[name] for name in (
+                        'threads', 'slow', 'seconds', 'requests',
+                        'concurrency')
+                }, 'modes': report}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Report written to {options["output"]}'))
+
+    def measure(self, server, options):
+        url = f'http://localhost:{server.server_port}'
+        session = benchmark.Session(url)
+        rng = random.Random(options['seed'])
+        try:
+            fixtures = [benchmark.Fixture(session,
+                                          benchmark.EMAIL.format(i), rng)
+                        for i in range(max(options['users'], 1))]
+        except RuntimeError as error:
+            raise CommandError(f'Run seed_benchmark first ({error})')
+        return benchmark.measure_serving(
+            url, fixtures, options['slow'], options['seconds'],
+            options['requests'], options['concurrency'])
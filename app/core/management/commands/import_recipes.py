@@ -0,0 +1,58 @@
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe import imports
+
+
+class Command(BaseCommand):
+    """Django command to load recipes from a JSON lines or CSV file"""
+
+    help = ('Import recipes of a user from JSON lines or CSV, creating the '
+            'tags and ingredients they name')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or '-' for stdin")
+        parser.add_argument('--user', required=True,
+                            help='Email of the user owning the recipes')
+        parser.add_argument('--format', choices=('jsonl', 'csv'),
+                            help='Input format, by default from the suffix')
+        parser.add_argument('--batch-size', type=int,
+                            default=imports.BATCH_SIZE)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        try:
+            user = get_user_model().objects.using(
+                options['database']).get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["user"]}')
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.endswith('.csv')
+                                    else 'jsonl')
+        read = imports.read_csv if fmt == 'csv' else imports.read_jsonl
+
+        importer = imports.Importer(user, options['database'])
+        started = time.monotonic()
+        stream = sys.stdin if path == '-' else open(path, newline='',
+                                                    encoding='utf-8')
+        try:
+            for imported in importer.run(read(stream),
+                                         max(options['batch_size'], 1)):
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{imported} recipes imported...')
+        except imports.RowError as error:
+            raise CommandError(
+                f'{error} ({importer.imported} recipes imported)')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        elapsed = time.monotonic() - started
+        rate = importer.imported / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {importer.imported} recipes in {elapsed:.1f}s '
+            f'({rate:.0f} rows/s)'))
@@ -0,0 +1,67 @@
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from recipe import images
+
+
+class Command(BaseCommand):
+    """Django command to run the recipe image processing workers"""
+
+    help = 'Verify, clean and resize uploaded recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=settings.RECIPE_IMAGE_WORKERS)
+        parser.add_argument('--processes', action='store_true',
+                            help='Run workers as processes, not threads')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no upload is pending')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to wait when nothing is pending')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        workers = max(options['workers'], 1)
+        kind = 'processes' if options['processes'] else 'threads'
+        self.stdout.write(f'Starting {workers} image worker {kind}...')
+        args = (options['once'], options['interval'])
+        if options['processes']:
+            self.run_processes(workers, args)
+        else:
+            self.run_threads(workers, args)
+        self.stdout.write(self.style.SUCCESS('Image workers stopped'))
+
+    def run_threads(self, workers, args):
+        stop = threading.Event()
+        with ThreadPoolExecutor(workers) as executor:
+            futures = [executor.submit(images.run_worker, *args, stop)
+                       for _ in range(workers)]
+            try:
+                wait(futures)
+            except KeyboardInterrupt:
+                stop.set()
+            processed = sum(future.result() for future in futures)
+        self.stdout.write(f'Processed {processed} images')
+
+    def run_processes(self, workers, args):
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        # forked workers must not share the parent's connections
+        connections.close_all()
+        pool = [context.Process(target=images.run_worker,
+                                args=(*args, stop))
+                for _ in range(workers)]
+        for process in pool:
+            process.start()
+        try:
+            for process in pool:
+                process.join()
+        except KeyboardInterrupt:
+            stop.set()
+            for process in pool:
+                process.join()
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Ingredient, Tag
+from recipe import counters
+
+
+class Command(BaseCommand):
+    """Django command to recompute tag and ingredient recipe counts"""
+
+    help = 'Fix recipe_count values that drifted from the recipe links'
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        for model in (Tag, Ingredient):
+            fixed = counters.recount(model)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {fixed} repaired')
+        self.stdout.write(self.style.SUCCESS('Recipe counts repaired!'))
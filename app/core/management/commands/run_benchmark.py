@@ -0,0 +1,92 @@
+import json
+import platform
+import random
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    """Django command to measure the latency of every API endpoint"""
+
+    help = ('Drive every recipe and user endpoint concurrently as the '
+            'seeded benchmark users, reporting latency percentiles, '
+            'throughput and queries per request')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url',
+                            help='Server to measure; by default the project '
+                                 'is served locally for the run')
+        parser.add_argument('--users', type=int, default=10,
+                            help='Seeded users to spread requests over')
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Requests per endpoint and method')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--only', nargs='+', metavar='URL_NAME',
+                            help='Measure these url names only')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report here')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        server = None
+        url = options['url']
+        if not url:
+            server = benchmark.serve()
+            url = f'http://localhost:{server.server_port}'
+        try:
+            report = self.measure(url, options)
+        finally:
+            if server is not None:
+                server.shutdown()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Report written to {options["output"]}'))
+
+    def measure(self, url, options):
+        session = benchmark.Session(url)
+        rng = random.Random(options['seed'])
+        try:
+            fixtures = [benchmark.Fixture(session,
+                                          benchmark.EMAIL.format(i), rng)
+                        for i in range(max(options['users'], 1))]
+        except RuntimeError as error:
+            raise CommandError(f'Run seed_benchmark first ({error})')
+        runner = benchmark.Runner(session, fixtures, options['requests'],
+                                  options['concurrency'])
+
+        self.stdout.write(f'{"endpoint":<42}{"p50 ms":>10}{"p95 ms":>10}'
+                          f'{"p99 ms":>10}{"req/s":>8}{"queries":>9}'
+                          f'{"errors":>8}')
+        endpoints = {}
+        for key, summary in runner.run(options['only']):
+            endpoints[key] = summary
+            if summary.get('skipped'):
+                self.stdout.write(f'{key:<42}{"skipped":>10}')
+                continue
+            queries = summary['queries_mean']
+            self.stdout.write(
+                f'{key:<42}{summary["p50_ms"]:>10}{summary["p95_ms"]:>10}'
+                f'{summary["p99_ms"]:>10}{summary["throughput"]:>8}'
+                f'{"-" if queries is None else queries:>9}'
+                f'{summary["errors"]:>8}')
+        return {
+            'meta': {
+                'date': timezone.now().isoformat(),
+                'url': url if options['url'] else 'local',
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'users': len(fixtures),
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+            },
+            'endpoints': endpoints,
+        }
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    """Django command to create the data set measured by run_benchmark"""
+
+    help = ('Replace the benchmark users with USERS users each owning '
+            'the given number of recipes, tags and ingredients')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--recipes', type=int, default=1000,
+                            help='Recipes per user')
+        parser.add_argument('--tags', type=int, default=50,
+                            help='Tags per user')
+        parser.add_argument('--ingredients', type=int, default=200,
+                            help='Ingredients per user')
+        parser.add_argument('--links', type=int, default=5,
+                            help='Tags and ingredients per recipe')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        started = time.monotonic()
+        for user in benchmark.seed(options['users'], options['recipes'],
+                                   options['tags'], options['ingredients'],
+                                   options['links'], options['seed']):
+            self.stdout.write(f'Seeded {user.email}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Benchmark data ready in {time.monotonic() - started:.1f}s'))
@@ -1,22 +1,49 @@
 import time
 
-from django.db import connections
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+
+from core import database
 
 
 class Command(BaseCommand):
     """Django command to pause execution until database is available"""
 
+    help = ('Query the database until it answers, waiting twice as long '
+            'after each failure, and fail after TIMEOUT seconds')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--timeout', type=float, default=60,
+                            help='Seconds to wait before giving up')
+        parser.add_argument('--delay', type=float, default=0.1,
+                            help='Seconds to wait after the first failure')
+        parser.add_argument('--max-delay', type=float, default=5,
+                            help='Longest wait between two attempts')
+
     def handle(self, *args, **options):
         """Handle the command"""
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
+        # a connection of its own, leaving none open behind
+        connection = connections[options['database']].copy()
+        deadline = time.monotonic() + options['timeout']
+        delay = options['delay']
+        while True:
             try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+                database.ping(connection)
+                break
+            except OperationalError as error:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f'Database unavailable after {options["timeout"]:g} '
+                        f'seconds: {error}')
+                delay = min(delay, remaining)
+                self.stdout.write(
+                    f'Database unavailable, waiting {delay:.1f} seconds...')
+                time.sleep(delay)
+                delay = min(delay * 2, options['max_delay'])
+        connection.close()
 
         self.stdout.write(self.style.SUCCESS('Database available!'))
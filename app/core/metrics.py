@@ -0,0 +1,271 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# upper bounds, in seconds, of the request duration histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+           float('inf'))
+# request methods reported as they are, any other one is reported as
+# 'other' so clients cannot add series at will
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE',
+                     'OPTIONS', 'TRACE', 'CONNECT'))
+
+# name: (type, help)
+METRICS = {
+    'api_requests_total': (
+        'counter', 'Requests handled, by view and action'),
+    'api_request_errors_total': (
+        'counter', 'Requests answered with an error status'),
+    'api_request_duration_seconds': (
+        'histogram', 'Time spent handling requests'),
+}
+
+
+class MemoryStore:
+    """Values of a single process, kept in a dict"""
+
+    def __init__(self):
+        self.values = defaultdict(float)
+        self.lock = threading.Lock()
+
+    def inc(self, key, amount=1.0):
+        with self.lock:
+            self.values[key] += amount
+
+    def items(self):
+        with self.lock:
+            return list(self.values.items())
+
+
+class FileStore:
+    """Values of one process in a memory mapped file
+
+    The file starts with the number of bytes in use, followed by entries
+    of a key length, the UTF-8 key padded to 8 bytes and a double. Keys
+    are only ever appended, and the length is updated once the entry is
+    complete, so other processes can read the file at any time.
+    """
+    INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, 'a+b')
+        size = max(os.fstat(self.file.fileno()).st_size, self.INITIAL_SIZE)
+        self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.used = struct.unpack_from('q', self.map, 0)[0] or 8
+        self.positions = {key: position for key, position, value
+                          in entries(self.map, self.used)}
+
+    def inc(self, key, amount=1.0):
+        with self.lock:
+            position = self.positions.get(key)
+            if position is None:
+                position = self.add(key)
+            value = struct.unpack_from('d', self.map, position)[0]
+            struct.pack_into('d', self.map, position, value + amount)
+
+    def add(self, key):
+        encoded = key.encode()
+        padded = len(encoded) + (-(len(encoded) + 4) % 8)
+        entry = struct.pack(f'=i{padded}sd', len(encoded), encoded, 0.0)
+        while self.used + len(entry) > len(self.map):
+            self.map.close()
+            self.file.truncate(os.fstat(self.file.fileno()).st_size * 2)
+            self.map = mmap.mmap(self.file.fileno(), 0)
+        self.map[self.used:self.used + len(entry)] = entry
+        self.used += len(entry)
+        struct.pack_into('q', self.map, 0, self.used)
+        self.positions[key] = self.used - 8
+        return self.used - 8
+
+    def items(self):
+        with self.lock:
+            return [(key, value) for key, position, value
+                    in entries(self.map, self.used)]
+
+
+def entries(data, used):
+    """Yield `(key, value position, value)` of the entries of a store"""
+    position = 8
+    while position < used:
+        length = struct.unpack_from('i', data, position)[0]
+        start = position + 4
+        key = bytes(data[start:start + length]).decode()
+        position = start + length + (-(length + 4) % 8)
+        yield key, position, struct.unpack_from('d', data, position)[0]
+        position += 8
+
+
+def read_file(path):
+    """Return the `(key, value)` pairs stored by any process in `path`"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < 8:
+        return []
+    used = min(struct.unpack_from('q', data, 0)[0], len(data))
+    return [(key, value) for key, position, value in entries(data, used)]
+
+
+_store = None
+_store_pid = None
+_store_lock = threading.Lock()
+
+
+def store():
+    """Return the store of the current process
+
+    With METRICS_DIR set every process writes its own file there, so a
+    process forked by the server starts a new one.
+    """
+    global _store, _store_pid
+    if _store is None or _store_pid != os.getpid():
+        with _store_lock:
+            if _store is None or _store_pid != os.getpid():
+                if settings.METRICS_DIR:
+                    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+                    _store = FileStore(os.path.join(
+                        settings.METRICS_DIR, f'{os.getpid()}.db'))
+                else:
+                    _store = MemoryStore()
+                _store_pid = os.getpid()
+    return _store
+
+
+def key(name, labels):
+    return json.dumps([name, sorted(labels.items())])
+
+
+def observe(view, action, method, status, seconds):
+    """Record one handled request"""
+    labels = {'view': view, 'action': action, 'method': method}
+    current = store()
+    current.inc(key('api_requests_total', labels))
+    if status >= 400:
+        current.inc(key('api_request_errors_total',
+                        {**labels, 'status': str(status)}))
+    name = 'api_request_duration_seconds'
+    bucket = next(le for le in BUCKETS if seconds <= le)
+    current.inc(key(f'{name}_bucket', {**labels, 'le': bucket}))
+    current.inc(key(f'{name}_sum', labels), seconds)
+    current.inc(key(f'{name}_count', labels))
+
+
+def collect():
+    """Sum the values recorded by every process"""
+    totals = defaultdict(float)
+    if settings.METRICS_DIR and os.path.isdir(settings.METRICS_DIR):
+        for entry in os.scandir(settings.METRICS_DIR):
+            if entry.name.endswith('.db'):
+                for name, value in read_file(entry.path):
+                    totals[name] += value
+    else:
+        for name, value in store().items():
+            totals[name] += value
+    return totals
+
+
+def format_labels(labels):
+    def escape(value):
+        return (str(value).replace('\\', r'\\').replace('"', r'\"')
+                .replace('\n', r'\n'))
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format"""
+    samples = defaultdict(list)
+    for sample, value in collect().items():
+        name, labels = json.loads(sample)
+        samples[name].append((labels, value))
+
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind != 'histogram':
+            for labels, value in sorted(samples[name]):
+                lines.append(f'{name}{{{format_labels(labels)}}} '
+                             f'{format_value(value)}')
+            continue
+        # buckets are stored apart and reported cumulatively
+        buckets = defaultdict(dict)
+        for labels, value in samples[f'{name}_bucket']:
+            series = tuple(tuple(label) for label in labels
+                           if label[0] != 'le')
+            le = dict(labels)['le']
+            buckets[series][le] = value
+        sums = {tuple(map(tuple, labels)): value
+                for labels, value in samples[f'{name}_sum']}
+        for labels, count in sorted(samples[f'{name}_count']):
+            series = tuple(map(tuple, labels))
+            cumulative = 0.0
+            for le in BUCKETS:
+                cumulative += buckets[series].get(le, 0.0)
+                bucket_labels = format_labels(
+                    series + (('le', format_value(le)),))
+                lines.append(f'{name}_bucket{{{bucket_labels}}} '
+                             f'{format_value(cumulative)}')
+            lines.append(f'{name}_sum{{{format_labels(series)}}} '
+                         f'{format_value(sums.get(series, 0.0))}')
+            lines.append(f'{name}_count{{{format_labels(series)}}} '
+                         f'{format_value(count)}')
+    return '\n'.join(lines) + '\n'
+
+
+def method_label(method):
+    """Return the label of a request method"""
+    return method if method in METHODS else 'other'
+
+
+def view_labels(request):
+    """Return the view and action names of a resolved request
+
+    Viewsets are named by class and action, API views by class and
+    handler, and function views by function.
+    """
+    match = request.resolver_match
+    if match is None:
+        return '', ''
+    cls = getattr(match.func, 'cls', None)
+    if cls is None:
+        return match.func.__name__, ''
+    actions = getattr(match.func, 'actions', None) or {}
+    method = method_label(request.method).lower()
+    return cls.__name__, actions.get(method, method)
+
+
+class MetricsMiddleware:
+    """Count requests and errors and time them, by view and action
+
+    The metrics are served by `core.views.metrics`. With METRICS_ENABLED
+    off the middleware removes itself at startup.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        view, action = view_labels(request)
+        observe(view, action, method_label(request.method),
+                response.status_code, time.perf_counter() - started)
+        return response
@@ -0,0 +1,50 @@
+# Generated by Django 3.0.3 on 2026-10-17 00:57
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def populate_search_vectors(apps, schema_editor):
+    """Build the search document of existing recipes"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    config = settings.RECIPE_SEARCH_CONFIG
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE core_recipe r SET search_vector =
+                setweight(to_tsvector(%s::regconfig, r.title), 'A') ||
+                setweight(to_tsvector(%s::regconfig, coalesce((
+                    SELECT string_agg(t.name, ' ') FROM core_tag t
+                    JOIN core_recipe_tags rt ON rt.tag_id = t.id
+                    WHERE rt.recipe_id = r.id), '')), 'B') ||
+                setweight(to_tsvector(%s::regconfig, coalesce((
+                    SELECT string_agg(i.name, ' ') FROM core_ingredient i
+                    JOIN core_recipe_ingredients ri ON ri.ingredient_id = i.id
+                    WHERE ri.recipe_id = r.id), '')), 'B')
+            """,
+            [config, config, config]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_user_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='core_recipe_search_idx'),
+        ),
+        migrations.RunPython(populate_search_vectors,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.0.3 on 2026-10-17 01:13
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_recipe_counts(apps, schema_editor):
+    """Count the recipes already linked to each tag and ingredient"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for field in ('tags', 'ingredients'):
+        through = getattr(Recipe, field).through
+        related = Recipe._meta.get_field(field).m2m_reverse_field_name()
+        model = Recipe._meta.get_field(field).related_model
+        model.objects.update(recipe_count=Coalesce(Subquery(
+            through.objects.filter(**{related: OuterRef('pk')})
+            .values(related)
+            .annotate(recipes=Count('pk'))
+            .values('recipes'),
+            output_field=IntegerField()
+        ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_attr_user_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_recipe_counts,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.0.3 on 2026-10-17 01:18
+
+import core.models
+from django.db import migrations, models
+
+
+def mark_existing_images(apps, schema_editor):
+    """Images uploaded before processing existed are served as they are"""
+    Recipe = apps.get_model('core', 'Recipe')
+    Recipe.objects.exclude(image='').exclude(image__isnull=True).update(
+        image_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_attr_recipe_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('', 'No image'), ('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_upload',
+            field=models.FileField(blank=True, editable=False, null=True, upload_to=core.models.recipe_upload_file_path),
+        ),
+        migrations.RunPython(mark_existing_images,
+                             migrations.RunPython.noop),
+    ]
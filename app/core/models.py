@@ -1,5 +1,7 @@
 from django.contrib.auth.models import (AbstractBaseUser, BaseUserManager,
                                         PermissionsMixin)
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 from django.conf import settings
@@ -14,6 +16,19 @@ def recipe_image_file_path(instance, file_name):
     return os.path.join('uploads/recipe', file_name)
 
 
+def recipe_upload_file_path(instance, file_name):
+    """Generate the name of an upload waiting to be processed"""
+    ext = file_name.split('.')[-1]
+    return os.path.join('uploads/pending', f'{uuid.uuid4()}.{ext}')
+
+
+def bump_data_version(user_id):
+    """Atomically increment the data version of a user"""
+    User.objects.filter(pk=user_id).update(
+        data_version=models.F('data_version') + 1
+    )
+
+
 class UserManager(BaseUserManager):
 
     def create_user(self, email, password=None, **extra_fields):
@@ -42,34 +57,79 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # bumped on every write to the user's recipes, tags and ingredients
+    data_version = models.BigIntegerField(default=0)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
 
-class Tag(models.Model):
+class RecipeCountMixin:
+    """Keep saves of loaded objects from overwriting `recipe_count`
+
+    The count is maintained by signals with atomic updates, so the value
+    held by an instance may be stale.
+    """
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'recipe_count'
+            ]
+        super().save(*args, **kwargs)
+
+
+class Tag(RecipeCountMixin, models.Model):
     """Tag model"""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              related_name='tags',
-                             on_delete=models.CASCADE)
+                             on_delete=models.CASCADE,
+                             db_index=False)
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        # also serves lookups by user, replacing the foreign key index
+        indexes = [
+            models.Index(fields=['user', '-name', 'id'],
+                         name='core_tag_user_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(RecipeCountMixin, models.Model):
     """Ingredient model"""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              related_name='ingredients',
-                             on_delete=models.CASCADE)
+                             on_delete=models.CASCADE,
+                             db_index=False)
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        # also serves lookups by user, replacing the foreign key index
+        indexes = [
+            models.Index(fields=['user', '-name', 'id'],
+                         name='core_ingredient_user_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class ImageStatus(models.TextChoices):
+    """Processing state of a recipe image"""
+    NONE = '', _('No image')
+    PENDING = 'pending', _('Pending')
+    PROCESSING = 'processing', _('Processing')
+    READY = 'ready', _('Ready')
+    FAILED = 'failed', _('Failed')
+
+
 class Recipe(models.Model):
     """Recipe object"""
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
@@ -84,6 +144,53 @@ class Recipe(models.Model):
     tags = models.ManyToManyField('Tag')
     image = models.ImageField(null=True, blank=True,
                               upload_to=recipe_image_file_path)
+    # raw upload, replaced by `image` once recipe.images processed it
+    image_upload = models.FileField(null=True, blank=True, editable=False,
+                                    upload_to=recipe_upload_file_path)
+    image_status = models.CharField(max_length=10, blank=True,
+                                    choices=ImageStatus.choices,
+                                    default=ImageStatus.NONE)
+    # when recipe.images last claimed the upload for processing
+    image_claimed_at = models.DateTimeField(null=True, blank=True,
+                                            editable=False)
+    # title, tag and ingredient names, maintained by recipe.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='core_recipe_search_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class ImageUpload(models.Model):
+    """Resumable upload of a recipe image, received in numbered chunks"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4,
+                          editable=False)
+    recipe = models.ForeignKey('Recipe', related_name='image_uploads',
+                               on_delete=models.CASCADE)
+    file_name = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    # bytes received and acknowledged so far
+    offset = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def path(self):
+        """Location of the partially assembled file"""
+        return os.path.join(settings.RECIPE_UPLOAD_TEMP_DIR, f'{self.pk}.part')
+
+    def __str__(self):
+        return self.file_name
+
+
+class ImageBlob(models.Model):
+    """Content addressed image file shared by the recipes showing it"""
+    name = models.CharField(max_length=255, unique=True)
+    references = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
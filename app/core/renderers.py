@@ -0,0 +1,43 @@
+import msgpack
+import orjson
+from rest_framework import renderers
+
+# options making orjson encode like JSONRenderer: datetimes are left to
+# the encoder class and keys of other types than strings are allowed
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """Render compact JSON with orjson
+
+    Values orjson does not know, datetimes included, are converted by
+    DRF's encoder, so the output is the same as JSONRenderer's. Indented
+    or ASCII-only output, as the browsable API asks for, is left to
+    JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if data is None or indent or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        ret = orjson.dumps(data, default=self.encoder_class().default,
+                           option=ORJSON_OPTIONS)
+        # escaped like JSONRenderer so the output is valid javascript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """Render MessagePack, converting other values as JSON would"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    encoder_class = renderers.JSONRenderer.encoder_class
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=self.encoder_class().default,
+                             use_bin_type=True)
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core import benchmark
+from core.asgi import ASGIHandler
+from core.models import Recipe, Tag
+
+
+def call(handler, method, path, body=b'', chunk_size=None, query=b''):
+    """Run one request through `handler`, returning the sent messages"""
+    token = Token.objects.get()
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body),
+                                                    chunk_size)] \
+        if chunk_size and body else [body]
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query,
+        'server': ('testserver', 80),
+        'headers': [(b'authorization', f'Token {token.key}'.encode()),
+                    (b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode())],
+    }
+    messages = []
+
+    async def receive():
+        body = chunks.pop(0)
+        return {'type': 'http.request', 'body': body,
+                'more_body': bool(chunks)}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(handler(scope, receive, send))
+    return messages
+
+
+def content(messages):
+    return b''.join(message.get('body', b'') for message in messages[1:])
+
+
+class ASGIHandlerTest(TransactionTestCase):
+    """Test requests served with views on the pooled threads"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='asgi@test.com',
+            password='asgipass'
+        )
+        Token.objects.create(user=self.user)
+        self.handler = ASGIHandler(threads=2)
+        self.threads = []
+        request_finished.connect(self.finished)
+
+    def tearDown(self):
+        request_finished.disconnect(self.finished)
+        self.handler.executor.shutdown()
+
+    def finished(self, **kwargs):
+        self.threads.append(threading.current_thread().name)
+
+    def test_pool_size(self):
+        """Test the pool has ASGI_THREADS threads unless told otherwise"""
+        with override_settings(ASGI_THREADS=3):
+            handler = ASGIHandler()
+
+        self.assertEqual(handler.threads, 3)
+        self.assertEqual(handler.executor._max_workers, 3)
+        self.assertEqual(self.handler.executor._max_workers, 2)
+
+    def test_get(self):
+        """Test a response is produced and finished on a pool thread"""
+        Recipe.objects.create(user=self.user, title='async',
+                              time_minutes=5, price=5)
+
+        messages = call(self.handler, 'GET', reverse('recipe:recipe-list'))
+
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertFalse(messages[-1]['more_body'])
+        data = json.loads(content(messages))
+        self.assertEqual(data['results'][0]['title'], 'async')
+        self.assertEqual(len(self.threads), 1)
+        self.assertTrue(self.threads[0].startswith('asgi'))
+
+    def test_post_in_chunks(self):
+        """Test a body received in several messages is handled whole"""
+        body = json.dumps({'name': 'Chunked'}).encode()
+
+        messages = call(self.handler, 'POST', reverse('recipe:tag-list'),
+                        body, chunk_size=3)
+
+        self.assertEqual(messages[0]['status'], 201)
+        self.assertTrue(Tag.objects.filter(name='Chunked').exists())
+
+    def test_streaming(self):
+        """Test streams read from the database are sent from a pool thread"""
+        for i in range(3):
+            Recipe.objects.create(user=self.user, title=f'stream {i}',
+                                  time_minutes=5, price=5)
+
+        messages = call(self.handler, 'GET',
+                        reverse('recipe:recipe-export'))
+
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(messages[-1], {'type': 'http.response.body'})
+        self.assertEqual(len(content(messages).splitlines()), 3)
+        self.assertTrue(self.threads[0].startswith('asgi'))
+
+    def test_file_sent_by_event_loop(self):
+        """Test files are streamed without holding a pool thread"""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with open(os.path.join(media_root, 'photo.jpg'), 'wb') as f:
+            f.write(b'x' * 100000)
+
+        with override_settings(MEDIA_ROOT=media_root, MEDIA_ACCEL=''):
+            messages = call(self.handler, 'GET',
+                            reverse('media', args=['photo.jpg']))
+
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(content(messages), b'x' * 100000)
+        self.assertEqual(set(self.threads), {threading.main_thread().name})
+
+    def test_not_http(self):
+        """Test other connection types are refused"""
+        with self.assertRaises(ValueError):
+            asyncio.run(self.handler({'type': 'websocket'}, None, None))
+
+    def test_server(self):
+        """Test the benchmark server answers over a socket"""
+        server = benchmark.serve_asgi(threads=2)
+        self.addCleanup(server.shutdown)
+        session = benchmark.Session(f'http://localhost:{server.server_port}')
+
+        status, seconds, queries, data = session.send(
+            'get', reverse('recipe:recipe-list'),
+            token=Token.objects.get().key)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(data)['results'], [])
@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase
+
+from core import benchmark
+from core.models import Recipe, Tag
+from core.tests.test_query_budget import url_names
+from recipe import urls as recipe_urls
+from user import urls as user_urls
+
+
+class BenchmarkTest(TestCase):
+    """Test the data set and measurements of the benchmark suite"""
+
+    def test_every_endpoint_has_scenario(self):
+        """Test that no url is left out of the benchmark"""
+        names = set(url_names(recipe_urls.urlpatterns, 'recipe'))
+        names |= set(url_names(user_urls.urlpatterns, 'user'))
+
+        self.assertEqual(names, set(benchmark.SCENARIOS))
+
+    def seed(self, seed=0):
+        return [user.email for user in
+                benchmark.seed(2, 5, 4, 6, links=2, seed=seed)]
+
+    def test_seed(self):
+        """Test every user gets a library of the requested size"""
+        emails = self.seed()
+
+        self.assertEqual(emails, ['bench0@benchmark.test',
+                                  'bench1@benchmark.test'])
+        for email in emails:
+            user = get_user_model().objects.get(email=email)
+            self.assertTrue(user.check_password(benchmark.PASSWORD))
+            self.assertEqual(user.recipes.count(), 5)
+            self.assertEqual(user.tags.count(), 4)
+            self.assertEqual(user.ingredients.count(), 6)
+            self.assertEqual(user.tags.aggregate(
+                links=Sum('recipe_count'))['links'], 10)
+
+    def test_seed_reproducible(self):
+        """Test seeding again replaces the data with the same data"""
+        self.seed()
+        first = list(Recipe.objects.order_by('title').values_list(
+            'title', 'time_minutes', 'price'))
+
+        self.seed()
+
+        self.assertEqual(first, list(Recipe.objects.order_by(
+            'title').values_list('title', 'time_minutes', 'price')))
+        self.assertEqual(Tag.objects.count(), 8)
+
+    def test_summarize(self):
+        """Test latency percentiles, errors and queries are reported"""
+        results = [(200, n / 1000, 3) for n in range(1, 100)]
+        results.append((500, 0.1, None))
+
+        summary = benchmark.summarize(results, wall=2)
+
+        self.assertEqual(summary['requests'], 100)
+        self.assertEqual(summary['errors'], 1)
+        self.assertEqual(summary['throughput'], 50)
+        self.assertEqual(summary['p50_ms'], 50)
+        self.assertEqual(summary['p95_ms'], 95)
+        self.assertEqual(summary['p99_ms'], 99)
+        self.assertEqual(summary['queries_max'], 3)
+
+    def test_counting_queries(self):
+        """Test the local server reports the queries of each request"""
+        def application(environ, start_response):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            start_response('200 OK', [])
+            return [b'']
+        headers = []
+
+        benchmark.counting_queries(application)(
+            {}, lambda status, sent, exc_info=None: headers.extend(sent))
+
+        self.assertEqual(headers, [(benchmark.QUERY_COUNT_HEADER, '1')])
+
+    def test_compare_formats(self):
+        """Test every format is measured against the default renderer"""
+        self.seed()
+        user = get_user_model().objects.get(email='bench0@benchmark.test')
+        data = benchmark.recipe_payload(user, 3, detail=True)
+
+        report = benchmark.compare_formats(data, repeat=2)
+
+        self.assertEqual(len(data), 3)
+        self.assertEqual(list(report), ['JSONRenderer', 'ORJSONRenderer',
+                                        'MessagePackRenderer'])
+        self.assertEqual(report['JSONRenderer']['size_ratio'], 1)
+        self.assertEqual(report['ORJSONRenderer']['bytes'],
+                         report['JSONRenderer']['bytes'])
+        self.assertLess(report['MessagePackRenderer']['bytes'],
+                        report['JSONRenderer']['bytes'])
@@ -1,6 +1,8 @@
+from io import StringIO
 from unittest.mock import patch
 
-from django.core.management import call_command
+from django.core.management import CommandError, call_command
+from django.db.backends.utils import CursorWrapper
 from django.db.utils import OperationalError
 from django.test import TestCase
 
@@ -10,16 +12,45 @@ class CommandsTestCase(TestCase):
     def test_wait_for_db_ready(self):
         """Test waiting for db when db is available"""
 
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
+        with patch('core.database.ping') as ping:
+            ping.return_value = None
             call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+            self.assertEqual(ping.call_count, 1)
 
     @patch('time.sleep', return_value=None)
     def test_wait_for_db(self, ts):
         """Test waiting for db"""
 
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
+        with patch('core.database.ping') as ping:
+            ping.side_effect = [OperationalError] * 5 + [None]
             call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+            self.assertEqual(ping.call_count, 6)
+
+    def test_wait_for_db_queries(self):
+        """Test the database is actually queried"""
+        out = StringIO()
+        with patch.object(CursorWrapper, 'execute', autospec=True,
+                          side_effect=CursorWrapper.execute) as execute:
+            call_command('wait_for_db', stdout=out)
+
+        self.assertEqual(execute.call_count, 1)
+        self.assertEqual(execute.call_args[0][1], 'SELECT 1')
+        self.assertIn('Database available!', out.getvalue())
+
+    @patch('time.sleep', return_value=None)
+    def test_wait_for_db_backoff(self, ts):
+        """Test the wait doubles after each failure up to a maximum"""
+        with patch('core.database.ping') as ping:
+            ping.side_effect = [OperationalError] * 6 + [None]
+            call_command('wait_for_db', delay=0.5, max_delay=4)
+
+        self.assertEqual([call[0][0] for call in ts.call_args_list],
+                         [0.5, 1, 2, 4, 4, 4])
+
+    @patch('time.sleep', return_value=None)
+    def test_wait_for_db_timeout(self, ts):
+        """Test waiting stops with an error after the timeout"""
+        with patch('core.database.ping') as ping:
+            ping.side_effect = OperationalError('refused')
+            with self.assertRaisesMessage(CommandError, 'refused'):
+                call_command('wait_for_db', timeout=0)
@@ -0,0 +1,165 @@
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import skipUnless
+from unittest.mock import Mock, patch
+
+from django.db import connection
+from django.db.utils import OperationalError
+from django.test import TestCase
+
+from core import database, warmup
+from core.backends.postgresql.base import DatabaseWrapper
+from recipe.views import RecipeViewSet
+from user.views import ManageUserView
+
+
+class Wrapper:
+    """Stand-in for a database backend's connection wrapper"""
+    in_atomic_block = False
+
+    def __init__(self, usable=True):
+        self.connection = Mock()
+        self.usable = usable
+        self.ensured = 0
+
+    def is_usable(self):
+        return self.usable
+
+    def close(self):
+        self.connection = None
+
+    def ensure_connection(self):
+        self.ensured += 1
+        if self.connection is None:
+            self.connection = Mock()
+
+
+class CheckedWrapper(database.HealthCheckMixin, Wrapper):
+    pass
+
+
+class HealthCheckTest(TestCase):
+    """Test persistent connections are checked before reuse"""
+
+    def flagged(self, health_checks=True, open=True):
+        connection = Mock(
+            settings_dict={'CONN_HEALTH_CHECKS': health_checks},
+            connection=Mock() if open else None,
+            health_check_pending=False,
+        )
+        with patch('core.database.connections') as handler:
+            handler.all.return_value = [connection]
+            database.flag_connections()
+        return connection.health_check_pending
+
+    def test_kept_connections_flagged(self):
+        """Test only open connections with health checks are flagged"""
+        self.assertTrue(self.flagged())
+        self.assertFalse(self.flagged(health_checks=False))
+        self.assertFalse(self.flagged(open=False))
+
+    def test_unusable_reconnected(self):
+        """Test a broken connection is replaced on first use"""
+        connection = CheckedWrapper(usable=False)
+        broken = connection.connection
+        connection.health_check_pending = True
+
+        connection.ensure_connection()
+
+        self.assertIsNot(connection.connection, broken)
+        self.assertFalse(connection.health_check_pending)
+
+    def test_checked_once(self):
+        """Test a working connection is tested once, then reused"""
+        connection = CheckedWrapper()
+        kept = connection.connection
+        connection.health_check_pending = True
+
+        with patch.object(connection, 'is_usable',
+                          return_value=True) as is_usable:
+            connection.ensure_connection()
+            connection.ensure_connection()
+
+        is_usable.assert_called_once_with()
+        self.assertIs(connection.connection, kept)
+        self.assertEqual(connection.ensured, 2)
+
+    def test_not_checked(self):
+        """Test unflagged connections and transactions are not tested"""
+        connection = CheckedWrapper(usable=False)
+        connection.ensure_connection()
+        self.assertIsNotNone(connection.connection)
+
+        connection.health_check_pending = True
+        connection.in_atomic_block = True
+        connection.ensure_connection()
+        self.assertIsNotNone(connection.connection)
+
+    @skipUnless(connection.vendor == 'postgresql', 'requires PostgreSQL')
+    def test_terminated_connection_replaced(self):
+        """Test a connection the server dropped is replaced on first use"""
+        checked = DatabaseWrapper(
+            copy.deepcopy(connection.settings_dict), 'checked')
+        self.addCleanup(checked.close)
+        with checked.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            pid = cursor.fetchone()[0]
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+
+        checked.health_check_pending = True
+        with checked.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(cursor.fetchone(), (1,))
+
+    def test_ping_closes_failed_connection(self):
+        """Test a failed ping closes the connection to reconnect later"""
+        connection = Mock()
+        connection.cursor.side_effect = OperationalError
+
+        with self.assertRaises(OperationalError):
+            database.ping(connection)
+        connection.close.assert_called_once_with()
+
+
+class WarmUpTest(TestCase):
+    """Test the process is prepared before serving"""
+
+    def test_resolve_urls(self):
+        """Test every view of the url patterns is loaded"""
+        classes = {getattr(view, 'cls', None)
+                   for view in warmup.resolve_urls()}
+
+        self.assertIn(RecipeViewSet, classes)
+        self.assertIn(ManageUserView, classes)
+
+    def test_load_serializers(self):
+        """Test the serializer fields of the views are built"""
+        with patch.object(RecipeViewSet, 'serializer_class') as serializer:
+            warmup.load_serializers(warmup.resolve_urls())
+
+        serializer.assert_called_with()
+
+    def test_unavailable_logged(self):
+        """Test an unreachable database does not stop the warm-up"""
+        with patch('django.db.backends.base.base.BaseDatabaseWrapper.'
+                   'ensure_connection',
+                   side_effect=OperationalError('down')), \
+                self.assertLogs('core.warmup', 'WARNING') as logs:
+            warmup.warm_up()
+
+        self.assertIn('down', logs.output[0])
+
+    def test_pool_threads_connected(self):
+        """Test every thread of an executor connects"""
+        executor = ThreadPoolExecutor(2)
+        self.addCleanup(executor.shutdown)
+        threads = []
+
+        with patch('core.warmup.open_connections',
+                   side_effect=lambda: threads.append(
+                       threading.current_thread().name)):
+            warmup.warm_up(executor, 2)
+
+        self.assertEqual(len(set(threads)), 2)
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import tempfile
+import uuid
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+MEDIA_ROOT = tempfile.mkdtemp()
+CONTENT = bytes(range(256)) * 4
+
+
+def media_url(path):
+    return reverse('media', args=[path])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_ACCEL='')
+class MediaViewTest(TestCase):
+    """Test serving uploaded media files"""
+
+    def setUp(self):
+        self.name = f'uploads/recipe/{uuid.uuid4()}.jpg'
+        self.path = os.path.join(MEDIA_ROOT, self.name)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'wb') as f:
+            f.write(CONTENT)
+        self.mtime = os.stat(self.path).st_mtime
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_serve_file(self):
+        """Test a whole file is sent with validators and range support"""
+        res = self.client.get(media_url(self.name))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertEqual(res['Last-Modified'], http_date(self.mtime))
+
+    def test_unique_names_immutable(self):
+        """Test uuid and content hash named files are cached forever"""
+        thumbnail = self.name.replace('.jpg', '_128.jpg')
+        blob = f'uploads/recipe/{hashlib.sha256(CONTENT).hexdigest()}.jpg'
+        for name in (thumbnail, blob):
+            with open(os.path.join(MEDIA_ROOT, name), 'wb') as f:
+                f.write(CONTENT)
+            self.addCleanup(os.remove, os.path.join(MEDIA_ROOT, name))
+
+        for name in (self.name, thumbnail, blob):
+            res = self.client.get(media_url(name))
+            # reading the file closes the response within the request
+            b''.join(res.streaming_content)
+
+            self.assertIn('immutable', res['Cache-Control'])
+            self.assertIn('max-age=31536000', res['Cache-Control'])
+
+    def test_other_names_revalidated(self):
+        """Test files without a unique name are revalidated"""
+        path = os.path.join(MEDIA_ROOT, 'logo.png')
+        with open(path, 'wb') as f:
+            f.write(CONTENT)
+        self.addCleanup(os.remove, path)
+
+        res = self.client.get(media_url('logo.png'))
+        b''.join(res.streaming_content)
+
+        self.assertEqual(res['Cache-Control'], 'public, no-cache')
+
+    def test_range(self):
+        """Test a single byte range is answered with partial content"""
+        res = self.client.get(media_url(self.name), HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT[10:20])
+        self.assertEqual(res['Content-Range'], f'bytes 10-19/{len(CONTENT)}')
+        self.assertEqual(res['Content-Length'], '10')
+
+    def test_suffix_and_open_ranges(self):
+        """Test ranges counted from the end or open ended"""
+        suffix = self.client.get(media_url(self.name),
+                                 HTTP_RANGE='bytes=-5')
+        tail = self.client.get(media_url(self.name),
+                               HTTP_RANGE='bytes=1020-')
+
+        self.assertEqual(b''.join(suffix.streaming_content), CONTENT[-5:])
+        self.assertEqual(b''.join(tail.streaming_content), CONTENT[1020:])
+
+    def test_unsatisfiable_range(self):
+        """Test a range beyond the file is refused"""
+        res = self.client.get(media_url(self.name),
+                              HTTP_RANGE='bytes=5000-')
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_stale_if_range_sends_whole_file(self):
+        """Test a range conditional on another version is ignored"""
+        res = self.client.get(media_url(self.name),
+                              HTTP_RANGE='bytes=0-9',
+                              HTTP_IF_RANGE=http_date(self.mtime - 60))
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_not_modified(self):
+        """Test If-Modified-Since is answered without the content"""
+        res = self.client.get(media_url(self.name),
+                              HTTP_IF_MODIFIED_SINCE=http_date(self.mtime))
+
+        self.assertEqual(res.status_code, 304)
+        self.assertIn('immutable', res['Cache-Control'])
+
+    def test_missing_and_outside_files(self):
+        """Test unknown files and paths outside MEDIA_ROOT are not found"""
+        for path in ('uploads/missing.jpg', '../etc/passwd', 'uploads'):
+            res = self.client.get(media_url(path))
+
+            self.assertEqual(res.status_code, 404)
+
+    def test_only_safe_methods(self):
+        """Test files cannot be posted to"""
+        res = self.client.post(media_url(self.name))
+
+        self.assertEqual(res.status_code, 405)
+
+    @override_settings(MEDIA_ACCEL='x-accel-redirect')
+    def test_x_accel_redirect(self):
+        """Test nginx is told to send the file from its internal location"""
+        res = self.client.get(media_url(self.name))
+
+        self.assertEqual(res['X-Accel-Redirect'],
+                         f'/protected-media/{self.name}')
+        self.assertEqual(res.content, b'')
+        self.assertIn('immutable', res['Cache-Control'])
+
+    @override_settings(MEDIA_ACCEL='x-sendfile')
+    def test_x_sendfile(self):
+        """Test the front server is given the file path"""
+        res = self.client.get(media_url(self.name))
+
+        self.assertEqual(res['X-Sendfile'], self.path)
+        self.assertEqual(res.content, b'')
@@ -0,0 +1,158 @@
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import Recipe
+
+METRICS_URL = reverse('metrics')
+
+
+@override_settings(METRICS_TOKEN='scrape-secret')
+class MetricsTest(TestCase):
+    """Test the request metrics and their endpoint"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='metrics@test.com',
+            password='metricspass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def scrape(self):
+        res = APIClient().get(METRICS_URL,
+                              HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], metrics.CONTENT_TYPE)
+        return {line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+                for line in res.content.decode().splitlines()
+                if not line.startswith('#')}
+
+    def test_requests_by_view_and_action(self):
+        """Test requests are counted and timed per viewset action"""
+        before = self.scrape()
+        recipe = Recipe.objects.create(user=self.user, title='counted',
+                                       time_minutes=5, price=5)
+        self.client.get(reverse('recipe:recipe-list'))
+        self.client.get(reverse('recipe:recipe-list'))
+        self.client.post(reverse('recipe:recipe-upload-image',
+                                 args=[recipe.id]), {})
+
+        samples = self.scrape()
+
+        def grown(sample):
+            return samples.get(sample, 0) - before.get(sample, 0)
+        labels = 'action="list",method="GET",view="RecipeViewSet"'
+        self.assertEqual(grown(f'api_requests_total{{{labels}}}'), 2)
+        self.assertEqual(
+            grown(f'api_request_duration_seconds_count{{{labels}}}'), 2)
+        self.assertEqual(grown(
+            f'api_request_duration_seconds_bucket{{{labels},le="+Inf"}}'), 2)
+        self.assertGreater(
+            grown(f'api_request_duration_seconds_sum{{{labels}}}'), 0)
+        self.assertEqual(grown(
+            'api_request_errors_total{action="upload_image",method="POST",'
+            'status="400",view="RecipeViewSet"}'), 1)
+
+    def test_api_views_named_by_handler(self):
+        """Test plain API views are labelled with their class"""
+        APIClient().post(reverse('user:token'), {})
+
+        self.assertIn(
+            'api_requests_total{action="post",method="POST",'
+            'view="CreateTokenView"}', self.scrape())
+
+    def test_unknown_methods_grouped(self):
+        """Test made up request methods share a single series"""
+        for method in ('FOO1', 'FOO2', 'FOO3'):
+            self.client.generic(method, reverse('recipe:recipe-list'))
+
+        samples = self.scrape()
+
+        self.assertEqual(samples[
+            'api_requests_total{action="other",method="other",'
+            'view="RecipeViewSet"}'], 3)
+        self.assertFalse([sample for sample in samples if 'FOO' in sample
+                          or 'foo' in sample])
+
+    def test_histogram_cumulative(self):
+        """Test bucket counts include every faster request"""
+        for seconds in (0.001, 0.2, 20):
+            metrics.observe('HistogramView', '', 'GET', 200, seconds)
+
+        samples = self.scrape()
+
+        labels = 'action="",method="GET",view="HistogramView"'
+        bucket = f'api_request_duration_seconds_bucket{{{labels},le='
+        self.assertEqual(samples[bucket + '"0.005"}'], 1)
+        self.assertEqual(samples[bucket + '"0.25"}'], 2)
+        self.assertEqual(samples[bucket + '"10.0"}'], 2)
+        self.assertEqual(samples[bucket + '"+Inf"}'], 3)
+
+    def test_endpoint_protected(self):
+        """Test metrics need the scrape token or a staff user"""
+        anonymous = APIClient().get(METRICS_URL)
+        wrong = APIClient().get(METRICS_URL,
+                                HTTP_AUTHORIZATION='Bearer guess')
+        staff = get_user_model().objects.create_superuser(
+            'staff@test.com', 'staffpass')
+        client = APIClient()
+        client.force_login(staff)
+
+        self.assertEqual(anonymous.status_code, 403)
+        self.assertEqual(wrong.status_code, 403)
+        self.assertEqual(client.get(METRICS_URL).status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_no_token_configured(self):
+        """Test an empty token never grants access"""
+        res = APIClient().get(METRICS_URL, HTTP_AUTHORIZATION='Bearer ')
+
+        self.assertEqual(res.status_code, 403)
+
+
+class FileStoreTest(TestCase):
+    """Test sharing metrics between processes through files"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def path(self, pid):
+        return os.path.join(self.directory, f'{pid}.db')
+
+    def test_processes_aggregated(self):
+        """Test the values written by every process are summed"""
+        first = metrics.FileStore(self.path(1))
+        second = metrics.FileStore(self.path(2))
+        key = metrics.key('api_requests_total', {'view': 'V'})
+        first.inc(key)
+        second.inc(key, 2)
+        second.inc(metrics.key('api_requests_total', {'view': 'W'}))
+
+        with override_settings(METRICS_DIR=self.directory):
+            totals = metrics.collect()
+
+        self.assertEqual(totals[key], 3)
+        self.assertEqual(len(totals), 2)
+
+    def test_store_grows_and_reopens(self):
+        """Test a full file is enlarged and values survive reopening"""
+        store = metrics.FileStore(self.path(1))
+        keys = [metrics.key('api_requests_total', {'view': 'V' * 100 + str(i)})
+                for i in range(1000)]
+        for i, key in enumerate(keys):
+            store.inc(key, i)
+
+        reopened = metrics.FileStore(self.path(1))
+        reopened.inc(keys[-1])
+
+        self.assertGreater(os.path.getsize(self.path(1)),
+                           metrics.FileStore.INITIAL_SIZE)
+        self.assertEqual(dict(metrics.read_file(self.path(1)))[keys[-1]],
+                         1000)
+        self.assertEqual(dict(reopened.items())[keys[10]], 10)
@@ -0,0 +1,249 @@
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from recipe import uploads, urls as recipe_urls
+from user import tokens, urls as user_urls
+
+
+def url_names(patterns, namespace):
+    """Yield the namespaced name of every url pattern"""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from url_names(pattern.url_patterns, namespace)
+        elif pattern.name:
+            yield f'{namespace}:{pattern.name}'
+
+
+def sample_image():
+    """Return an open temporary jpeg file"""
+    ntf = tempfile.NamedTemporaryFile(suffix='.jpg')
+    Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+    ntf.seek(0)
+    return ntf
+
+
+class QueryBudgetTest(TestCase):
+    """Assert the maximum number of queries issued by every endpoint
+
+    Every url in recipe/urls.py and user/urls.py must have an entry in
+    BUDGETS; each entry is exercised against a small and a large data set
+    so an N+1 pattern fails either the budget or the growth check.
+    """
+
+    # url name: (method, needs recipe id or url args builder,
+    #            payload builder, max queries)
+    BUDGETS = {
+        'recipe:api-root': [('get', False, None, 0)],
+        'recipe:tag-list': [
+            ('get', False, None, 2),
+            ('post', False, lambda t: {'name': 'new tag'}, 2),
+        ],
+        'recipe:ingredient-list': [
+            ('get', False, None, 2),
+            ('post', False, lambda t: {'name': 'new ingredient'}, 2),
+        ],
+        'recipe:recipe-list': [
+            ('get', False, None, 4),
+            ('post', False, lambda t: {
+                'title': 'new recipe',
+                'time_minutes': 5,
+                'price': '5.00',
+                'tags': [t.tags[0].id, t.tags[1].id],
+                'ingredients': [t.ingredients[0].id],
+            }, 17),
+        ],
+        'recipe:recipe-detail': [
+            ('get', True, None, 4),
+            ('patch', True, lambda t: {'title': 'patched'}, 8),
+            ('put', True, lambda t: {
+                'title': 'replaced',
+                'time_minutes': 5,
+                'price': '5.00',
+                'tags': [t.tags[0].id],
+                'ingredients': [],
+            }, 19),
+            ('delete', True, None, 12),
+        ],
+        'recipe:tag-bulk': [
+            ('post', False, lambda t: [{'name': 'a'}, {'name': 'b'}], 6),
+            ('patch', False, lambda t: [
+                {'id': t.tags[0].id, 'name': 'a'},
+                {'id': t.tags[1].id, 'name': 'b'},
+            ], 8),
+        ],
+        'recipe:ingredient-bulk': [
+            ('post', False, lambda t: [{'name': 'a'}, {'name': 'b'}], 6),
+            ('patch', False, lambda t: [
+                {'id': t.ingredients[0].id, 'name': 'a'},
+                {'id': t.ingredients[1].id, 'name': 'b'},
+            ], 8),
+        ],
+        'recipe:recipe-bulk': [
+            ('post', False, lambda t: [{
+                'title': f'bulk {i}',
+                'time_minutes': 5,
+                'price': '5.00',
+                'tags': [t.tags[0].id, t.tags[1].id],
+                'ingredients': [t.ingredients[0].id],
+            } for i in range(2)], 14),
+            ('patch', False, lambda t: [{
+                'id': recipe.id,
+                'title': 'bulk patched',
+                'tags': [t.tags[0].id],
+            } for recipe in t.recipes[:2]], 14),
+        ],
+        'recipe:recipe-export': [('get', False, None, 3)],
+        'recipe:recipe-upload-image': [
+            ('post', True, lambda t: {'image': sample_image()}, 6),
+        ],
+        'recipe:recipe-upload-start': [
+            ('post', True, lambda t: {'file_name': 'a.jpg', 'size': 100}, 5),
+        ],
+        'recipe:recipe-upload': [
+            ('get', lambda t: [t.recipes[-1].id, t.image_upload().pk],
+             None, 4),
+        ],
+        'recipe:recipe-upload-chunk': [
+            ('put', lambda t: [t.recipes[-1].id, t.image_upload().pk, 0],
+             lambda t: t.upload_data, 5),
+        ],
+        'recipe:recipe-upload-finalize': [
+            ('post', lambda t: [t.recipes[-1].id,
+                                t.image_upload(complete=True).pk],
+             None, 8),
+        ],
+        'user:create': [
+            ('post', False, lambda t: {
+                'email': f'budget{len(t.recipes)}@test.com',
+                'password': 'budgetpass',
+                'name': 'budget',
+            }, 2),
+        ],
+        'user:token': [
+            ('post', False, lambda t: {
+                'email': t.user.email,
+                'password': 'budgetpass',
+            }, 5),
+        ],
+        'user:token-refresh': [
+            ('post', False, lambda t: {
+                'refresh': tokens.issue_pair(t.user.pk)['refresh'],
+            }, 1),
+        ],
+        'user:token-revoke': [('post', False, None, 0)],
+        'user:me': [
+            ('get', False, None, 0),
+            ('patch', False, lambda t: {'name': 'budget renamed'}, 1),
+        ],
+    }
+
+    # settings applied while measuring an endpoint
+    SETTINGS = {
+        'user:token-refresh': {'AUTH_TOKEN_MODE': 'signed'},
+    }
+
+    # request bodies not sent as JSON
+    CONTENT_TYPES = {
+        'recipe:recipe-upload-image': {'format': 'multipart'},
+        'recipe:recipe-upload-chunk': {
+            'content_type': 'application/octet-stream'},
+    }
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='budget@test.com',
+            password='budgetpass',
+            name='budget'
+        )
+        self.client.force_authenticate(self.user)
+        self.tags = []
+        self.ingredients = []
+        self.recipes = []
+
+    def tearDown(self):
+        for recipe in Recipe.objects.exclude(image=''):
+            recipe.image.delete()
+
+    def populate(self, size):
+        """Create `size` recipes each linked to `size` tags/ingredients"""
+        for i in range(size):
+            self.tags.append(
+                Tag.objects.create(user=self.user, name=f'tag {i}'))
+            self.ingredients.append(
+                Ingredient.objects.create(user=self.user, name=f'ing {i}'))
+        for i in range(size):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'recipe {i}',
+                time_minutes=i,
+                price=1
+            )
+            recipe.tags.set(self.tags)
+            recipe.ingredients.set(self.ingredients)
+            self.recipes.append(recipe)
+
+    def image_upload(self, complete=False):
+        """Start a resumable upload of a sample image to the last recipe"""
+        self.upload_data = sample_image().read()
+        upload = uploads.start(self.recipes[-1], 'budget.jpg',
+                               len(self.upload_data))
+        if complete:
+            with open(upload.path, 'wb') as f:
+                f.write(self.upload_data)
+            upload.offset = upload.size
+            upload.save()
+        return upload
+
+    def count_queries(self, name, method, detail, payload):
+        """Perform one request and return its query count"""
+        if callable(detail):
+            args = detail(self)
+        else:
+            args = [self.recipes[-1].id] if detail else []
+        url = reverse(name, args=args)
+        data = payload(self) if payload else None
+        content = self.CONTENT_TYPES.get(name, {'format': 'json'})
+        Token.objects.all().delete()
+        with self.settings(**self.SETTINGS.get(name, {})), \
+                CaptureQueriesContext(connection) as ctx:
+            res = getattr(self.client, method)(url, data, **content)
+            if res.streaming:
+                b''.join(res.streaming_content)
+        self.assertLess(res.status_code, 400, f'{method} {name}: {res}')
+        return len(ctx.captured_queries)
+
+    def test_every_endpoint_has_budget(self):
+        """Test that no url is left without a query budget"""
+        names = set(url_names(recipe_urls.urlpatterns, 'recipe'))
+        names |= set(url_names(user_urls.urlpatterns, 'user'))
+
+        self.assertEqual(names, set(self.BUDGETS))
+
+    def test_query_budgets(self):
+        """Test every endpoint stays within its query budget"""
+        for name, cases in self.BUDGETS.items():
+            for method, detail, payload, budget in cases:
+                with self.subTest(endpoint=name, method=method):
+                    self.populate(2)
+                    small = self.count_queries(name, method, detail, payload)
+                    self.populate(6)
+                    large = self.count_queries(name, method, detail, payload)
+
+                    self.assertLessEqual(large, budget)
+                    self.assertEqual(small, large)
+                    Recipe.objects.all().delete()
+                    Tag.objects.all().delete()
+                    Ingredient.objects.all().delete()
+                    get_user_model().objects.exclude(pk=self.user.pk).delete()
+                    self.user.refresh_from_db()
+                    self.tags, self.ingredients, self.recipes = [], [], []
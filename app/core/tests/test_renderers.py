@@ -0,0 +1,126 @@
+import datetime
+import io
+import json
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+
+import msgpack
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core import parsers, renderers
+from core.models import Recipe, Tag
+
+RECIPES_URL = reverse('recipe:recipe-list')
+MSGPACK = 'application/msgpack'
+
+SAMPLE = OrderedDict([
+    ('id', 1),
+    ('price', Decimal('5.50')),
+    ('title', 'Crème brûlée '),
+    ('created', datetime.datetime(2020, 1, 2, 3, 4, 5, 678901,
+                                  tzinfo=datetime.timezone.utc)),
+    ('day', datetime.date(2020, 1, 2)),
+    ('uuid', uuid.UUID('12345678-1234-5678-1234-567812345678')),
+    ('label', _('Ready')),
+    ('sizes', {128: 'small', 512: 'large'}),
+    ('items', [None, True, 1.5, []]),
+])
+
+
+class RendererTest(TestCase):
+    """Test the orjson and MessagePack renderers and parsers"""
+
+    def test_orjson_matches_json_renderer(self):
+        """Test orjson output is the same as the default renderer's"""
+        self.assertEqual(renderers.ORJSONRenderer().render(SAMPLE),
+                         JSONRenderer().render(SAMPLE))
+
+    def test_orjson_indent(self):
+        """Test indented output is left to the default renderer"""
+        media_type = 'application/json; indent=2'
+
+        self.assertEqual(
+            renderers.ORJSONRenderer().render(SAMPLE, media_type),
+            JSONRenderer().render(SAMPLE, media_type))
+
+    def test_orjson_parser(self):
+        """Test JSON is parsed and invalid JSON rejected"""
+        parser = parsers.ORJSONParser()
+
+        self.assertEqual(parser.parse(io.BytesIO(b'{"a": [1, "\xc3\xa9"]}')),
+                         {'a': [1, 'é']})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{"a": NaN}'))
+
+    def test_msgpack_round_trip(self):
+        """Test MessagePack values convert like JSON ones"""
+        sample = OrderedDict(SAMPLE)
+        del sample['sizes']
+        content = renderers.MessagePackRenderer().render(sample)
+        data = parsers.MessagePackParser().parse(io.BytesIO(content))
+
+        self.assertEqual(data, json.loads(JSONRenderer().render(sample)))
+
+    def test_msgpack_parser_invalid(self):
+        """Test malformed MessagePack is a parse error"""
+        with self.assertRaises(ParseError):
+            parsers.MessagePackParser().parse(io.BytesIO(b'\xc1'))
+
+
+class ContentNegotiationTest(TestCase):
+    """Test clients choose the format with Accept and Content-Type"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='formats@test.com',
+            password='formatspass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+
+    def test_list_msgpack(self):
+        """Test recipe lists are sent as MessagePack when accepted"""
+        Recipe.objects.create(user=self.user, title='packed',
+                              time_minutes=5, price=5)
+        json_res = self.client.get(RECIPES_URL)
+
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT=MSGPACK)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], MSGPACK)
+        self.assertEqual(msgpack.unpackb(res.content), json_res.json())
+        self.assertNotEqual(res['ETag'], json_res['ETag'])
+
+    def test_create_msgpack(self):
+        """Test a recipe is created from a MessagePack body"""
+        payload = {'title': 'packed', 'time_minutes': 5, 'price': '5.00',
+                   'tags': [self.tag.id], 'ingredients': []}
+
+        res = self.client.post(RECIPES_URL, payload, format='msgpack',
+                               HTTP_ACCEPT=MSGPACK)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        data = msgpack.unpackb(res.content)
+        self.assertEqual(data['tags'], [self.tag.id])
+        self.assertEqual(data['price'], '5.00')
+
+    def test_token_msgpack(self):
+        """Test the user endpoints accept MessagePack too"""
+        client = APIClient()
+
+        res = client.post(reverse('user:token'), {
+            'email': 'formats@test.com',
+            'password': 'formatspass',
+        }, format='msgpack', HTTP_ACCEPT=MSGPACK)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('token', msgpack.unpackb(res.content))
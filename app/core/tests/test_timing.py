@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import benchmark
+from core.models import Recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def metrics(header):
+    """Map the metric names of a Server-Timing header to their params"""
+    return {name: params for name, *params in
+            (entry.strip().split(';') for entry in header.split(','))}
+
+
+class ServerTimingTest(TestCase):
+    """Test the request phase instrumentation"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='timing@test.com',
+            password='timingpass'
+        )
+        Recipe.objects.create(user=self.user, title='timed',
+                              time_minutes=5, price=5)
+        self.token = Token.objects.create(user=self.user)
+
+    def get(self, url=RECIPES_URL):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        return client.get(url)
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        """Test every phase of a recipe request is reported"""
+        with CaptureQueriesContext(connection) as ctx, \
+                self.assertLogs('core.timing', 'INFO') as logs:
+            res = self.get()
+
+        timings = metrics(res['Server-Timing'])
+        self.assertEqual(
+            set(timings), {'auth', 'serialize', 'render', 'db', 'total'})
+        self.assertIn(f'desc="{len(ctx.captured_queries)} queries"',
+                      timings['db'])
+        self.assertTrue(timings['total'][0].startswith('dur='))
+        self.assertEqual(benchmark.SERVER_TIMING_QUERIES.search(
+            res['Server-Timing']).group(1), str(len(ctx.captured_queries)))
+        record = logs.records[0]
+        self.assertIn(f'GET {RECIPES_URL} 200', record.getMessage())
+        self.assertEqual(record.server_timing['db_queries'],
+                         len(ctx.captured_queries))
+
+    @override_settings(SERVER_TIMING=True)
+    def test_other_views_report_database(self):
+        """Test views without phase hooks still report their queries"""
+        res = self.get(reverse('user:me'))
+
+        self.assertEqual(set(metrics(res['Server-Timing'])),
+                         {'db', 'total'})
+
+    def test_disabled(self):
+        """Test nothing is measured while SERVER_TIMING is off"""
+        res = self.get()
+
+        self.assertNotIn('Server-Timing', res)
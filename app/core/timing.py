@@ -0,0 +1,114 @@
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class Timings:
+    """Durations of the phases of one request, in seconds"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.queries = 0
+        self.db = 0.0
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def execute(self, execute, sql, params, many, context):
+        """Database execute wrapper counting and timing every query"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+    def metrics(self):
+        """Return every measurement in milliseconds, total last"""
+        metrics = {f'{name}_ms': round(seconds * 1000, 2)
+                   for name, seconds in self.phases.items()}
+        metrics['db_ms'] = round(self.db * 1000, 2)
+        metrics['db_queries'] = self.queries
+        metrics['total_ms'] = round(
+            (time.perf_counter() - self.started) * 1000, 2)
+        return metrics
+
+    def header(self):
+        """Format the measurements as a Server-Timing header value"""
+        entries = [f'{name};dur={seconds * 1000:.2f}'
+                   for name, seconds in self.phases.items()]
+        entries.append(f'db;dur={self.db * 1000:.2f};'
+                       f'desc="{self.queries} queries"')
+        entries.append(
+            f'total;dur={(time.perf_counter() - self.started) * 1000:.2f}')
+        return ', '.join(entries)
+
+
+@contextmanager
+def phase(request, name):
+    """Add the time spent in the block to the `name` phase of `request`
+
+    Nothing is measured unless ServerTimingMiddleware handles `request`.
+    """
+    timings = getattr(request, 'server_timing', None)
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def timed(request, name, func):
+    """Wrap `func` to run as the `name` phase of `request`"""
+    def wrapper(*args, **kwargs):
+        with phase(request, name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class ServerTimingMiddleware:
+    """Report where the time of each request went
+
+    Phases recorded with `phase` during the request, plus the number
+    and duration of database queries, are sent in a Server-Timing
+    header and logged as one line. With SERVER_TIMING off the
+    middleware removes itself at startup.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = request.server_timing = Timings()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(timings.execute))
+            response = self.get_response(request)
+
+        response['Server-Timing'] = timings.header()
+        metrics = timings.metrics()
+        logger.info(
+            '%s %s %s %s', request.method, request.path,
+            response.status_code,
+            ' '.join(f'{key}={value}' for key, value in metrics.items()),
+            extra={'server_timing': {
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                **metrics,
+            }}
+        )
+        return response
@@ -0,0 +1,158 @@
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied, SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified, StreamingHttpResponse)
+from django.utils._os import safe_join
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+from core import metrics as request_metrics
+
+# uuid and content hash file names of recipe images and their thumbnails
+IMMUTABLE_NAME = re.compile(
+    r'^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+    r'|[0-9a-f]{64})(_\d+)?\.\w+$'
+)
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+
+def cache_control(path):
+    """Cache unique file names forever, revalidate everything else"""
+    if IMMUTABLE_NAME.match(os.path.basename(path)):
+        return f'public, max-age={settings.MEDIA_IMMUTABLE_MAX_AGE}, immutable'
+    return 'public, no-cache'
+
+
+def parse_range(header, size):
+    """Return `(start, end)` of a single byte range, inclusive
+
+    None is returned when the whole file should be sent, and ValueError
+    raised when the range cannot be satisfied.
+    """
+    match = RANGE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def read_range(path, start, length):
+    """Yield `length` bytes of the file at `path` from `start`"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(length, BLOCK_SIZE))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve an uploaded file below MEDIA_ROOT
+
+    With MEDIA_ACCEL set the response only names the file and the front
+    proxy transfers it; otherwise single byte ranges are answered here.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        info = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404()
+    if not stat.S_ISREG(info.st_mode):
+        raise Http404()
+
+    headers = {
+        'Last-Modified': http_date(info.st_mtime),
+        'Cache-Control': cache_control(full_path),
+    }
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                              info.st_mtime, info.st_size):
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_ACCEL:
+        response = accel_response(path, full_path)
+    else:
+        response = file_response(request, full_path, info)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+def accel_response(path, full_path):
+    """Delegate the transfer of a file to the front proxy"""
+    content_type, encoding = mimetypes.guess_type(full_path)
+    response = HttpResponse(
+        content_type=content_type or 'application/octet-stream')
+    if settings.MEDIA_ACCEL == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_LOCATION + quote(path))
+    else:
+        response['X-Sendfile'] = full_path
+    return response
+
+
+def file_response(request, full_path, info):
+    """Send the whole file or the byte range asked for"""
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    byte_range = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    # If-Range only accepts dates here, as no ETag is sent
+    if if_range and parse_http_date_safe(if_range) != int(info.st_mtime):
+        byte_range = None
+    try:
+        byte_range = parse_range(byte_range, info.st_size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{info.st_size}'
+        return response
+
+    if byte_range is None:
+        response = FileResponse(open(full_path, 'rb'),
+                                content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(full_path, start, end - start + 1),
+            status=206,
+            content_type=content_type
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{info.st_size}'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@require_safe
+def metrics(request):
+    """Expose the request metrics of every worker to Prometheus
+
+    Scrapers authenticate with the METRICS_TOKEN bearer token; staff
+    users signed in to the admin may look too.
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not (request.user.is_staff or token and constant_time_compare(
+            authorization, f'Bearer {token}')):
+        raise PermissionDenied()
+    return HttpResponse(request_metrics.render(),
+                        content_type=request_metrics.CONTENT_TYPE)
@@ -0,0 +1,71 @@
+import logging
+import threading
+
+from django.db import connections
+from django.db.utils import OperationalError
+from django.urls import URLResolver, get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_urls(resolver=None):
+    """Load every url pattern, returning the views they route to"""
+    resolver = resolver or get_resolver()
+    # filling the reverse lookups imports the urlconf and its views
+    resolver.reverse_dict
+    views = []
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            views.extend(resolve_urls(pattern))
+        else:
+            views.append(pattern.callback)
+    return views
+
+
+def load_serializers(views):
+    """Build the fields of the serializer of every viewset and API view
+
+    The first serializer of a class imports and inspects its model
+    fields; doing it here keeps that out of the first requests.
+    """
+    for view in views:
+        serializer_class = getattr(getattr(view, 'cls', None),
+                                   'serializer_class', None)
+        if serializer_class is not None:
+            serializer_class().fields
+
+
+def open_connections():
+    """Connect to every database, logging those that cannot be reached"""
+    for connection in connections.all():
+        try:
+            connection.ensure_connection()
+        except OperationalError as error:
+            logger.warning('Database %s unavailable during warm-up: %s',
+                           connection.alias, error)
+
+
+def warm_up(executor=None, threads=0):
+    """Prepare the process to serve requests
+
+    Url patterns and serializers are loaded and the databases connected
+    to, on this thread or, given an `executor`, on each of its `threads`
+    since connections belong to the thread that opened them. Connections
+    only outlive the first request with CONN_MAX_AGE set. Servers forking
+    workers after loading the application (gunicorn --preload) must turn
+    WARM_UP off, or the workers would share the connection.
+    """
+    load_serializers(resolve_urls())
+    if executor is None:
+        open_connections()
+        return
+    # every task waits for the others, so each one gets its own thread
+    barrier = threading.Barrier(threads)
+
+    def connect(index):
+        try:
+            barrier.wait(timeout=10)
+        except threading.BrokenBarrierError:
+            pass
+        open_connections()
+    list(executor.map(connect, range(threads)))
@@ -0,0 +1,57 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def get_cache():
+    """Return the cache backend configured for recipe attributes"""
+    return caches[settings.RECIPE_CACHE_ALIAS]
+
+
+def _generation_key(kind, user_id):
+    return f'recipe:{kind}:generation:{user_id}'
+
+
+def get_generation(kind, user_id):
+    """Return the current cache generation of a user's `kind` lists
+
+    A missing generation gets a fresh random one, so an evicted
+    generation can never resurrect entries written under an older one.
+    """
+    cache = get_cache()
+    key = _generation_key(kind, user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate(kind, user_id):
+    """Drop every cached `kind` list of the user"""
+    get_cache().set(_generation_key(kind, user_id), uuid.uuid4().hex, None)
+
+
+def list_key(kind, request):
+    """Return the cache key of a list response for `request`"""
+    user_id = request.user.pk
+    url = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+    generation = get_generation(kind, user_id)
+    return f'recipe:{kind}:list:{user_id}:{generation}:{url}'
+
+
+def get_list(key):
+    """Return the list response data cached under `key`, if any"""
+    return get_cache().get(key)
+
+
+def set_list(key, data):
+    """Cache list response data under `key`
+
+    `key` must be the one read before the data was queried: should the
+    lists be invalidated meanwhile, the data then goes to the older,
+    already unused, generation instead of being served as current.
+    """
+    get_cache().set(key, data, settings.RECIPE_CACHE_TIMEOUT)
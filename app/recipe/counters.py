@@ -0,0 +1,35 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def usage(model):
+    """Expression counting the recipes linked to each `model` row"""
+    name = model._meta.model_name
+    return Coalesce(Subquery(
+        model.recipe_set.through.objects.filter(**{name: OuterRef('pk')})
+        .values(name)
+        .annotate(recipes=Count('pk'))
+        .values('recipes'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def adjust(model, pks, delta, using='default'):
+    """Add `delta` to the `recipe_count` of the given objects"""
+    pks = list(pks)
+    if not pks or not delta:
+        return
+    model.objects.using(using).filter(pk__in=pks).update(
+        recipe_count=F('recipe_count') + delta)
+
+
+def recount(model, pks=None, using='default'):
+    """Recompute stale `recipe_count` values, returning how many changed
+
+    Every row is checked unless `pks` limits the objects to look at.
+    """
+    queryset = model.objects.using(using)
+    if pks is not None:
+        queryset = queryset.filter(pk__in=list(pks))
+    return queryset.filter(~Q(recipe_count=usage(model))).update(
+        recipe_count=usage(model))
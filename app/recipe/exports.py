@@ -0,0 +1,51 @@
+import json
+from itertools import islice
+
+from django.db.models import prefetch_related_objects
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+from recipe import serializers
+
+# recipes fetched per round trip, and serialized together
+BATCH_SIZE = 500
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """Render data as a single line of newline delimited JSON"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return line(data)
+
+
+def line(data):
+    """Encode `data` as one compact line of UTF-8 JSON"""
+    return (json.dumps(data, cls=JSONEncoder, ensure_ascii=False,
+                       separators=(',', ':')) + '\n').encode()
+
+
+def batches(queryset, size):
+    """Yield lists of `size` objects read through a server-side cursor"""
+    rows = queryset.iterator(chunk_size=size)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def ndjson(queryset, context):
+    """Yield every recipe of `queryset` as a line of JSON
+
+    Tags and ingredients are fetched once per batch, so memory use and
+    queries per recipe stay constant whatever the size of the library.
+    """
+    queryset = queryset.prefetch_related(None)
+    for batch in batches(queryset, BATCH_SIZE):
+        prefetch_related_objects(batch, 'tags', 'ingredients')
+        data = serializers.RecipeDetailSerializer(
+            batch, many=True, context=context).data
+        yield b''.join(line(recipe) for recipe in data)
@@ -0,0 +1,280 @@
+import hashlib
+import io
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.models import ImageBlob, ImageStatus, Recipe
+from recipe import signals
+
+INVALID_IMAGE_ERRORS = (OSError, SyntaxError, ValueError,
+                        Image.DecompressionBombError)
+JPEG_QUALITY = 85
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def thumbnail_name(name, size):
+    """Return the storage name of the `size` thumbnail of image `name`"""
+    root, ext = os.path.splitext(name)
+    return f'{root}_{size}{ext}'
+
+
+def thumbnail_names(name):
+    """Map every configured thumbnail size to its storage name"""
+    return {size: thumbnail_name(name, size)
+            for size in settings.RECIPE_IMAGE_THUMBNAIL_SIZES}
+
+
+def delete_image(storage, name):
+    """Delete a stored image together with its thumbnails"""
+    if not name:
+        return
+    for thumbnail in thumbnail_names(name).values():
+        storage.delete(thumbnail)
+    storage.delete(name)
+
+
+def blob_name(data, ext):
+    """Return the content addressed storage name of encoded image bytes"""
+    return f'uploads/recipe/{hashlib.sha256(data).hexdigest()}.{ext}'
+
+
+def store(image, data, ext, thumbnails):
+    """Save an encoded image and its thumbnails, returning its name
+
+    With RECIPE_IMAGE_STORAGE set to 'content' the image is stored under
+    the hash of its bytes and a reference is taken on its blob; nothing
+    is written when the blob is already stored.
+    """
+    storage = image.storage
+    if settings.RECIPE_IMAGE_STORAGE != 'content':
+        image.save(f'image.{ext}', ContentFile(data), save=False)
+        files = {image.name: None}
+    else:
+        image.name = blob_name(data, ext)
+        files = {image.name: data}
+    files.update((name, thumbnails[size])
+                 for size, name in thumbnail_names(image.name).items())
+
+    with transaction.atomic():
+        if files[image.name] is not None:
+            blob, created = ImageBlob.objects.select_for_update(
+            ).get_or_create(name=image.name)
+            ImageBlob.objects.filter(pk=blob.pk).update(
+                references=F('references') + 1)
+        for name, content in files.items():
+            if content is not None and not storage.exists(name):
+                storage.save(name, ContentFile(content))
+    return image.name
+
+
+def release(storage, name):
+    """Drop a reference to a stored image, deleting it with the last one
+
+    Images without a blob are never shared and are deleted straight away.
+    """
+    if not name:
+        return
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(name=name).first()
+        if blob is not None and blob.references > 1:
+            ImageBlob.objects.filter(pk=blob.pk).update(
+                references=F('references') - 1)
+            return
+        if blob is not None:
+            blob.delete()
+        delete_image(storage, name)
+
+
+def encode(img):
+    """Re-encode `img` without metadata, returning `(bytes, extension)`"""
+    if img.mode in ('RGBA', 'LA') or 'transparency' in img.info:
+        img, fmt, ext, options = img.convert('RGBA'), 'PNG', 'png', {}
+    else:
+        img, fmt, ext = img.convert('RGB'), 'JPEG', 'jpg'
+        options = {'quality': JPEG_QUALITY, 'optimize': True}
+    img.info = {}
+    buffer = io.BytesIO()
+    img.save(buffer, fmt, **options)
+    return buffer.getvalue(), ext
+
+
+def claimable():
+    """Return the recipes whose upload waits for a worker
+
+    Besides pending uploads, this includes uploads still processing
+    RECIPE_IMAGE_PROCESSING_TIMEOUT seconds after they were claimed, as
+    their worker died or hung.
+    """
+    stale = timezone.now() - timedelta(
+        seconds=settings.RECIPE_IMAGE_PROCESSING_TIMEOUT)
+    return Recipe.objects.filter(
+        Q(image_status=ImageStatus.PENDING) |
+        Q(image_status=ImageStatus.PROCESSING) & (
+            Q(image_claimed_at__lt=stale) |
+            Q(image_claimed_at__isnull=True))
+    )
+
+
+def claim(recipe_id=None):
+    """Atomically move a claimable recipe to processing, returning its id
+
+    Without `recipe_id` the oldest claimable recipe is taken. Claims are
+    conditional updates, so concurrent workers never share a recipe.
+    """
+    claimable_recipes = claimable()
+    candidates = claimable_recipes.values_list('pk', 'user_id')
+    if recipe_id is None:
+        candidates = candidates.order_by('pk')[:10]
+    else:
+        candidates = candidates.filter(pk=recipe_id)
+    for pk, user_id in candidates:
+        if claimable_recipes.filter(pk=pk).update(
+                image_status=ImageStatus.PROCESSING,
+                image_claimed_at=timezone.now()):
+            signals.data_changed(user_id)
+            return pk
+    return None
+
+
+def process(recipe_id):
+    """Verify, clean and resize the claimed upload of a recipe"""
+    recipe = Recipe.objects.get(pk=recipe_id)
+    upload = recipe.image_upload
+    try:
+        with upload.open('rb') as f:
+            Image.open(f).verify()
+        with upload.open('rb') as f:
+            img = ImageOps.exif_transpose(Image.open(f))
+            data, ext = encode(img)
+            thumbnails = {}
+            for size in settings.RECIPE_IMAGE_THUMBNAIL_SIZES:
+                thumbnail = img.copy()
+                thumbnail.thumbnail((size, size))
+                thumbnails[size] = encode(thumbnail)[0]
+    except INVALID_IMAGE_ERRORS:
+        produced = None
+        changes = {'image_status': ImageStatus.FAILED}
+    else:
+        previous = recipe.image.name
+        produced = store(recipe.image, data, ext, thumbnails)
+        changes = {'image_status': ImageStatus.READY, 'image': produced}
+
+    # The upload may have been replaced while it was being processed
+    current = Recipe.objects.filter(pk=recipe.pk, image_upload=upload.name)
+    if current.update(image_upload=None, **changes):
+        signals.data_changed(recipe.user_id)
+        stale = produced and previous
+    else:
+        stale = produced
+    upload.delete(save=False)
+    release(recipe.image.storage, stale)
+    return changes['image_status']
+
+
+def process_claimed(recipe_id):
+    """Process a claimed recipe, marking it failed on unexpected errors
+
+    Errors other than invalid images, such as a storage failure, are
+    logged; the upload is kept for inspection.
+    """
+    try:
+        return process(recipe_id)
+    except Exception:
+        logger.exception('Processing the image of recipe %s failed',
+                         recipe_id)
+        processing = Recipe.objects.filter(
+            pk=recipe_id, image_status=ImageStatus.PROCESSING)
+        user_id = processing.values_list('user_id', flat=True).first()
+        if processing.update(image_status=ImageStatus.FAILED):
+            signals.data_changed(user_id)
+        return ImageStatus.FAILED
+
+
+def process_pending(limit=None):
+    """Process pending uploads until none are left or `limit` is reached"""
+    processed = 0
+    while limit is None or processed < limit:
+        recipe_id = claim()
+        if recipe_id is None:
+            break
+        process_claimed(recipe_id)
+        processed += 1
+    return processed
+
+
+def _process_in_thread(recipe_id=None):
+    try:
+        if recipe_id is None:
+            process_pending()
+        elif claim(recipe_id) is not None:
+            process_claimed(recipe_id)
+    except Exception:
+        # the executor would keep the error in a future nobody reads
+        logger.exception('Image processing failed')
+    finally:
+        connection.close()
+
+
+def get_executor():
+    """Return the thread pool processing uploads in this process
+
+    Its first task processes the uploads that were left pending, as in
+    thread mode nothing else polls for them.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.RECIPE_IMAGE_WORKERS,
+            thread_name_prefix='recipe-images'
+        )
+        _executor.submit(_process_in_thread)
+    return _executor
+
+
+def dispatch(recipe_id):
+    """Hand a freshly uploaded image to the configured processor"""
+    if settings.RECIPE_IMAGE_PROCESSING == 'thread':
+        get_executor().submit(_process_in_thread, recipe_id)
+
+
+def resume():
+    """Start processing the uploads an earlier process left behind
+
+    Called as the application starts; in worker mode the
+    process_images command picks them up instead.
+    """
+    if settings.RECIPE_IMAGE_PROCESSING == 'thread':
+        get_executor()
+
+
+def run_worker(once=False, interval=1.0, stop=None):
+    """Process pending uploads, polling every `interval` seconds
+
+    This is the body of each worker started by the process_images
+    command. It returns once the queue is empty when `once` is set, or
+    when the `stop` event is set.
+    """
+    processed = 0
+    while stop is None or not stop.is_set():
+        close_old_connections()
+        count = process_pending()
+        processed += count
+        if once:
+            break
+        if not count:
+            time.sleep(interval)
+    connection.close()
+    return processed
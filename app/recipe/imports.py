@@ -0,0 +1,206 @@
+import csv
+import io
+import json
+from collections import Counter
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import connections, models, transaction
+
+from core.models import Ingredient, Recipe, Tag
+from recipe import counters, search, signals
+
+BATCH_SIZE = 1000
+# recipe columns read from every row, with the value of missing ones
+FIELDS = {'title': None, 'time_minutes': None, 'price': None, 'link': ''}
+RELATIONS = {'tags': Tag, 'ingredients': Ingredient}
+# separates tag and ingredient names in a CSV column
+CSV_SEPARATOR = '|'
+
+
+class RowError(ValueError):
+    """A row of the imported file cannot be turned into a recipe"""
+
+    def __init__(self, line, message):
+        super().__init__(f'line {line}: {message}')
+
+
+def read_jsonl(stream):
+    """Yield `(line, row)` for every object of a JSON lines stream
+
+    Tags and ingredients are lists of names or of objects with a name,
+    as written by the recipe export.
+    """
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError as error:
+            raise RowError(line, error)
+        if not isinstance(row, dict):
+            raise RowError(line, 'expected an object')
+        for field in RELATIONS:
+            row[field] = [name['name'] if isinstance(name, dict) else name
+                          for name in row.get(field) or []]
+        yield line, row
+
+
+def read_csv(stream):
+    """Yield `(line, row)` for every record of a CSV stream with header
+
+    Tags and ingredients are names separated by CSV_SEPARATOR.
+    """
+    reader = csv.DictReader(stream)
+    for row in reader:
+        for field in RELATIONS:
+            row[field] = (row.get(field) or '').split(CSV_SEPARATOR)
+        yield reader.line_num, row
+
+
+def clean(line, row):
+    """Return the validated recipe values and relation names of a row"""
+    values = {}
+    for name, default in FIELDS.items():
+        field = Recipe._meta.get_field(name)
+        value = row.get(name)
+        if value is None or value == '':
+            value = default
+        try:
+            values[name] = field.clean(value, None)
+        except ValidationError as error:
+            raise RowError(line, f'{name}: {" ".join(error.messages)}')
+    names = {}
+    for field, model in RELATIONS.items():
+        names[field] = list(dict.fromkeys(
+            str(name).strip() for name in row[field] if str(name).strip()))
+        for name in names[field]:
+            if len(name) > model._meta.get_field('name').max_length:
+                raise RowError(line, f'{field}: {name[:20]}... too long')
+    return values, names
+
+
+class Importer:
+    """Load recipes of one user in batches of multi-row inserts
+
+    Recipes and their links are written with COPY on PostgreSQL and with
+    bulk_create elsewhere. Tags and ingredients are matched by name,
+    creating the missing ones, and their recipe counts and the search
+    documents of the new recipes are maintained as the signals would.
+    """
+
+    def __init__(self, user, using='default'):
+        self.user = user
+        self.using = using
+        self.connection = connections[using]
+        # name to pk of the user's tags and ingredients seen so far
+        self.known = {field: {} for field in RELATIONS}
+        self.imported = 0
+
+    def run(self, rows, batch_size=BATCH_SIZE):
+        """Import `(line, row)` pairs, yielding the total after each batch"""
+        rows = iter(rows)
+        while True:
+            batch = [clean(line, row)
+                     for line, row in islice(rows, batch_size)]
+            if not batch:
+                break
+            with transaction.atomic(using=self.using):
+                self.load(batch)
+                # a later batch may fail, so each announces its changes
+                signals.data_changed(self.user.pk, 'tag', 'ingredient')
+            self.imported += len(batch)
+            yield self.imported
+
+    def load(self, batch):
+        """Insert one batch of cleaned rows with their links"""
+        for field in RELATIONS:
+            self.resolve(field, {name for values, names in batch
+                                 for name in names[field]})
+        recipe_ids = self.insert_recipes(
+            [values for values, names in batch])
+        for field, model in RELATIONS.items():
+            through = getattr(Recipe, field).through
+            column = Recipe._meta.get_field(field).m2m_reverse_name()
+            links = [through(recipe_id=recipe_id,
+                             **{column: self.known[field][name]})
+                     for recipe_id, (values, names) in zip(recipe_ids, batch)
+                     for name in names[field]]
+            self.insert(through, links)
+            uses = Counter(getattr(link, column) for link in links)
+            for delta in set(uses.values()):
+                counters.adjust(model, [pk for pk, n in uses.items()
+                                        if n == delta], delta, self.using)
+        search.update_search_vectors(recipe_ids, self.using)
+
+    def resolve(self, field, names):
+        """Look up or create the user's tags or ingredients by name"""
+        model = RELATIONS[field]
+        known = self.known[field]
+        names = [name for name in names if name not in known]
+        if not names:
+            return
+        objects = model.objects.using(self.using).filter(user=self.user)
+        for name, pk in objects.filter(name__in=names).order_by(
+                'pk').values_list('name', 'pk'):
+            known.setdefault(name, pk)
+        missing = [name for name in names if name not in known]
+        model.objects.using(self.using).bulk_create(
+            model(user=self.user, name=name) for name in missing)
+        known.update(objects.filter(name__in=missing)
+                     .values_list('name', 'pk'))
+
+    def insert_recipes(self, rows):
+        """Insert recipe values, returning the new primary keys in order"""
+        recipes = [Recipe(user=self.user, **values) for values in rows]
+        if self.connection.vendor == 'postgresql':
+            # COPY returns nothing, so the keys are drawn beforehand
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+                    "FROM generate_series(1, %s)",
+                    [Recipe._meta.db_table, len(recipes)]
+                )
+                for recipe, (pk,) in zip(recipes, cursor.fetchall()):
+                    recipe.pk = pk
+        self.insert(Recipe, recipes)
+        if recipes[0].pk is not None:
+            return [recipe.pk for recipe in recipes]
+        # the transaction holds the write lock, so the newest are ours
+        return sorted(Recipe.objects.using(self.using).filter(
+            user=self.user).order_by('-pk').values_list(
+            'pk', flat=True)[:len(recipes)])
+
+    def insert(self, model, objs):
+        """Insert `objs` with COPY on PostgreSQL, bulk_create elsewhere"""
+        if not objs:
+            return
+        if self.connection.vendor != 'postgresql':
+            model.objects.using(self.using).bulk_create(objs)
+            return
+        fields = [field for field in model._meta.concrete_fields
+                  if not field.primary_key or objs[0].pk is not None]
+        buffer = io.StringIO()
+        # every string is quoted, None as an empty one
+        csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(
+            [field.get_db_prep_save(getattr(obj, field.attname),
+                                    self.connection) for field in fields]
+            for obj in objs
+        )
+        buffer.seek(0)
+        quote = self.connection.ops.quote_name
+        columns = ', '.join(quote(field.column) for field in fields)
+        # an empty string read into a column that cannot hold strings
+        # is a None
+        nulls = ', '.join(
+            quote(field.column) for field in fields if field.null and
+            not isinstance(field, (models.CharField, models.TextField,
+                                   models.FileField)))
+        options = f'FORMAT csv, FORCE_NULL ({nulls})' if nulls \
+            else 'FORMAT csv'
+        with self.connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {quote(model._meta.db_table)} ({columns}) '
+                f'FROM STDIN WITH ({options})',
+                buffer
+            )
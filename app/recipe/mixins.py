@@ -0,0 +1,224 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+from core import timing
+from recipe import cache, rows, search, serializers, signals
+
+
+class ServerTimingMixin:
+    """Measure the auth, serialization and rendering phases
+
+    The phases are reported by `core.timing.ServerTimingMiddleware`;
+    while it is disabled nothing is wrapped.
+    """
+
+    def perform_authentication(self, request):
+        with timing.phase(request, 'auth'):
+            super().perform_authentication(request)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if getattr(self.request, 'server_timing', None) is not None:
+            serializer.to_representation = timing.timed(
+                self.request, 'serialize', serializer.to_representation)
+        return serializer
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if getattr(self.request, 'server_timing', None) is not None:
+            for renderer in renderers:
+                renderer.render = timing.timed(
+                    self.request, 'render', renderer.render)
+        return renderers
+
+
+class CollectChangesMixin:
+    """Bump the data version of the users a request changed once
+
+    See `recipe.signals.collect_changes`.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with signals.collect_changes():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ConditionalGetMixin:
+    """Answer `If-None-Match` from the user's data version
+
+    The ETag is derived from the version number bumped by
+    `recipe.signals` on every write to the user's data, so a matching
+    request is answered with 304 after a single primary key lookup on
+    the user table, without touching the recipe tables or serializers.
+    """
+
+    def get_etag(self, request):
+        """Return the ETag of the current request's response"""
+        version = get_user_model().objects.filter(
+            pk=request.user.pk
+        ).values_list('data_version', flat=True).first()
+        variant = '|'.join((
+            self.__class__.__name__,
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', ''),
+        ))
+        digest = hashlib.sha1(variant.encode()).hexdigest()[:16]
+        return quote_etag(f'{request.user.pk}-{version}-{digest}')
+
+    def conditional(self, handler, request, *args, **kwargs):
+        """Run `handler` unless the client already has the response"""
+        etag = self.get_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            patch_vary_headers(response, ('Accept', 'Authorization'))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+
+class RowReadMixin:
+    """Answer list and retrieve requests from `values()` rows
+
+    The response content is the viewset serializer's, built by
+    `recipe.rows.RowSerializer` without model instances. With
+    RECIPE_ROW_SERIALIZATION off the serializer is used as is.
+    """
+
+    def get_row_serializer(self):
+        return rows.RowSerializer(self.get_serializer())
+
+    def list(self, request, *args, **kwargs):
+        if not settings.RECIPE_ROW_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+        serializer = self.get_row_serializer()
+        # the paginator reads its cursor from the ordering columns
+        queryset = serializer.values(
+            self.filter_queryset(self.get_queryset()),
+            *(name.lstrip('-') for name in self.get_ordering()))
+        page = self.paginate_queryset(queryset)
+        with timing.phase(request, 'serialize'):
+            data = serializer.represent(
+                list(queryset) if page is None else page)
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.RECIPE_ROW_SERIALIZATION:
+            return super().retrieve(request, *args, **kwargs)
+        serializer = self.get_row_serializer()
+        queryset = serializer.values(
+            self.filter_queryset(self.get_queryset()))
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, row)
+        with timing.phase(request, 'serialize'):
+            data = serializer.represent([row])[0]
+        return Response(data)
+
+
+class CachedListMixin:
+    """Serve list responses from the per-user recipe cache"""
+
+    def list(self, request, *args, **kwargs):
+        kind = self.queryset.model._meta.model_name
+        key = cache.list_key(kind, request)
+        data = cache.get_list(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set_list(key, data)
+        return Response(data)
+
+
+class BulkWriteMixin:
+    """Create or update many objects of the viewset in one request
+
+    `POST <list url>/bulk/` creates every item of a JSON array and
+    `PATCH <list url>/bulk/` partially updates items identified by `id`.
+    All items are validated before anything is written, the writes run
+    in one transaction and the response lists one result per item.
+    """
+    bulk_max_items = 1000
+    # recipe.cache kinds whose lists a bulk write invalidates
+    bulk_kinds = ()
+
+    @action(methods=['post', 'patch'], detail=False)
+    def bulk(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError(_('Expected a list of items'))
+        if len(items) > self.bulk_max_items:
+            raise ValidationError(
+                _('At most %d items are allowed') % self.bulk_max_items)
+
+        if request.method == 'POST':
+            serializer = self.get_serializer(data=items, many=True)
+            extra = {'user': request.user}
+            response_status = status.HTTP_201_CREATED
+        else:
+            instances = self.get_bulk_instances(items)
+            serializer = self.get_serializer(instances, data=items,
+                                             many=True, partial=True)
+            extra = {}
+            response_status = status.HTTP_200_OK
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            objs = serializer.save(**extra)
+            signals.data_changed(request.user.pk, *self.bulk_kinds)
+            ids = [obj.pk for obj in objs]
+            search.update_related_search_vectors(self.queryset.model, ids)
+            saved = self.get_bulk_queryset().in_bulk(ids)
+
+        data = self.get_serializer([saved[pk] for pk in ids], many=True).data
+        return Response(data, status=response_status)
+
+    def get_bulk_queryset(self):
+        """Return the user's objects to show, ignoring the list filters"""
+        queryset = self.queryset.filter(user=self.request.user)
+        serializer = self.get_serializer_class()
+        if issubclass(serializer, serializers.SparseFieldsetMixin):
+            queryset = serializer.select(queryset)
+        return queryset
+
+    def get_bulk_instances(self, items):
+        """Return the user's objects for the ids of `items`, in order
+
+        Every id may appear once, as each item updates its object.
+        """
+        ids = [item.get('id') if isinstance(item, dict) else None
+               for item in items]
+        found = self.queryset.filter(
+            user=self.request.user,
+            pk__in=[pk for pk in ids if isinstance(pk, int)]
+        ).in_bulk()
+        errors = []
+        seen = set()
+        for pk in ids:
+            if pk not in found:
+                errors.append({'id': [_('Not found.')]})
+            elif pk in seen:
+                errors.append({'id': [_('Duplicate id.')]})
+            else:
+                errors.append({})
+            seen.add(pk)
+        if any(errors):
+            raise ValidationError(errors)
+        return [found[pk] for pk in ids]
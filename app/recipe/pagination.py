@@ -0,0 +1,182 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination seeking on the values of a unique ordering
+
+    The view's `ordering` (or `get_ordering()`) must end with a unique
+    column so every row has a distinct position; pages are fetched with a
+    `WHERE (ordering) > (last row)` condition instead of an OFFSET, so deep
+    pages cost the same as the first one.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    # rows counted exactly before falling back to an estimate
+    count_limit = 1000
+    ordering = ('-id',)
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return one page of `queryset` after the requested cursor"""
+        self.request = request
+        if hasattr(view, 'get_ordering'):
+            self.ordering = tuple(view.get_ordering())
+        else:
+            self.ordering = tuple(getattr(view, 'ordering', self.ordering))
+        self.page_size = self.get_page_size(request)
+        self.count = self.get_count(queryset, request)
+
+        position = self.decode_cursor(request)
+        reverse = False
+        if position is not None:
+            values, reverse = position
+            values = self.parse_values(queryset, values)
+            queryset = queryset.filter(self.seek(values, reverse))
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self._flip(field) for field in ordering)
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        has_next = has_more if not reverse else True
+        has_previous = has_more if reverse else position is not None
+        self.next_cursor = None
+        self.previous_cursor = None
+        if rows and has_next:
+            self.next_cursor = self.encode_cursor(rows[-1], False)
+        if rows and has_previous:
+            self.previous_cursor = self.encode_cursor(rows[0], True)
+        return rows
+
+    def get_paginated_response(self, data):
+        """Wrap the page with its navigation links"""
+        body = OrderedDict([
+            ('next', self.get_link(self.next_cursor)),
+            ('previous', self.get_link(self.previous_cursor)),
+        ])
+        if self.count is not None:
+            body['count'], body['count_estimated'] = self.count
+        body['results'] = data
+        return Response(body)
+
+    def get_page_size(self, request):
+        """Read the page size from the query string"""
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_link(self, cursor):
+        """Build the absolute url of the page at `cursor`"""
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_count(self, queryset, request):
+        """Return `(count, estimated)` when the client asked for it
+
+        `?count=exact` always runs COUNT(*). `?count=estimate` counts at
+        most `count_limit` rows and, past that, uses the PostgreSQL
+        planner's row estimate (or the limit itself on other databases).
+        """
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count(), False
+        if mode != 'estimate':
+            return None
+
+        counted = queryset.order_by()[:self.count_limit + 1].count()
+        if counted <= self.count_limit:
+            return counted, False
+        return max(self.planner_estimate(queryset), self.count_limit), True
+
+    def planner_estimate(self, queryset):
+        """Return the planner's estimated row count for `queryset`"""
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return 0
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def parse_values(self, queryset, values):
+        """Convert cursor values to the types of their ordering fields"""
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        parsed = []
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            if name in queryset.query.annotations:
+                model_field = queryset.query.annotations[name].output_field
+            else:
+                model_field = queryset.model._meta.get_field(name)
+            try:
+                value = model_field.to_python(value)
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            parsed.append(value)
+        return parsed
+
+    def seek(self, values, reverse):
+        """Build the condition selecting rows strictly after `values`"""
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            descending = field.startswith('-') != reverse
+            name = field.lstrip('-')
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def encode_cursor(self, row, reverse):
+        """Encode the ordering values of `row` as an opaque cursor"""
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            values.append(value)
+        data = json.dumps({'v': values, 'r': int(reverse)},
+                          separators=(',', ':'), default=str)
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, request):
+        """Return `(values, reverse)` from the request cursor, if any"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return list(data['v']), bool(data['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _flip(self, field):
+        """Reverse the direction of an ordering field"""
+        return field[1:] if field.startswith('-') else f'-{field}'
@@ -0,0 +1,139 @@
+import decimal
+from collections import defaultdict
+from decimal import Decimal
+from operator import itemgetter
+
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.settings import api_settings
+
+# fields whose representation of a column value is the value itself
+PLAIN_FIELDS = (serializers.CharField, serializers.IntegerField,
+                PrimaryKeyRelatedField)
+
+
+def decimal_field(field):
+    """Return a function formatting a Decimal column like `field`"""
+    coerce_to_string = getattr(field, 'coerce_to_string',
+                               api_settings.COERCE_DECIMAL_TO_STRING)
+    if field.localize or not coerce_to_string \
+            or field.decimal_places is None:
+        return field.to_representation
+    quantum = Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+
+    def represent(value):
+        return '{:f}'.format(value.quantize(
+            quantum, rounding=field.rounding, context=context))
+    return represent
+
+
+def file_field(field, storage, request):
+    """Return a function representing a file name column like `field`"""
+    use_url = getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL)
+
+    def represent(name):
+        if not name:
+            return None
+        if not use_url:
+            return name
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request else url
+    return represent
+
+
+class RowSerializer:
+    """Represent `values()` rows as the fields of `serializer` would
+
+    The fields are mapped once to plain functions of column values and
+    many to many relations are read with one query each, grouped by the
+    primary key of the rows, so no model instance or serializer field
+    is involved per row. Method fields call the serializer's
+    `<method name>_from_row` with the row instead.
+    """
+
+    def __init__(self, serializer):
+        self.model = serializer.Meta.model
+        self.columns = {'id'}
+        # (output name, function of the row), in the serializer's order
+        self.getters = []
+        # output name: (related model, reverse query name, RowSerializer
+        # of nested objects or None for primary keys)
+        self.relations = {}
+        request = serializer.context.get('request')
+        for name, field in serializer.fields.items():
+            self.getters.append((name, self.getter(
+                serializer, name, field, request)))
+
+    def getter(self, serializer, name, field, request):
+        if isinstance(field, serializers.SerializerMethodField):
+            self.columns.update(
+                getattr(serializer, 'field_columns', {}).get(name, ()))
+            return getattr(serializer, f'{field.method_name}_from_row')
+
+        model_field = self.model._meta.get_field(field.source)
+        if isinstance(field, (ManyRelatedField, serializers.ListSerializer)):
+            child = None
+            if isinstance(field, serializers.ListSerializer):
+                child = RowSerializer(field.child)
+            self.relations[name] = (model_field.related_model,
+                                    model_field.related_query_name(), child)
+            return itemgetter(name)
+
+        if isinstance(field, PLAIN_FIELDS):
+            represent = None
+        elif isinstance(field, serializers.DecimalField):
+            represent = decimal_field(field)
+        elif isinstance(field, serializers.FileField):
+            represent = file_field(field, model_field.storage, request)
+        elif isinstance(field, serializers.ChoiceField):
+            represent = field.to_representation
+        else:
+            raise TypeError(f'{type(field).__name__} {name!r} cannot be '
+                            f'represented from rows')
+        self.columns.add(field.source)
+        column = itemgetter(field.source)
+        if represent is None:
+            return column
+
+        def get(row):
+            value = column(row)
+            return None if value is None else represent(value)
+        return get
+
+    def values(self, queryset, *extra):
+        """Return `queryset` as rows of the columns the fields read
+
+        `extra` names further columns or annotations to include, such as
+        those a paginator reads from the rows.
+        """
+        return queryset.prefetch_related(None).values(
+            *sorted(self.columns | set(extra)))
+
+    def related(self, name, pks):
+        """Return the represented relation `name` of `pks`, by pk"""
+        related_model, query_name, child = self.relations[name]
+        # joined the way prefetch_related does, so items keep its order
+        links = related_model.objects.filter(**{f'{query_name}__in': pks})
+        grouped = defaultdict(list)
+        if child is None:
+            for pk, related_pk in links.values_list(query_name, 'pk'):
+                grouped[pk].append(related_pk)
+            return grouped
+        for row in links.values(query_name, *sorted(child.columns)):
+            grouped[row[query_name]].append(child.represent_row(row))
+        return grouped
+
+    def represent_row(self, row):
+        return {name: get(row) for name, get in self.getters}
+
+    def represent(self, rows):
+        """Return the representation of every row, in order"""
+        pks = [row['id'] for row in rows]
+        for name in self.relations:
+            grouped = self.related(name, pks) if pks else {}
+            for row in rows:
+                row[name] = grouped.get(row['id'], [])
+        return [self.represent_row(row) for row in rows]
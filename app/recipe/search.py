@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections
+from django.db.models import (Case, Exists, F, FloatField, OuterRef, Q,
+                              Subquery, Value, When)
+from django.db.models.functions import Cast
+
+from core.models import Ingredient, Recipe, Tag
+
+
+def is_postgresql(using):
+    return connections[using].vendor == 'postgresql'
+
+
+def _names(model):
+    """Subquery concatenating the names of a recipe's related objects"""
+    return Subquery(
+        model.objects.filter(recipe=OuterRef('pk'))
+        .values('recipe')
+        .annotate(names=StringAgg('name', ' '))
+        .values('names')
+    )
+
+
+def update_search_vectors(recipe_ids, using='default'):
+    """Rebuild the stored search document of the given recipes
+
+    The document weights the title above tag and ingredient names and is
+    computed by one UPDATE for all ids. Only PostgreSQL stores documents;
+    other databases search with the fallback in `search_recipes`.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids or not is_postgresql(using):
+        return
+    config = settings.RECIPE_SEARCH_CONFIG
+    Recipe.objects.using(using).filter(pk__in=recipe_ids).update(
+        search_vector=(
+            SearchVector('title', weight='A', config=config) +
+            SearchVector(_names(Tag), weight='B', config=config) +
+            SearchVector(_names(Ingredient), weight='B', config=config)
+        )
+    )
+
+
+def update_related_search_vectors(model, pks, using='default'):
+    """Rebuild the documents of recipes using the given objects"""
+    if model is Recipe:
+        update_search_vectors(pks, using)
+        return
+    if not is_postgresql(using):
+        return
+    field = 'tags' if model is Tag else 'ingredients'
+    update_search_vectors(
+        Recipe.objects.using(using).filter(**{f'{field}__in': pks})
+        .values_list('pk', flat=True).distinct(),
+        using
+    )
+
+
+def search_recipes(queryset, terms):
+    """Filter `queryset` to recipes matching `terms`, ranked
+
+    Matching recipes are annotated with `search_rank`. PostgreSQL uses
+    the GIN indexed `search_vector`; other databases fall back to a
+    case-insensitive match of every word against the title, tag and
+    ingredient names, ranking title matches first.
+    """
+    if is_postgresql(queryset.db):
+        # Ranks are cast from real so cursors round-trip them exactly
+        query = SearchQuery(terms, config=settings.RECIPE_SEARCH_CONFIG)
+        return queryset.annotate(search_rank=Cast(
+            SearchRank(F('search_vector'), query), FloatField()
+        )).filter(search_vector=query)
+
+    rank = Value(0.0, output_field=FloatField())
+    for word in terms.split():
+        queryset = queryset.filter(
+            Q(title__icontains=word) |
+            Q(Exists(Tag.objects.filter(recipe=OuterRef('pk'),
+                                        name__icontains=word))) |
+            Q(Exists(Ingredient.objects.filter(recipe=OuterRef('pk'),
+                                               name__icontains=word)))
+        )
+        rank = rank + Case(
+            When(title__icontains=word, then=Value(1.0)),
+            default=Value(0.1),
+            output_field=FloatField()
+        )
+    return queryset.annotate(search_rank=rank)
@@ -1,5 +1,166 @@
+import os
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Prefetch
+from django.utils.text import get_valid_filename
+from django.utils.translation import ugettext_lazy as _
 from rest_framework import serializers
-from core.models import Tag, Ingredient, Recipe
+from rest_framework.relations import MANY_RELATION_KWARGS, ManyRelatedField
+from PIL import Image
+from core.models import ImageStatus, ImageUpload, Tag, Ingredient, Recipe
+from recipe import counters, images, uploads
+
+
+class UserOwnedManyRelatedField(ManyRelatedField):
+    """Resolve a list of primary keys with a single `IN` query"""
+    default_error_messages = {
+        'does_not_exist': _('Invalid pks {pk_values} - objects do not exist.'),
+    }
+    # objects fetched ahead for a whole list of items, keyed by pk
+    resolved = None
+
+    def resolve(self, items):
+        """Fetch the related objects of every item in one query"""
+        pks = set()
+        for item in items:
+            values = item.get(self.field_name) \
+                if isinstance(item, dict) else None
+            if not isinstance(values, list):
+                continue
+            for pk in values:
+                # invalid ids are left to to_internal_value to report
+                try:
+                    pks.add(int(pk))
+                except (TypeError, ValueError):
+                    pass
+        self.resolved = self.child_relation.get_queryset().in_bulk(pks)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        pks = []
+        for pk in data:
+            try:
+                pks.append(int(pk))
+            except (TypeError, ValueError):
+                self.child_relation.fail('incorrect_type',
+                                         data_type=type(pk).__name__)
+        pks = list(dict.fromkeys(pks))
+        if self.resolved is None:
+            found = self.child_relation.get_queryset().in_bulk(pks)
+        else:
+            found = {pk: self.resolved[pk]
+                     for pk in pks if pk in self.resolved}
+        missing = [pk for pk in pks if pk not in found]
+        if missing:
+            self.fail('does_not_exist', pk_values=missing)
+        return [found[pk] for pk in pks]
+
+
+class UserOwnedRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field limited to objects of the requesting user
+
+    With `many=True` all submitted ids are resolved together and every
+    missing or foreign id is reported in one error.
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return UserOwnedManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is not None:
+            queryset = queryset.filter(user=request.user)
+        return queryset
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """List serializer writing all items with batched queries
+
+    Rows are inserted with one `bulk_create` (or updated with one
+    `bulk_update`) and the M2M through rows of every item are written
+    with a single insert per relation.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            for field in self.child.fields.values():
+                if isinstance(field, UserOwnedManyRelatedField) \
+                        and not field.read_only:
+                    field.resolve(data)
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        relations = self._pop_relations(model, validated_data)
+        objs = [model(**attrs) for attrs in validated_data]
+        connection = connections[model.objects.db]
+        if connection.features.can_return_rows_from_bulk_insert:
+            model.objects.bulk_create(objs)
+        else:
+            for obj in objs:
+                obj.save(force_insert=True)
+        self._write_relations(model, objs, relations, replace=False)
+        return objs
+
+    def update(self, instances, validated_data):
+        model = self.child.Meta.model
+        relations = self._pop_relations(model, validated_data)
+        fields = set()
+        for obj, attrs in zip(instances, validated_data):
+            for name, value in attrs.items():
+                setattr(obj, name, value)
+                fields.add(name)
+        if fields:
+            model.objects.bulk_update(instances, sorted(fields))
+        self._write_relations(model, instances, relations, replace=True)
+        return instances
+
+    def _pop_relations(self, model, validated_data):
+        """Remove and return the M2M values of every item"""
+        names = [field.name for field in model._meta.many_to_many]
+        return [
+            {name: attrs.pop(name) for name in names if name in attrs}
+            for attrs in validated_data
+        ]
+
+    def _write_relations(self, model, objs, relations, replace):
+        """Write the given M2M links of `objs` in one batch each"""
+        for field in model._meta.many_to_many:
+            through = field.remote_field.through
+            source = f'{field.m2m_field_name()}_id'
+            target = f'{field.m2m_reverse_field_name()}_id'
+            changed = [(obj, rel[field.name])
+                       for obj, rel in zip(objs, relations)
+                       if field.name in rel]
+            if not changed:
+                continue
+            affected = set()
+            if replace:
+                stale = through.objects.filter(**{
+                    f'{source}__in': [obj.pk for obj, _ in changed]
+                })
+                affected.update(stale.values_list(target, flat=True))
+                stale.delete()
+            links = [
+                through(**{source: obj.pk, target: related.pk})
+                for obj, values in changed
+                for related in dict.fromkeys(values)
+            ]
+            through.objects.bulk_create(links)
+            affected.update(getattr(link, target) for link in links)
+            counters.recount(field.related_model, affected)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -9,6 +170,7 @@ class TagSerializer(serializers.ModelSerializer):
         model = Tag
         fields = ('id', 'name')
         read_only_fields = ('id',)
+        list_serializer_class = BulkListSerializer
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -18,16 +180,64 @@ class IngredientSerializer(serializers.ModelSerializer):
         model = Ingredient
         fields = ('id', 'name')
         read_only_fields = ('id',)
+        list_serializer_class = BulkListSerializer
+
+
+class SparseFieldsetMixin:
+    """Output only the `fields` of the context, nesting `expand` ones
+
+    `select` restricts a queryset to the columns and relations those
+    fields read, so omitted fields are not queried at all.
+    """
+    # serializers nesting the relations that may be expanded
+    expandable = {}
+    # model columns read by fields not named after one
+    field_columns = {}
 
+    def get_fields(self):
+        fields = super().get_fields()
+        for name in self.context.get('expand', ()):
+            if name in fields:
+                fields[name] = self.expandable[name](many=True,
+                                                     read_only=True)
+        wanted = self.context.get('fields')
+        if wanted is not None:
+            fields = OrderedDict((name, field) for name, field
+                                 in fields.items() if name in wanted)
+        return fields
 
-class RecipeSerializer(serializers.ModelSerializer):
+    @classmethod
+    def select(cls, queryset, fields=None, expand=()):
+        """Load the columns and relations shown by the given fieldset"""
+        columns = {'id'}
+        prefetches = []
+        for name in cls.Meta.fields if fields is None else fields:
+            if name not in cls.expandable:
+                columns.update(cls.field_columns.get(name, (name,)))
+                continue
+            nested = name in expand or isinstance(
+                cls._declared_fields.get(name), serializers.BaseSerializer)
+            related = queryset.model._meta.get_field(name).related_model
+            prefetches.append(Prefetch(name, queryset=related.objects.only(
+                *(cls.expandable[name].Meta.fields if nested else ('id',)))
+            ))
+        if fields is not None:
+            queryset = queryset.only(*columns)
+        return queryset.prefetch_related(*prefetches)
+
+
+class RecipeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Recipe Model"""
+    expandable = {
+        'tags': TagSerializer,
+        'ingredients': IngredientSerializer,
+    }
 
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = UserOwnedRelatedField(
         many=True,
         queryset=Ingredient.objects.all()
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserOwnedRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
@@ -41,9 +251,11 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'link',
                   'ingredients',
                   'tags',
-                  'image'
+                  'image',
+                  'image_status'
                   )
-        read_only_fields = ('id', 'image')
+        read_only_fields = ('id', 'image', 'image_status')
+        list_serializer_class = BulkListSerializer
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -51,12 +263,97 @@ class RecipeDetailSerializer(RecipeSerializer):
 
     ingredients = IngredientSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
+    thumbnails = serializers.SerializerMethodField()
+
+    field_columns = {'thumbnails': ('image', 'image_status')}
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('thumbnails',)
+
+    def get_thumbnails(self, recipe):
+        """Return the thumbnail URL of each size once processed"""
+        return self.thumbnail_urls(recipe.image.name, recipe.image_status)
+
+    def get_thumbnails_from_row(self, row):
+        return self.thumbnail_urls(row['image'], row['image_status'])
+
+    def thumbnail_urls(self, image, image_status):
+        if not image or image_status != ImageStatus.READY:
+            return {}
+        storage = Recipe._meta.get_field('image').storage
+        request = self.context.get('request')
+        urls = {}
+        for size, name in images.thumbnail_names(image).items():
+            url = storage.url(name)
+            urls[str(size)] = (request.build_absolute_uri(url)
+                               if request else url)
+        return urls
+
+
+class ImageUploadField(serializers.FileField):
+    """Accept an image upload after checking only its header
+
+    Uploads are decoded and verified off-request by `recipe.images`, the
+    processed image of the recipe is what gets represented.
+    """
+    default_error_messages = {
+        'invalid_image': _(
+            'Upload a valid image. The file you uploaded was either not an '
+            'image or a corrupted image.'
+        ),
+    }
+
+    def to_internal_value(self, data):
+        file = super().to_internal_value(data)
+        try:
+            Image.open(file)
+        except images.INVALID_IMAGE_ERRORS:
+            self.fail('invalid_image')
+        file.seek(0)
+        return file
+
+    def get_attribute(self, instance):
+        return instance.image
 
 
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading Image to recipe"""
+    image = ImageUploadField(source='image_upload')
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
-        read_only_fields = ('id',)
+        fields = ('id', 'image', 'image_status')
+        read_only_fields = ('id', 'image_status')
+
+    def update(self, instance, validated_data):
+        """Queue the upload, replacing one still waiting"""
+        if instance.image_upload:
+            instance.image_upload.delete(save=False)
+        validated_data['image_status'] = ImageStatus.PENDING
+        return super().update(instance, validated_data)
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    """Serializer for resumable recipe image uploads"""
+    next_chunk = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImageUpload
+        fields = ('id', 'file_name', 'size', 'chunk_size', 'offset',
+                  'next_chunk')
+        read_only_fields = ('id', 'chunk_size', 'offset')
+
+    def validate_file_name(self, value):
+        """Keep only a safe base name of the uploaded file"""
+        return get_valid_filename(os.path.basename(value))
+
+    def validate_size(self, value):
+        """Check the announced size is within the upload limit"""
+        if not 0 < value <= settings.RECIPE_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                _('Ensure this value is between 1 and %d.')
+                % settings.RECIPE_UPLOAD_MAX_SIZE)
+        return value
+
+    def get_next_chunk(self, upload):
+        return uploads.next_chunk(upload)
@@ -0,0 +1,203 @@
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from core.models import (ImageUpload, Ingredient, Recipe, Tag,
+                         bump_data_version)
+from recipe import cache, counters, images, search, uploads
+
+
+# users and kinds changed inside collect_changes(), by thread
+_collected = threading.local()
+
+
+def data_changed(user_id, *kinds):
+    """Invalidate cached `kinds` lists and bump the user's data version
+
+    Inside `collect_changes()` this only records the change.
+    """
+    changes = getattr(_collected, 'changes', None)
+    if changes is not None:
+        changes.setdefault(user_id, set()).update(kinds)
+        return
+    for kind in kinds:
+        cache.invalidate(kind, user_id)
+    bump_data_version(user_id)
+
+
+@contextmanager
+def collect_changes():
+    """Announce the data changes of a block once per user when it exits
+
+    A single write fires several signals, so a request collects them to
+    run one version bump per user rather than one per signal.
+    """
+    if getattr(_collected, 'changes', None) is not None:
+        yield
+        return
+    _collected.changes = changes = {}
+    try:
+        yield
+    finally:
+        _collected.changes = None
+        for user_id, kinds in changes.items():
+            data_changed(user_id, *sorted(kinds))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def attr_deleting(sender, instance, using, **kwargs):
+    """Remember the recipes whose search document loses a name"""
+    if search.is_postgresql(using):
+        instance._search_recipe_ids = list(
+            instance.recipe_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, instance, using, **kwargs):
+    """Invalidate the owner's cached tag lists"""
+    data_changed(instance.user_id, 'tag')
+    if not kwargs.get('created'):
+        _update_attr_recipes(sender, instance, using)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, instance, using, **kwargs):
+    """Invalidate the owner's cached ingredient lists"""
+    data_changed(instance.user_id, 'ingredient')
+    if not kwargs.get('created'):
+        _update_attr_recipes(sender, instance, using)
+
+
+def _update_attr_recipes(sender, instance, using):
+    """Refresh the search documents mentioning a tag or ingredient"""
+    recipe_ids = getattr(instance, '_search_recipe_ids', None)
+    if recipe_ids is None:
+        search.update_related_search_vectors(sender, [instance.pk], using)
+    else:
+        search.update_search_vectors(recipe_ids, using)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, using, **kwargs):
+    """Record a change to the owner's recipes"""
+    data_changed(instance.user_id)
+    search.update_search_vectors([instance.pk], using)
+
+
+def _relations_changed(instance, action, reverse, pk_set, using):
+    """Refresh search documents after an M2M change"""
+    if action == 'pre_clear' and reverse:
+        instance._search_recipe_ids = list(
+            instance.recipe_set.values_list('pk', flat=True))
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif action == 'post_clear':
+        recipe_ids = instance.__dict__.pop('_search_recipe_ids', [])
+    else:
+        recipe_ids = pk_set
+    search.update_search_vectors(recipe_ids, using)
+
+
+def _counts_changed(sender, model, instance, action, reverse, pk_set,
+                    using):
+    """Keep the `recipe_count` of tags or ingredients in step with links"""
+    name = model._meta.model_name
+    links = sender.objects.using(using)
+    if action == 'pre_remove':
+        # remove() reports the requested ids, linked or not
+        if reverse:
+            removed = links.filter(
+                **{name: instance, 'recipe__in': pk_set}
+            ).values_list('recipe', flat=True)
+        else:
+            removed = links.filter(
+                **{'recipe': instance, f'{name}__in': pk_set}
+            ).values_list(name, flat=True)
+        instance._count_removed = list(removed)
+    elif action == 'pre_clear' and not reverse:
+        instance._count_removed = list(
+            links.filter(recipe=instance).values_list(name, flat=True))
+    elif action == 'post_add':
+        if reverse:
+            counters.adjust(model, [instance.pk], len(pk_set), using)
+        else:
+            counters.adjust(model, pk_set, 1, using)
+    elif action == 'post_clear' and reverse:
+        model.objects.using(using).filter(pk=instance.pk).update(
+            recipe_count=0)
+    elif action in ('post_remove', 'post_clear'):
+        removed = instance.__dict__.pop('_count_removed', [])
+        if reverse:
+            counters.adjust(model, [instance.pk], -len(removed), using)
+        else:
+            counters.adjust(model, removed, -1, using)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, using,
+                        **kwargs):
+    """Invalidate tag lists filtered by assignment"""
+    if action.startswith('post_'):
+        data_changed(instance.user_id, 'tag')
+    _counts_changed(sender, Tag, instance, action, reverse, pk_set, using)
+    _relations_changed(instance, action, reverse, pk_set, using)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed(sender, instance, action, reverse, pk_set,
+                               using, **kwargs):
+    """Invalidate ingredient lists filtered by assignment"""
+    if action.startswith('post_'):
+        data_changed(instance.user_id, 'ingredient')
+    _counts_changed(sender, Ingredient, instance, action, reverse, pk_set,
+                    using)
+    _relations_changed(instance, action, reverse, pk_set, using)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, using, **kwargs):
+    """Remember the tags and ingredients losing a recipe"""
+    instance._count_tags = list(
+        instance.tags.using(using).values_list('pk', flat=True))
+    instance._count_ingredients = list(
+        instance.ingredients.using(using).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, using, **kwargs):
+    """Invalidate lists and release the image that went with the recipe"""
+    data_changed(instance.user_id, 'tag', 'ingredient')
+    counters.adjust(Tag, getattr(instance, '_count_tags', []), -1, using)
+    counters.adjust(Ingredient, getattr(instance, '_count_ingredients', []),
+                    -1, using)
+    if instance.image:
+        transaction.on_commit(
+            partial(images.release, instance.image.storage,
+                    instance.image.name),
+            using=using
+        )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_created(sender, instance, created, **kwargs):
+    """Start new users from a clean cache generation"""
+    if created:
+        cache.invalidate('tag', instance.pk)
+        cache.invalidate('ingredient', instance.pk)
+
+
+@receiver(post_delete, sender=ImageUpload)
+def image_upload_deleted(sender, instance, **kwargs):
+    """Remove the partial file of a finished or abandoned upload"""
+    uploads.discard(instance)
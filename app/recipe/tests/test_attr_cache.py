@@ -0,0 +1,108 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.mixins import ListModelMixin
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def sample_recipe(user):
+    return Recipe.objects.create(user=user, title='cached recipe',
+                                 time_minutes=5, price=5)
+
+
+class AttrListCacheTest(TestCase):
+    """Test caching of the tag and ingredient lists"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='cache@test.com',
+            password='cachepass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def names(self, url, **params):
+        res = self.client.get(url, params)
+        return [item['name'] for item in res.data['results']]
+
+    def test_list_served_from_cache(self):
+        """Test a repeated list request only looks up the data version"""
+        Tag.objects.create(user=self.user, name='cached')
+        self.names(TAGS_URL)
+
+        with self.assertNumQueries(1):
+            names = self.names(TAGS_URL)
+
+        self.assertEqual(names, ['cached'])
+
+    def test_create_invalidates(self):
+        """Test that saving a tag refreshes the cached list"""
+        self.names(TAGS_URL)
+        self.client.post(TAGS_URL, {'name': 'fresh'})
+
+        self.assertEqual(self.names(TAGS_URL), ['fresh'])
+
+    def test_delete_invalidates(self):
+        """Test that deleting an ingredient refreshes the cached list"""
+        ingredient = Ingredient.objects.create(user=self.user, name='salt')
+        self.names(INGREDIENTS_URL)
+        ingredient.delete()
+
+        self.assertEqual(self.names(INGREDIENTS_URL), [])
+
+    def test_assignment_invalidates(self):
+        """Test that linking and unlinking recipes refreshes assigned lists"""
+        tag = Tag.objects.create(user=self.user, name='linked')
+        recipe = sample_recipe(self.user)
+        self.assertEqual(self.names(TAGS_URL, assigned_only=1), [])
+
+        recipe.tags.add(tag)
+        self.assertEqual(self.names(TAGS_URL, assigned_only=1), ['linked'])
+
+        recipe.delete()
+        self.assertEqual(self.names(TAGS_URL, assigned_only=1), [])
+
+    def test_assigned_only_cached_separately(self):
+        """Test that assigned_only lists do not share cache entries"""
+        ingredient = Ingredient.objects.create(user=self.user, name='egg')
+        Ingredient.objects.create(user=self.user, name='milk')
+        sample_recipe(self.user).ingredients.add(ingredient)
+
+        self.assertEqual(self.names(INGREDIENTS_URL), ['milk', 'egg'])
+        self.assertEqual(
+            self.names(INGREDIENTS_URL, assigned_only=1), ['egg'])
+
+    def test_other_users_cache_kept(self):
+        """Test that a change only invalidates the owner's lists"""
+        other = get_user_model().objects.create_user(
+            email='other@test.com',
+            password='otherpass'
+        )
+        self.names(TAGS_URL)
+        Tag.objects.create(user=other, name='not mine')
+
+        with self.assertNumQueries(1):
+            self.names(TAGS_URL)
+
+    def test_invalidated_during_list_not_cached(self):
+        """Test a list read before an invalidation is not served after it"""
+        tag = Tag.objects.create(user=self.user, name='old')
+        list_tags = ListModelMixin.list
+
+        def rename_while_listing(view, request, *args, **kwargs):
+            response = list_tags(view, request, *args, **kwargs)
+            tag.name = 'new'
+            tag.save()
+            return response
+
+        with patch.object(ListModelMixin, 'list', rename_while_listing):
+            self.assertEqual(self.names(TAGS_URL), ['old'])
+
+        self.assertEqual(self.names(TAGS_URL), ['new'])
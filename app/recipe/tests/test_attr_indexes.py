@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+ENDPOINTS = (
+    (Tag, reverse('recipe:tag-list'), 'core_tag_user_name_idx'),
+    (Ingredient, reverse('recipe:ingredient-list'),
+     'core_ingredient_user_name_idx'),
+)
+
+
+class AttrListQueryPlanTest(TestCase):
+    """Test the tag and ingredient lists are answered by their indexes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='plan@test.com',
+            password='planpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        recipe = Recipe.objects.create(user=self.user, title='planned',
+                                       time_minutes=5, price=5)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='a'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='a'))
+
+    def list_sql(self, model, url):
+        """Return the SQL of the uncached assigned_only list query"""
+        caches[settings.RECIPE_CACHE_ALIAS].clear()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url, {'assigned_only': 1})
+        table = connection.ops.quote_name(model._meta.db_table)
+        return next(q['sql'] for q in ctx.captured_queries
+                    if f'FROM {table}' in q['sql'])
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute(f'EXPLAIN {sql}')
+            else:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return '\n'.join(str(row) for row in cursor.fetchall())
+
+    def test_assigned_only_reads_counter(self):
+        """Test assigned_only filters on the stored recipe count"""
+        for model, url, _ in ENDPOINTS:
+            sql = self.list_sql(model, url)
+
+            self.assertIn('"recipe_count" > 0', sql)
+            self.assertNotIn('JOIN', sql)
+            self.assertNotIn('DISTINCT', sql)
+
+    def test_list_uses_user_name_index(self):
+        """Test the list plan reads the (user, name) index"""
+        for model, url, index in ENDPOINTS:
+            plan = self.explain(self.list_sql(model, url))
+
+            self.assertIn(index, plan)
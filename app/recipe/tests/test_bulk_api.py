@@ -0,0 +1,178 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+TAGS_URL = reverse('recipe:tag-list')
+TAGS_BULK_URL = reverse('recipe:tag-bulk')
+RECIPES_BULK_URL = reverse('recipe:recipe-bulk')
+
+
+class BulkApiTest(TestCase):
+    """Test the bulk create and update endpoints"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='bulk@test.com',
+            password='bulkpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='bulk tag')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='bulk ingredient')
+
+    def recipe_payload(self, count):
+        return [{
+            'title': f'bulk recipe {i}',
+            'time_minutes': i,
+            'price': '1.50',
+            'tags': [self.tag.id],
+            'ingredients': [self.ingredient.id],
+        } for i in range(count)]
+
+    def test_bulk_create_tags(self):
+        """Test creating several tags in one request"""
+        res = self.client.post(TAGS_BULK_URL,
+                               [{'name': 'one'}, {'name': 'two'}],
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item['name'] for item in res.data], ['one', 'two'])
+        self.assertEqual(
+            Tag.objects.filter(user=self.user, name__in=['one', 'two'])
+            .count(), 2)
+
+    def test_bulk_create_refreshes_cached_list(self):
+        """Test that bulk writes invalidate the cached tag list"""
+        self.client.get(TAGS_URL)
+        self.client.post(TAGS_BULK_URL, [{'name': 'zzz'}], format='json')
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.data['results'][0]['name'], 'zzz')
+
+    def test_bulk_create_recipes(self):
+        """Test recipes and their relations are created in batches"""
+        res = self.client.post(RECIPES_BULK_URL, self.recipe_payload(3),
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        for item in res.data:
+            recipe = Recipe.objects.get(id=item['id'], user=self.user)
+            self.assertEqual(list(recipe.tags.all()), [self.tag])
+            self.assertEqual(list(recipe.ingredients.all()),
+                             [self.ingredient])
+            self.assertEqual(item['tags'], [self.tag.id])
+
+    def test_bulk_create_constant_queries(self):
+        """Test the query count does not grow with the item count"""
+        counts = []
+        for size in (2, 8):
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.post(RECIPES_BULK_URL, self.recipe_payload(size),
+                                 format='json')
+            counts.append(len(ctx.captured_queries))
+
+        if connection.features.can_return_rows_from_bulk_insert:
+            self.assertEqual(counts[0], counts[1])
+
+    def test_bulk_create_invalid_item(self):
+        """Test one invalid item rejects the whole batch"""
+        payload = self.recipe_payload(2)
+        del payload[1]['title']
+
+        res = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('title', res.data[1])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_update_recipes(self):
+        """Test updating fields and relations of several recipes"""
+        recipes = [Recipe.objects.create(user=self.user, title=f'r{i}',
+                                         time_minutes=1, price=1)
+                   for i in range(2)]
+        recipes[0].ingredients.add(self.ingredient)
+        payload = [
+            {'id': recipes[0].id, 'title': 'renamed', 'ingredients': []},
+            {'id': recipes[1].id, 'tags': [self.tag.id]},
+        ]
+
+        res = self.client.patch(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for recipe in recipes:
+            recipe.refresh_from_db()
+        self.assertEqual(recipes[0].title, 'renamed')
+        self.assertEqual(recipes[0].ingredients.count(), 0)
+        self.assertEqual(recipes[1].title, 'r1')
+        self.assertEqual(list(recipes[1].tags.all()), [self.tag])
+
+    def test_bulk_create_string_ids(self):
+        """Test related ids given as strings are accepted in bulk"""
+        payload = self.recipe_payload(1)
+        payload[0]['tags'] = [str(self.tag.id)]
+
+        res = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data[0]['tags'], [self.tag.id])
+
+    def test_bulk_ignores_list_filters(self):
+        """Test the list filters of the query string do not hide writes"""
+        other = Tag.objects.create(user=self.user, name='other tag')
+
+        res = self.client.post(f'{RECIPES_BULK_URL}?tags={other.id}',
+                               self.recipe_payload(1), format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data[0]['tags'], [self.tag.id])
+
+        res = self.client.post(f'{TAGS_BULK_URL}?assigned_only=1',
+                               [{'name': 'unused'}], format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data[0]['name'], 'unused')
+
+    def test_bulk_update_other_users_recipe(self):
+        """Test items owned by another user are reported as missing"""
+        other = get_user_model().objects.create_user(
+            email='other-bulk@test.com',
+            password='bulkpass'
+        )
+        recipe = Recipe.objects.create(user=other, title='theirs',
+                                       time_minutes=1, price=1)
+
+        res = self.client.patch(RECIPES_BULK_URL,
+                                [{'id': recipe.id, 'title': 'mine'}],
+                                format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data[0])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'theirs')
+
+    def test_bulk_update_duplicate_ids(self):
+        """Test an object can only be updated by one item of a batch"""
+        recipe = Recipe.objects.create(user=self.user, title='once',
+                                       time_minutes=1, price=1)
+        payload = [{'id': recipe.id, 'tags': [self.tag.id]}] * 2
+
+        res = self.client.patch(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('id', res.data[1])
+        self.assertFalse(recipe.tags.exists())
+
+    def test_bulk_requires_list(self):
+        """Test a single object payload is rejected"""
+        res = self.client.post(TAGS_BULK_URL, {'name': 'x'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,156 @@
+import io
+import os
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageStatus, ImageUpload, Recipe
+from recipe import images
+
+CHUNK_SIZE = 1024
+
+
+def image_bytes():
+    buffer = io.BytesIO()
+    Image.effect_noise((120, 90), 64).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(RECIPE_UPLOAD_CHUNK_SIZE=CHUNK_SIZE,
+                   RECIPE_UPLOAD_TEMP_DIR=tempfile.mkdtemp())
+class ChunkedUploadApiTest(TestCase):
+    """Test resumable chunked recipe image uploads"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='chunks@test.com',
+            password='chunkspass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(user=self.user, title='chunked',
+                                            time_minutes=5, price=5)
+        self.data = image_bytes()
+
+    def start(self, size=None, recipe=None):
+        url = reverse('recipe:recipe-upload-start',
+                      args=[(recipe or self.recipe).id])
+        return self.client.post(url, {
+            'file_name': '../photo.png',
+            'size': len(self.data) if size is None else size,
+        })
+
+    def session_url(self, name, upload_id, *args):
+        return reverse(f'recipe:recipe-{name}',
+                       args=[self.recipe.id, upload_id, *args])
+
+    def put_chunk(self, upload_id, index, data=None):
+        if data is None:
+            data = self.data[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+        return self.client.put(
+            self.session_url('upload-chunk', upload_id, index), data,
+            content_type='application/octet-stream')
+
+    def partial(self, upload):
+        return ImageUpload(pk=upload['id']).path
+
+    def test_upload_in_chunks(self):
+        """Test chunks are assembled and handed to the image pipeline"""
+        upload = self.start().data
+        chunks = -(-len(self.data) // CHUNK_SIZE)
+
+        for index in range(chunks):
+            res = self.put_chunk(upload['id'], index)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.post(
+            self.session_url('upload-finalize', upload['id']))
+
+        self.assertEqual(upload['chunk_size'], CHUNK_SIZE)
+        self.assertEqual(upload['file_name'], 'photo.png')
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['image_status'], ImageStatus.PENDING)
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertFalse(os.path.exists(self.partial(upload)))
+        images.process_pending()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.READY)
+
+    def test_resume_upload(self):
+        """Test the session reports where to resume after a failure"""
+        upload_id = self.start().data['id']
+        self.put_chunk(upload_id, 0)
+
+        res = self.client.get(self.session_url('upload', upload_id))
+        again = self.put_chunk(upload_id, 0)
+
+        self.assertEqual(res.data['offset'], CHUNK_SIZE)
+        self.assertEqual(res.data['next_chunk'], 1)
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.data['offset'], CHUNK_SIZE)
+
+    def test_chunk_out_of_order(self):
+        """Test a chunk leaving a gap is refused with the resume point"""
+        upload_id = self.start().data['id']
+
+        res = self.put_chunk(upload_id, 2)
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data['next_chunk'], 0)
+
+    def test_short_chunk_not_acknowledged(self):
+        """Test a chunk with missing bytes does not move the offset"""
+        upload_id = self.start().data['id']
+
+        res = self.put_chunk(upload_id, 0, self.data[:100])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ImageUpload.objects.get().offset, 0)
+
+    def test_finalize_incomplete(self):
+        """Test an upload cannot be finalized before every chunk arrived"""
+        upload_id = self.start().data['id']
+        self.put_chunk(upload_id, 0)
+
+        res = self.client.post(self.session_url('upload-finalize', upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data['offset'], CHUNK_SIZE)
+
+    @override_settings(RECIPE_UPLOAD_MAX_SIZE=100)
+    def test_upload_too_large(self):
+        """Test sessions announcing too large files are refused"""
+        res = self.start()
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('size', res.data)
+
+    def test_upload_other_users_recipe(self):
+        """Test uploads cannot target another user's recipe"""
+        other = get_user_model().objects.create_user(
+            email='other-chunks@test.com',
+            password='chunkspass'
+        )
+        recipe = Recipe.objects.create(user=other, title='theirs',
+                                       time_minutes=5, price=5)
+
+        res = self.start(recipe=recipe)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_expired_upload(self):
+        """Test abandoned sessions expire together with their file"""
+        upload = self.start().data
+        ImageUpload.objects.update(
+            created=timezone.now() - timedelta(days=2))
+
+        res = self.put_chunk(upload['id'], 0)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(os.path.exists(self.partial(upload)))
@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class ConditionalGetTest(TestCase):
+    """Test ETag based conditional requests on the recipe api"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='etag@test.com',
+            password='etagpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='etag', time_minutes=1, price=1)
+
+    def test_not_modified(self):
+        """Test a matching ETag is answered by a single user lookup"""
+        for url in (RECIPES_URL, detail_url(self.recipe.id),
+                    TAGS_URL, INGREDIENTS_URL):
+            etag = self.client.get(url)['ETag']
+
+            with self.assertNumQueries(1):
+                res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(res['ETag'], etag)
+
+    def test_etag_changes_on_write(self):
+        """Test that every kind of write produces a new ETag"""
+        tag = Tag.objects.create(user=self.user, name='t')
+        ingredient = Ingredient.objects.create(user=self.user, name='i')
+        writes = (
+            lambda: self.recipe.tags.add(tag),
+            lambda: self.recipe.ingredients.add(ingredient),
+            lambda: Tag.objects.create(user=self.user, name='t2'),
+            lambda: Ingredient.objects.create(user=self.user, name='i2'),
+            lambda: self.client.patch(detail_url(self.recipe.id),
+                                      {'title': 'new'}),
+            lambda: self.recipe.tags.clear(),
+            lambda: self.recipe.delete(),
+        )
+        for write in writes:
+            etag = self.client.get(RECIPES_URL)['ETag']
+            write()
+
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(res['ETag'], etag)
+
+    def test_version_bumped_once_per_request(self):
+        """Test a write firing several signals bumps the version once"""
+        tag = Tag.objects.create(user=self.user, name='t')
+        ingredient = Ingredient.objects.create(user=self.user, name='i')
+        self.user.refresh_from_db()
+        version = self.user.data_version
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(RECIPES_URL, {
+                'title': 'new', 'time_minutes': 1, 'price': '1.00',
+                'tags': [tag.id], 'ingredients': [ingredient.id],
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        bumps = [query for query in ctx.captured_queries
+                 if 'data_version' in query['sql']]
+        self.assertEqual(len(bumps), 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.data_version, version + 1)
+
+    def test_etag_scoped_to_user(self):
+        """Test another user's writes keep the ETag valid"""
+        other = get_user_model().objects.create_user(
+            email='other-etag@test.com',
+            password='etagpass'
+        )
+        etag = self.client.get(RECIPES_URL)['ETag']
+        Recipe.objects.create(user=other, title='x', time_minutes=1, price=1)
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_depends_on_query(self):
+        """Test that different query strings get different ETags"""
+        first = self.client.get(RECIPES_URL)['ETag']
+        second = self.client.get(RECIPES_URL, {'page_size': 1})['ETag']
+
+        self.assertNotEqual(first, second)
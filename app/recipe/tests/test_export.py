@@ -0,0 +1,98 @@
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+class RecipeExportApiTest(TestCase):
+    """Test streaming the recipes of a user as NDJSON"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='export@test.com',
+            password='exportpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(user=self.user,
+                                                    name='Kale')
+
+    def create_recipes(self, count):
+        for i in range(count):
+            recipe = Recipe.objects.create(user=self.user, title=f'r {i}',
+                                           time_minutes=i, price=1)
+            recipe.tags.add(self.tag)
+            recipe.ingredients.add(self.ingredient)
+
+    def export(self, **params):
+        res = self.client.get(EXPORT_URL, params)
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        return res, [json.loads(line) for line in lines]
+
+    def test_export_recipes(self):
+        """Test every recipe is streamed as one line with its relations"""
+        self.create_recipes(3)
+        other = get_user_model().objects.create_user(
+            email='other-export@test.com',
+            password='exportpass'
+        )
+        Recipe.objects.create(user=other, title='theirs',
+                              time_minutes=5, price=5)
+
+        res, recipes = self.export()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertIn('attachment', res['Content-Disposition'])
+        self.assertEqual([r['title'] for r in recipes],
+                         ['r 2', 'r 1', 'r 0'])
+        self.assertEqual(recipes[0]['tags'],
+                         [{'id': self.tag.id, 'name': 'Vegan'}])
+        self.assertEqual(recipes[0]['ingredients'],
+                         [{'id': self.ingredient.id, 'name': 'Kale'}])
+
+    def test_export_filtered(self):
+        """Test the export honours the recipe list filters"""
+        self.create_recipes(2)
+        Recipe.objects.create(user=self.user, title='untagged',
+                              time_minutes=5, price=5)
+
+        res, recipes = self.export(tags=str(self.tag.id))
+
+        self.assertEqual(len(recipes), 2)
+
+    def test_export_queries_per_batch(self):
+        """Test relations are fetched per batch rather than per recipe"""
+        self.create_recipes(5)
+
+        with patch('recipe.exports.BATCH_SIZE', 2), \
+                CaptureQueriesContext(connection) as ctx:
+            res, recipes = self.export()
+
+        self.assertEqual(len(recipes), 5)
+        # the recipe cursor, then tags and ingredients of 3 batches
+        self.assertEqual(len(ctx.captured_queries), 1 + 3 * 2)
+
+    def test_export_accepts_ndjson(self):
+        """Test clients may ask for NDJSON explicitly"""
+        res = self.client.get(EXPORT_URL,
+                              HTTP_ACCEPT='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_export_auth_required(self):
+        """Test the export is only available to authenticated users"""
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class RecipeFieldsetApiTest(TestCase):
+    """Test sparse fieldsets and expansion of recipe responses"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='fieldsets@test.com',
+            password='fieldsetspass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(user=self.user,
+                                                    name='Kale')
+        self.recipe = Recipe.objects.create(user=self.user, title='sparse',
+                                            time_minutes=5, price=5)
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+
+    def get(self, url=RECIPES_URL, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, params)
+        recipe_queries = [q['sql'] for q in ctx.captured_queries
+                          if 'core_recipe' in q['sql']]
+        return res, recipe_queries
+
+    def test_fields(self):
+        """Test omitted fields are neither returned nor queried"""
+        res, queries = self.get(fields='id,title')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'],
+                         [{'id': self.recipe.id, 'title': 'sparse'}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"price"', queries[0])
+        self.assertNotIn('"image"', queries[0])
+
+    def test_expand(self):
+        """Test expanded relations are nested, others stay ids"""
+        res, queries = self.get(expand='tags')
+
+        recipe = res.data['results'][0]
+        self.assertEqual(recipe['tags'],
+                         [{'id': self.tag.id, 'name': 'Vegan'}])
+        self.assertEqual(recipe['ingredients'], [self.ingredient.id])
+        self.assertIn('price', recipe)
+
+    def test_fields_with_expand(self):
+        """Test only the listed relations are fetched"""
+        res, queries = self.get(fields='id,ingredients',
+                                expand='ingredients,tags')
+
+        self.assertEqual(res.data['results'][0], {
+            'id': self.recipe.id,
+            'ingredients': [{'id': self.ingredient.id, 'name': 'Kale'}],
+        })
+        self.assertFalse(any('core_recipe_tags' in sql for sql in queries))
+
+    def test_detail_fields(self):
+        """Test fields computed from columns load those columns"""
+        url = reverse('recipe:recipe-detail', args=[self.recipe.id])
+
+        res, queries = self.get(url, fields='title,thumbnails')
+
+        self.assertEqual(res.data, {'title': 'sparse', 'thumbnails': {}})
+        self.assertIn('"image_status"', queries[0])
+        self.assertNotIn('"time_minutes"', queries[0])
+
+    def test_unknown_fields(self):
+        """Test asking for fields that do not exist is refused"""
+        for params in ({'fields': 'id,secret'}, {'expand': 'title'}):
+            res, queries = self.get(**params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_writes_return_every_field(self):
+        """Test the fieldset only applies to reads"""
+        res = self.client.post(f'{RECIPES_URL}?fields=id', {
+            'title': 'full',
+            'time_minutes': 5,
+            'price': '5.00',
+            'tags': [self.tag.id],
+            'ingredients': [],
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIn('price', res.data)
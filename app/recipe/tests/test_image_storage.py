@@ -0,0 +1,116 @@
+import io
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.models import ImageBlob, Recipe
+from recipe import images
+
+
+def image_file(color='red', name='photo.jpg'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (300, 200), color).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(RECIPE_IMAGE_STORAGE='content',
+                   MEDIA_ROOT=tempfile.mkdtemp())
+class ContentStorageTest(TestCase):
+    """Test content addressed, reference counted recipe images"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='blobs@test.com',
+            password='blobspass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def recipe_with_image(self, file, title='pictured'):
+        recipe = Recipe.objects.create(user=self.user, title=title,
+                                       time_minutes=5, price=5)
+        self.client.post(
+            reverse('recipe:recipe-upload-image', args=[recipe.id]),
+            {'image': file}, format='multipart')
+        images.process_pending()
+        recipe.refresh_from_db()
+        return recipe
+
+    def delete(self, recipe):
+        with patch('django.db.transaction.on_commit',
+                   lambda func, using=None: func()):
+            recipe.delete()
+
+    def stored(self, name):
+        return os.path.exists(os.path.join(
+            Recipe._meta.get_field('image').storage.location, name))
+
+    def test_same_image_shared(self):
+        """Test recipes with the same image share one stored file"""
+        first = self.recipe_with_image(image_file())
+        second = self.recipe_with_image(image_file(name='copy.jpg'))
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image.name, images.blob_name(
+            first.image.read(), 'jpg'))
+        self.assertEqual(ImageBlob.objects.get().references, 2)
+
+    def test_existing_blob_not_written(self):
+        """Test storing an image already stored writes nothing"""
+        self.recipe_with_image(image_file('blue'))
+
+        with patch.object(FileSystemStorage, 'save', autospec=True,
+                          side_effect=FileSystemStorage.save) as save:
+            self.recipe_with_image(image_file('blue'))
+
+        self.assertEqual(save.call_count, 1)
+        self.assertTrue(save.call_args[0][1].startswith('uploads/pending/'))
+
+    def test_last_reference_deletes_file(self):
+        """Test the blob stays until no recipe shows it"""
+        first = self.recipe_with_image(image_file('green'))
+        second = self.recipe_with_image(image_file('green'))
+        name = first.image.name
+
+        self.delete(first)
+        self.assertTrue(self.stored(name))
+        self.assertEqual(ImageBlob.objects.get().references, 1)
+
+        self.delete(second)
+        self.assertFalse(ImageBlob.objects.exists())
+        for path in (name, *images.thumbnail_names(name).values()):
+            self.assertFalse(self.stored(path))
+
+    def test_upload_same_image_again(self):
+        """Test uploading the image a recipe shows again keeps it"""
+        recipe = self.recipe_with_image(image_file('white'))
+        name = recipe.image.name
+
+        self.client.post(
+            reverse('recipe:recipe-upload-image', args=[recipe.id]),
+            {'image': image_file('white')}, format='multipart')
+        images.process_pending()
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image.name, name)
+        self.assertTrue(self.stored(name))
+        self.assertEqual(ImageBlob.objects.get().references, 1)
+
+    @override_settings(RECIPE_IMAGE_STORAGE='uuid')
+    def test_uuid_images_deleted_with_recipe(self):
+        """Test unshared images are removed with their recipe"""
+        recipe = self.recipe_with_image(image_file())
+        name = recipe.image.name
+
+        self.delete(recipe)
+
+        self.assertFalse(ImageBlob.objects.exists())
+        self.assertFalse(self.stored(name))
@@ -0,0 +1,215 @@
+import io
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageStatus, Recipe
+from recipe import images
+
+
+def image_file(name='photo.jpg', fmt='JPEG', size=(800, 600), **options):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, fmt, **options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class ImagePipelineTest(TestCase):
+    """Test the off-request recipe image pipeline"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='images@test.com',
+            password='imagespass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(user=self.user, title='pictured',
+                                            time_minutes=5, price=5)
+        self.url = reverse('recipe:recipe-upload-image',
+                           args=[self.recipe.id])
+
+    def upload(self, file):
+        return self.client.post(self.url, {'image': file},
+                                format='multipart')
+
+    def stored(self, name):
+        return self.recipe.image.storage.exists(name)
+
+    def test_upload_is_queued(self):
+        """Test the upload returns before any processing happens"""
+        res = self.upload(image_file())
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['image_status'], ImageStatus.PENDING)
+        self.assertIsNone(res.data['image'])
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+        self.assertTrue(self.recipe.image_upload)
+
+    def test_process_image(self):
+        """Test processing re-encodes, strips metadata and resizes"""
+        exif = Image.Exif()
+        exif[0x010F] = 'camera maker'
+        self.upload(image_file(exif=exif.tobytes()))
+        upload = Recipe.objects.get(pk=self.recipe.pk).image_upload.name
+
+        self.assertEqual(images.process_pending(), 1)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.READY)
+        self.assertFalse(self.recipe.image_upload)
+        self.assertFalse(self.stored(upload))
+        with self.recipe.image.open('rb') as f:
+            self.assertFalse(Image.open(f).getexif())
+        for size, name in images.thumbnail_names(
+                self.recipe.image.name).items():
+            with self.recipe.image.storage.open(name) as f:
+                self.assertEqual(max(Image.open(f).size), size)
+
+    def test_detail_lists_thumbnails(self):
+        """Test the recipe detail links each processed thumbnail"""
+        self.upload(image_file())
+        images.process_pending()
+
+        res = self.client.get(
+            reverse('recipe:recipe-detail', args=[self.recipe.id]))
+
+        self.assertEqual(res.data['image_status'], ImageStatus.READY)
+        self.assertEqual(set(res.data['thumbnails']), {'128', '512'})
+
+    def test_replace_image(self):
+        """Test a new image removes the previous image and thumbnails"""
+        self.upload(image_file())
+        images.process_pending()
+        self.recipe.refresh_from_db()
+        previous = self.recipe.image.name
+
+        self.upload(image_file(fmt='PNG', name='photo.png'))
+        images.process_pending()
+
+        self.recipe.refresh_from_db()
+        self.assertNotEqual(self.recipe.image.name, previous)
+        self.assertFalse(self.stored(previous))
+        for name in images.thumbnail_names(previous).values():
+            self.assertFalse(self.stored(name))
+
+    def test_upload_replaced_while_processing(self):
+        """Test a result superseded by a newer upload is discarded"""
+        self.upload(image_file())
+        encode = images.encode
+        newer = []
+
+        def encode_during_upload(img):
+            if not newer:
+                self.upload(image_file(name='newer.jpg'))
+                newer.append(Recipe.objects.get(pk=self.recipe.pk)
+                             .image_upload.name)
+            return encode(img)
+
+        with patch('recipe.images.encode', encode_during_upload):
+            images.process(images.claim())
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_upload.name, newer[0])
+        self.assertEqual(self.recipe.image_status, ImageStatus.PENDING)
+        self.assertFalse(self.recipe.image)
+
+    def test_corrupt_image_fails(self):
+        """Test an image that cannot be decoded is marked as failed"""
+        data = image_file().read()
+        self.upload(SimpleUploadedFile('broken.jpg', data[:-200]))
+
+        images.process_pending()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.FAILED)
+        self.assertFalse(self.recipe.image)
+        self.assertFalse(self.recipe.image_upload)
+
+    def test_not_an_image_rejected(self):
+        """Test files without an image header are rejected immediately"""
+        res = self.upload(SimpleUploadedFile('notes.jpg', b'not an image'))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.get(pk=self.recipe.pk).image_upload)
+
+    def test_unexpected_error_fails(self):
+        """Test an error storing the image is logged and marks it failed"""
+        self.upload(image_file())
+
+        with patch('recipe.images.store', side_effect=OSError('disk')), \
+                self.assertLogs('recipe.images', 'ERROR'):
+            images.process_pending()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.FAILED)
+        self.assertTrue(self.recipe.image_upload)
+
+    def test_status_changes_etag(self):
+        """Test claiming and failing an upload produce new ETags"""
+        url = reverse('recipe:recipe-detail', args=[self.recipe.id])
+        self.upload(image_file())
+        etags = [self.client.get(url)['ETag']]
+
+        images.claim(self.recipe.pk)
+        etags.append(self.client.get(url)['ETag'])
+        with patch('recipe.images.store', side_effect=OSError('disk')), \
+                self.assertLogs('recipe.images', 'ERROR'):
+            images.process_claimed(self.recipe.pk)
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etags[-1])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], ImageStatus.FAILED)
+        self.assertEqual(len(set(etags + [res['ETag']])), 3)
+
+    @patch('recipe.images.connection')
+    def test_thread_errors_logged(self, connection):
+        """Test errors in the thread pool are logged, not swallowed"""
+        with patch('recipe.images.claim', side_effect=OSError('db')), \
+                self.assertLogs('recipe.images', 'ERROR'):
+            images._process_in_thread(self.recipe.pk)
+
+        connection.close.assert_called_once_with()
+
+    def test_stale_processing_reclaimed(self):
+        """Test uploads left processing by a dead worker are retried"""
+        self.upload(image_file())
+        self.assertEqual(images.claim(), self.recipe.pk)
+        self.assertIsNone(images.claim())
+
+        with self.settings(RECIPE_IMAGE_PROCESSING_TIMEOUT=0):
+            self.assertEqual(images.process_pending(), 1)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.READY)
+
+    @patch('recipe.images._executor', None)
+    @patch('recipe.images.ThreadPoolExecutor')
+    def test_resume_processes_pending(self, executor_class):
+        """Test starting the thread pool queues the pending uploads"""
+        with self.settings(RECIPE_IMAGE_PROCESSING='thread'):
+            images.resume()
+            images.dispatch(self.recipe.pk)
+
+        executor = executor_class.return_value
+        self.assertEqual(executor_class.call_count, 1)
+        self.assertEqual(
+            [call[0] for call in executor.submit.call_args_list],
+            [(images._process_in_thread,),
+             (images._process_in_thread, self.recipe.pk)])
+
+    @patch('recipe.images.run_worker', return_value=2)
+    def test_process_images_command(self, run_worker):
+        """Test the command starts the requested worker threads"""
+        call_command('process_images', '--workers', '3', '--once',
+                     stdout=io.StringIO())
+
+        self.assertEqual(run_worker.call_count, 3)
+        self.assertTrue(run_worker.call_args[0][0])
@@ -0,0 +1,155 @@
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from recipe import counters
+
+
+class ImportRecipesCommandTest(TestCase):
+    """Test bulk loading recipes with the import_recipes command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='import@test.com',
+            password='importpass'
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+
+    def write(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def run_import(self, path, *args):
+        out = io.StringIO()
+        call_command('import_recipes', path, '--user', self.user.email,
+                     *args, stdout=out)
+        return out.getvalue()
+
+    def assert_counts_exact(self):
+        for model in (Tag, Ingredient):
+            self.assertEqual(counters.recount(model), 0)
+
+    def test_import_jsonl(self):
+        """Test recipes are loaded with tags and ingredients by name"""
+        rows = [
+            {'title': f'soup {i}', 'time_minutes': i, 'price': '4.50',
+             'tags': ['Vegan', 'Quick'], 'ingredients': ['Kale', 'Salt']}
+            for i in range(5)
+        ]
+        path = self.write('.jsonl', '\n'.join(json.dumps(r) for r in rows))
+
+        out = self.run_import(path, '--batch-size', '2')
+
+        self.assertIn('Imported 5 recipes', out)
+        self.assertIn('rows/s', out)
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 5)
+        self.assertEqual(Tag.objects.filter(name='Vegan').count(), 1)
+        self.assertEqual(set(Tag.objects.values_list('name', 'recipe_count')),
+                         {('Vegan', 5), ('Quick', 5)})
+        recipe = recipes.get(title='soup 3')
+        self.assertEqual(recipe.time_minutes, 3)
+        self.assertEqual(str(recipe.price), '4.50')
+        self.assertEqual(recipe.image_status, '')
+        self.assertIsNone(recipe.image_claimed_at)
+        self.assertEqual(
+            sorted(recipe.ingredients.values_list('name', flat=True)),
+            ['Kale', 'Salt'])
+        self.assert_counts_exact()
+
+    def test_import_csv(self):
+        """Test CSV rows name tags and ingredients separated by bars"""
+        path = self.write('.csv', (
+            'title,time_minutes,price,link,tags,ingredients\n'
+            'Stew,40,9.99,,Vegan|Dinner,"Beans, dried|Onion"\n'
+            'Salad,5,3,https://example.com,,Onion\n'
+        ))
+
+        self.run_import(path)
+
+        stew = Recipe.objects.get(title='Stew')
+        self.assertEqual(
+            sorted(stew.ingredients.values_list('name', flat=True)),
+            ['Beans, dried', 'Onion'])
+        self.assertEqual(stew.tags.count(), 2)
+        self.assertFalse(Recipe.objects.get(title='Salad').tags.exists())
+        self.assert_counts_exact()
+
+    def test_import_export(self):
+        """Test the output of the recipe export can be imported again"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        recipe = Recipe.objects.create(user=self.user, title='exported',
+                                       time_minutes=5, price=5)
+        recipe.tags.add(self.tag)
+        res = client.get(reverse('recipe:recipe-export'))
+        path = self.write('.jsonl',
+                          b''.join(res.streaming_content).decode())
+
+        self.run_import(path)
+
+        copy = Recipe.objects.exclude(pk=recipe.pk).get()
+        self.assertEqual(list(copy.tags.all()), [self.tag])
+        self.assertEqual(Tag.objects.get().recipe_count, 2)
+
+    def test_imported_recipes_searchable(self):
+        """Test the search documents of imported recipes are built"""
+        path = self.write('.jsonl', json.dumps({
+            'title': 'Pumpkin pie', 'time_minutes': 60, 'price': 7,
+            'tags': ['Dessert'],
+        }))
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        self.run_import(path)
+        res = client.get(reverse('recipe:recipe-list'),
+                         {'search': 'dessert'})
+
+        self.assertEqual([r['title'] for r in res.data['results']],
+                         ['Pumpkin pie'])
+
+    def test_invalid_row(self):
+        """Test a bad row stops the import and names its line"""
+        path = self.write('.jsonl', '\n'.join([
+            json.dumps({'title': 'fine', 'time_minutes': 1, 'price': 1}),
+            json.dumps({'title': 'broken', 'time_minutes': 1,
+                        'price': 'free'}),
+        ]))
+
+        with self.assertRaisesMessage(CommandError, 'line 2: price'):
+            self.run_import(path)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_failed_import_changes_data_version(self):
+        """Test batches loaded before a bad row bump the data version"""
+        path = self.write('.jsonl', '\n'.join([
+            json.dumps({'title': 'fine', 'time_minutes': 1, 'price': 1}),
+            json.dumps({'title': 'broken', 'time_minutes': 1,
+                        'price': 'free'}),
+        ]))
+        self.user.refresh_from_db()
+        version = self.user.data_version
+
+        with self.assertRaises(CommandError):
+            self.run_import(path, '--batch-size', '1')
+
+        self.user.refresh_from_db()
+        self.assertEqual(Recipe.objects.count(), 1)
+        self.assertGreater(self.user.data_version, version)
+
+    def test_unknown_user(self):
+        """Test importing for a missing user fails"""
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', 'recipes.jsonl',
+                         '--user', 'nobody@test.com')
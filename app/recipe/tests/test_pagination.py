@@ -0,0 +1,126 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe.pagination import KeysetPagination
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class KeysetPaginationTest(TestCase):
+    """Test cursor pagination of the recipe api lists"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='pager@test.com',
+            password='pagerpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_recipes(self, count):
+        return [
+            Recipe.objects.create(user=self.user, title=f'recipe {i}',
+                                  time_minutes=i, price=1)
+            for i in range(count)
+        ]
+
+    def walk(self, url, params):
+        """Follow `next` links and return the ids of every page"""
+        pages = []
+        res = self.client.get(url, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append([item['id'] for item in res.data['results']])
+            if not res.data['next']:
+                return pages
+            res = self.client.get(res.data['next'])
+
+    def test_recipes_paginated_by_descending_id(self):
+        """Test recipe pages follow each other without gaps or repeats"""
+        recipes = self.create_recipes(7)
+
+        pages = self.walk(RECIPES_URL, {'page_size': 3})
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        ids = [pk for page in pages for pk in page]
+        self.assertEqual(ids, sorted((r.id for r in recipes), reverse=True))
+
+    def test_previous_link(self):
+        """Test the previous link returns the page before"""
+        self.create_recipes(5)
+        first = self.client.get(RECIPES_URL, {'page_size': 2})
+        second = self.client.get(first.data['next'])
+
+        res = self.client.get(second.data['previous'])
+
+        self.assertIsNone(first.data['previous'])
+        self.assertEqual(res.data['results'], first.data['results'])
+
+    def test_tags_with_equal_names_paginated(self):
+        """Test the id tie-breaker keeps tags with equal names distinct"""
+        tags = [Tag.objects.create(user=self.user, name=name)
+                for name in ('b', 'a', 'b', 'c', 'b', 'a')]
+
+        pages = self.walk(TAGS_URL, {'page_size': 2})
+
+        ids = [pk for page in pages for pk in page]
+        expected = sorted(tags, key=lambda t: t.id)
+        expected = sorted(expected, key=lambda t: t.name, reverse=True)
+        self.assertEqual(ids, [tag.id for tag in expected])
+
+    def test_count_only_when_requested(self):
+        """Test that the total is only computed on request"""
+        self.create_recipes(3)
+
+        res = self.client.get(RECIPES_URL)
+        exact = self.client.get(RECIPES_URL, {'count': 'exact'})
+
+        self.assertNotIn('count', res.data)
+        self.assertEqual(exact.data['count'], 3)
+        self.assertFalse(exact.data['count_estimated'])
+
+    def test_estimated_count_capped(self):
+        """Test the estimate stops counting past the limit"""
+        self.create_recipes(4)
+        limit = KeysetPagination.count_limit
+        KeysetPagination.count_limit = 2
+        try:
+            res = self.client.get(RECIPES_URL, {'count': 'estimate'})
+        finally:
+            KeysetPagination.count_limit = limit
+
+        self.assertGreaterEqual(res.data['count'], 2)
+        self.assertTrue(res.data['count_estimated'])
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor is rejected"""
+        res = self.client.get(RECIPES_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_values_checked(self):
+        """Test a cursor with values of the wrong type is rejected"""
+        cases = [
+            (RECIPES_URL, {}, ['abc']),
+            (RECIPES_URL, {}, [{'x': 1}]),
+            (RECIPES_URL, {}, [None]),
+            (RECIPES_URL, {'search': 'zz'}, ['zz', 1]),
+            (TAGS_URL, {}, ['name', 'abc']),
+            (INGREDIENTS_URL, {}, ['name', [1]]),
+        ]
+        for url, params, values in cases:
+            cursor = base64.urlsafe_b64encode(
+                json.dumps({'v': values, 'r': 0}).encode()).decode()
+            res = self.client.get(url, {**params, 'cursor': cursor})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND,
+                             (url, values))
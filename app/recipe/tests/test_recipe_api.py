@@ -1,7 +1,10 @@
 from core.models import Recipe, Ingredient, Tag
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from recipe import images
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -80,8 +83,8 @@ class PrivateRecipeApiTest(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 2)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_limited_user_recipes(self):
         """Test recipes are limited to authenticated user"""
@@ -98,8 +101,8 @@ class PrivateRecipeApiTest(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_view_recipe_detail(self):
         """Test viewing a recipe details"""
@@ -237,8 +240,9 @@ class RecipeImageUploadTest(TestCase):
             img.save(ntf, format='JPEG')
             ntf.seek(0)
             res = self.client.post(url, {'image': ntf}, format='multipart')
+        images.process_pending()
         self.recipe.refresh_from_db()
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
         self.assertIn('image', res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
@@ -266,10 +270,10 @@ class RecipeImageUploadTest(TestCase):
         serializer2 = RecipeSerializer(rec2)
         serializer3 = RecipeSerializer(rec3)
 
-        self.assertEqual(len(res.data), 2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_filter_recipe_by_ingredients(self):
         """Test return recipe filtered by ingredient"""
@@ -290,7 +294,129 @@ class RecipeImageUploadTest(TestCase):
         serializer2 = RecipeSerializer(rec2)
         serializer3 = RecipeSerializer(rec3)
 
-        self.assertEqual(len(res.data), 2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
+
+    def test_filter_recipes_by_tags_unique(self):
+        """Test a recipe matching several tags is returned once"""
+        recipe = sample_recipe(user=self.user)
+        tag1 = sample_tag(user=self.user, name='one')
+        tag2 = sample_tag(user=self.user, name='two')
+        recipe.tags.add(tag1, tag2)
+
+        res = self.client.get(RECIPES_URL, {'tags': f'{tag1.id},{tag2.id}'})
+
+        self.assertEqual([item['id'] for item in res.data['results']],
+                         [recipe.id])
+
+    def test_filter_recipes_by_all_tags(self):
+        """Test tags_mode=all only returns recipes having every tag"""
+        both = sample_recipe(user=self.user, title='both')
+        one = sample_recipe(user=self.user, title='one')
+        tag1 = sample_tag(user=self.user, name='one')
+        tag2 = sample_tag(user=self.user, name='two')
+        both.tags.add(tag1, tag2)
+        one.tags.add(tag1)
+
+        res = self.client.get(RECIPES_URL, {
+            'tags': f'{tag1.id},{tag2.id},{tag2.id}',
+            'tags_mode': 'all',
+        })
+
+        self.assertEqual([item['id'] for item in res.data['results']],
+                         [both.id])
+
+    def test_filter_recipes_by_all_ingredients_and_tags(self):
+        """Test tag and ingredient filters combine with their modes"""
+        match = sample_recipe(user=self.user, title='match')
+        other = sample_recipe(user=self.user, title='other')
+        tag = sample_tag(user=self.user)
+        ing1 = sample_ingredient(user=self.user, name='salt')
+        ing2 = sample_ingredient(user=self.user, name='pepper')
+        match.tags.add(tag)
+        match.ingredients.add(ing1, ing2)
+        other.ingredients.add(ing1, ing2)
+
+        res = self.client.get(RECIPES_URL, {
+            'tags': f'{tag.id}',
+            'ingredients': f'{ing1.id},{ing2.id}',
+            'ingredients_mode': 'all',
+        })
+
+        self.assertEqual([item['id'] for item in res.data['results']],
+                         [match.id])
+
+    def test_filter_recipes_invalid_mode(self):
+        """Test an unknown filter mode is rejected"""
+        res = self.client.get(RECIPES_URL, {'tags': '1', 'tags_mode': 'x'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_recipes_invalid_ids(self):
+        """Test ids that are not integers are rejected"""
+        for params in ({'tags': 'abc'}, {'tags': '1,,2'},
+                       {'ingredients': '1.5'}):
+            with self.subTest(params=params):
+                res = self.client.get(RECIPES_URL, params)
+
+                self.assertEqual(res.status_code,
+                                 status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeRelationValidationTest(TestCase):
+    """Test validation of the tags and ingredients of a recipe"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='relations@test.com',
+            password='relationspass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_ids_resolved_in_one_query(self):
+        """Test that all submitted ids are fetched together"""
+        tags = [sample_tag(self.user, name=f'tag {i}') for i in range(10)]
+        payload = {
+            'title': 'many tags',
+            'time_minutes': 5,
+            'price': '5.00',
+            'tags': [tag.id for tag in tags],
+            'ingredients': [],
+        }
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        lookups = [q for q in ctx.captured_queries
+                   if '"core_tag"."user_id" = ' in q['sql']]
+        self.assertEqual(len(lookups), 1)
+        self.assertEqual(Recipe.objects.get(id=res.data['id']).tags.count(),
+                         10)
+
+    def test_foreign_and_missing_ids_reported(self):
+        """Test other users' and unknown ids are all rejected at once"""
+        other = get_user_model().objects.create_user(
+            email='foreign@test.com',
+            password='relationspass'
+        )
+        own = sample_ingredient(self.user)
+        foreign = sample_ingredient(other)
+        payload = {
+            'title': 'stolen ingredient',
+            'time_minutes': 5,
+            'price': '5.00',
+            'ingredients': [own.id, foreign.id, 9999],
+            'tags': [],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        message = str(res.data['ingredients'][0])
+        self.assertIn(str(foreign.id), message)
+        self.assertIn('9999', message)
+        self.assertFalse(Recipe.objects.exists())
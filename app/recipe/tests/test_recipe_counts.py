@@ -0,0 +1,134 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+TAGS_URL = reverse('recipe:tag-list')
+RECIPES_URL = reverse('recipe:recipe-list')
+RECIPES_BULK_URL = reverse('recipe:recipe-bulk')
+
+
+class RecipeCountTest(TestCase):
+    """Test the maintained recipe counts of tags and ingredients"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='counts@test.com',
+            password='countspass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='tag')
+        self.other_tag = Tag.objects.create(user=self.user, name='other')
+        self.ingredient = Ingredient.objects.create(user=self.user,
+                                                    name='ingredient')
+
+    def sample_recipe(self):
+        return Recipe.objects.create(user=self.user, title='counted',
+                                     time_minutes=5, price=5)
+
+    def assertCount(self, obj, count):
+        obj.refresh_from_db()
+        self.assertEqual(obj.recipe_count, count)
+
+    def test_links_update_counts(self):
+        """Test adding, removing and clearing links keeps counts exact"""
+        recipe = self.sample_recipe()
+        recipe.tags.add(self.tag, self.other_tag)
+        recipe.tags.add(self.tag)
+        recipe.ingredients.add(self.ingredient)
+        self.assertCount(self.tag, 1)
+        self.assertCount(self.ingredient, 1)
+
+        recipe.tags.remove(self.tag, self.tag)
+        recipe.tags.remove(self.tag)
+        self.assertCount(self.tag, 0)
+        self.assertCount(self.other_tag, 1)
+
+        recipe.tags.clear()
+        self.assertCount(self.other_tag, 0)
+
+    def test_reverse_links_update_counts(self):
+        """Test links changed from the tag side keep counts exact"""
+        recipes = [self.sample_recipe() for _ in range(3)]
+        self.tag.recipe_set.add(*recipes)
+        self.assertCount(self.tag, 3)
+
+        self.tag.recipe_set.remove(recipes[0])
+        self.assertCount(self.tag, 2)
+
+        self.tag.recipe_set.clear()
+        self.assertCount(self.tag, 0)
+
+    def test_recipe_delete_updates_counts(self):
+        """Test deleting a recipe releases its tags and ingredients"""
+        recipe = self.sample_recipe()
+        recipe.tags.add(self.tag)
+        recipe.ingredients.add(self.ingredient)
+
+        self.client.delete(reverse('recipe:recipe-detail', args=[recipe.id]))
+
+        self.assertCount(self.tag, 0)
+        self.assertCount(self.ingredient, 0)
+
+    def test_api_writes_update_counts(self):
+        """Test recipe create, update and bulk writes maintain counts"""
+        res = self.client.post(RECIPES_URL, {
+            'title': 'api', 'time_minutes': 1, 'price': '1.00',
+            'tags': [self.tag.id], 'ingredients': [self.ingredient.id],
+        })
+        self.client.patch(
+            reverse('recipe:recipe-detail', args=[res.data['id']]),
+            {'tags': [self.other_tag.id]})
+        self.client.post(RECIPES_BULK_URL, [{
+            'title': f'bulk {i}', 'time_minutes': 1, 'price': '1.00',
+            'tags': [self.tag.id], 'ingredients': [],
+        } for i in range(2)], format='json')
+
+        self.assertCount(self.tag, 2)
+        self.assertCount(self.other_tag, 1)
+        self.assertCount(self.ingredient, 1)
+
+    def test_save_keeps_count(self):
+        """Test saving a stale instance does not reset its count"""
+        self.sample_recipe().tags.add(self.tag)
+        self.tag.name = 'renamed'
+        self.tag.save()
+
+        self.assertCount(self.tag, 1)
+        self.assertEqual(self.tag.name, 'renamed')
+
+    def test_order_by_recipe_count(self):
+        """Test tags can be listed most used first"""
+        Tag.objects.create(user=self.user, name='unused')
+        recipes = [self.sample_recipe() for _ in range(2)]
+        self.other_tag.recipe_set.add(*recipes)
+        self.tag.recipe_set.add(recipes[0])
+
+        res = self.client.get(TAGS_URL, {'ordering': '-recipe_count'})
+
+        self.assertEqual([item['name'] for item in res.data['results']],
+                         ['other', 'tag', 'unused'])
+
+    def test_invalid_ordering(self):
+        """Test an unknown ordering is rejected"""
+        res = self.client.get(TAGS_URL, {'ordering': 'user'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_repair_command(self):
+        """Test the repair command fixes drifted counts"""
+        self.sample_recipe().tags.add(self.tag)
+        Tag.objects.filter(pk=self.tag.pk).update(recipe_count=7)
+        Tag.objects.filter(pk=self.other_tag.pk).update(recipe_count=2)
+
+        call_command('repair_recipe_counts', stdout=StringIO())
+
+        self.assertCount(self.tag, 1)
+        self.assertCount(self.other_tag, 0)
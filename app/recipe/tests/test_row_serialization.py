@@ -0,0 +1,125 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.models import ImageStatus, Ingredient, Recipe, Tag
+from recipe import rows, serializers
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class RowSerializationTest(TestCase):
+    """Test responses built from rows match the serializers byte for byte"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='rows@test.com',
+            password='rowspass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        tags = [Tag.objects.create(user=self.user, name=name)
+                for name in ('Vegan', 'Dessert', 'Quick')]
+        ingredients = [Ingredient.objects.create(user=self.user, name=name)
+                       for name in ('Kale', 'Salt "fine"', 'Crème')]
+        self.recipes = [
+            Recipe.objects.create(user=self.user, title='plain',
+                                  time_minutes=5, price=5),
+            Recipe.objects.create(user=self.user, title='Ünïcode',
+                                  time_minutes=0, price=Decimal('0.50'),
+                                  link='https://example.com/a?b=c'),
+            Recipe.objects.create(user=self.user, title='pictured',
+                                  time_minutes=90, price=Decimal('999.99'),
+                                  image='uploads/recipe/pictured.jpg',
+                                  image_status=ImageStatus.READY),
+            Recipe.objects.create(user=self.user, title='pending',
+                                  time_minutes=1, price=Decimal('12.3'),
+                                  image='uploads/recipe/pending.jpg',
+                                  image_status=ImageStatus.PENDING),
+        ]
+        self.recipes[0].tags.set(tags)
+        self.recipes[0].ingredients.set(ingredients[:2])
+        self.recipes[1].tags.set(tags[1:])
+        self.recipes[2].ingredients.set(ingredients[2:])
+
+    def assertSameContent(self, url, params=None):
+        """Assert both paths answer `url` with identical bytes"""
+        res = self.client.get(url, params)
+        with override_settings(RECIPE_ROW_SERIALIZATION=False):
+            expected = self.client.get(url, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, expected.content)
+
+    def test_list(self):
+        """Test every field of recipe lists"""
+        self.assertSameContent(RECIPES_URL)
+        self.assertSameContent(RECIPES_URL, {'page_size': 2})
+
+    def test_list_fieldsets(self):
+        """Test sparse and expanded recipe lists"""
+        for params in ({'expand': 'tags,ingredients'},
+                       {'fields': 'price,tags,image'},
+                       {'fields': 'id,ingredients', 'expand': 'ingredients'}):
+            with self.subTest(params=params):
+                self.assertSameContent(RECIPES_URL, params)
+
+    def test_list_filtered(self):
+        """Test filtered and searched recipe lists"""
+        tag = Tag.objects.get(name='Dessert')
+        for params in ({'tags': tag.id, 'expand': 'tags'},
+                       {'search': 'pictured'}):
+            with self.subTest(params=params):
+                self.assertSameContent(RECIPES_URL, params)
+
+    def test_detail(self):
+        """Test recipe details, with and without images"""
+        for recipe in self.recipes:
+            with self.subTest(recipe=recipe.title):
+                self.assertSameContent(detail_url(recipe.id))
+        self.assertSameContent(detail_url(self.recipes[2].id),
+                               {'fields': 'title,thumbnails'})
+
+    def test_detail_not_found(self):
+        """Test other users' recipes are not found"""
+        other = get_user_model().objects.create_user(
+            email='other@test.com',
+            password='otherpass'
+        )
+        recipe = Recipe.objects.create(user=other, title='hidden',
+                                       time_minutes=1, price=1)
+
+        res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_represent(self):
+        """Test rows render like serialized instances without a request"""
+        queryset = Recipe.objects.order_by('id')
+        for serializer_class in (serializers.RecipeSerializer,
+                                 serializers.RecipeDetailSerializer):
+            with self.subTest(serializer=serializer_class.__name__):
+                row_serializer = rows.RowSerializer(serializer_class())
+                data = row_serializer.represent(
+                    list(row_serializer.values(queryset)))
+                expected = serializer_class(queryset, many=True).data
+
+                self.assertEqual(JSONRenderer().render(data),
+                                 JSONRenderer().render(expected))
+
+    def test_unsupported_field(self):
+        """Test fields without a row representation are refused"""
+        request = APIRequestFactory().get('/')
+
+        with self.assertRaises(TypeError):
+            rows.RowSerializer(serializers.ImageUploadSerializer(
+                context={'request': request}))
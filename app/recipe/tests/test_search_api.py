@@ -0,0 +1,109 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.search import search_recipes
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class RecipeSearchApiTest(TestCase):
+    """Test full-text search over recipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='search@test.com',
+            password='searchpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sample_recipe(self, title, user=None):
+        return Recipe.objects.create(user=user or self.user, title=title,
+                                     time_minutes=10, price=5)
+
+    def search(self, terms, **params):
+        res = self.client.get(RECIPES_URL, {'search': terms, **params})
+        return [item['id'] for item in res.data['results']]
+
+    def test_search_title_tags_and_ingredients(self):
+        """Test that titles, tag and ingredient names are searched"""
+        by_title = self.sample_recipe('Lemon cake')
+        by_tag = self.sample_recipe('Pie')
+        by_tag.tags.add(Tag.objects.create(user=self.user, name='lemon'))
+        by_ingredient = self.sample_recipe('Tart')
+        by_ingredient.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Lemons'))
+        self.sample_recipe('Chocolate cake')
+
+        ids = self.search('lemon')
+
+        self.assertEqual(set(ids),
+                         {by_title.id, by_tag.id, by_ingredient.id})
+
+    def test_search_limited_to_user(self):
+        """Test that other users' recipes are not searched"""
+        other = get_user_model().objects.create_user(
+            email='other-search@test.com',
+            password='searchpass'
+        )
+        self.sample_recipe('Banana bread', user=other)
+
+        self.assertEqual(self.search('banana'), [])
+
+    def test_title_matches_ranked_first(self):
+        """Test that a title match outranks a tag match"""
+        by_tag = self.sample_recipe('Stew')
+        by_tag.tags.add(Tag.objects.create(user=self.user, name='spicy'))
+        by_title = self.sample_recipe('Spicy noodles')
+
+        self.assertEqual(self.search('spicy'), [by_title.id, by_tag.id])
+
+    def test_search_follows_renames_and_unlinks(self):
+        """Test the search document follows relation changes"""
+        recipe = self.sample_recipe('Soup')
+        tag = Tag.objects.create(user=self.user, name='winter')
+        recipe.tags.add(tag)
+        tag.name = 'summer'
+        tag.save()
+
+        self.assertEqual(self.search('summer'), [recipe.id])
+        self.assertEqual(self.search('winter'), [])
+        recipe.tags.remove(tag)
+        self.assertEqual(self.search('summer'), [])
+
+    def test_search_results_paginated(self):
+        """Test paging through ranked results returns every match once"""
+        for i in range(5):
+            recipe = self.sample_recipe(f'Curry {i}')
+            if i % 2:
+                recipe.title = f'Curry curry {i}'
+                recipe.save()
+        ids = []
+        res = self.client.get(RECIPES_URL, {'search': 'curry',
+                                            'page_size': 2})
+        while True:
+            ids += [item['id'] for item in res.data['results']]
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(len(set(ids)), 5)
+
+    @skipUnless(connection.vendor == 'postgresql', 'requires PostgreSQL')
+    def test_search_uses_gin_index(self):
+        """Test the search condition is answered by the GIN index"""
+        self.sample_recipe('Indexed')
+        queryset = search_recipes(Recipe.objects.all(), 'indexed')
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+
+        self.assertIn('core_recipe_search_idx', plan)
@@ -0,0 +1,126 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, ParseError
+
+from core.models import ImageUpload
+
+BLOCK_SIZE = 64 * 1024
+
+
+class UploadConflict(APIException):
+    """The chunk does not continue the acknowledged part of the upload"""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _('Chunk does not follow the received data.')
+    default_code = 'conflict'
+
+    def __init__(self, upload, detail=None):
+        super().__init__(detail)
+        # numbers are kept as they are to let clients resume from them
+        self.detail = {
+            'detail': self.detail,
+            'offset': upload.offset,
+            'next_chunk': next_chunk(upload),
+        }
+
+
+def next_chunk(upload):
+    """Return the number of the first chunk not yet received"""
+    return upload.offset // upload.chunk_size
+
+
+def expiry():
+    return timezone.now() - timedelta(seconds=settings.RECIPE_UPLOAD_LIFETIME)
+
+
+def purge_expired():
+    """Delete abandoned upload sessions together with their files"""
+    for upload in ImageUpload.objects.filter(created__lt=expiry()):
+        upload.delete()
+
+
+def start(recipe, file_name, size):
+    """Open an upload session for `recipe` and its empty partial file"""
+    purge_expired()
+    upload = ImageUpload.objects.create(
+        recipe=recipe,
+        file_name=file_name,
+        size=size,
+        chunk_size=settings.RECIPE_UPLOAD_CHUNK_SIZE
+    )
+    os.makedirs(settings.RECIPE_UPLOAD_TEMP_DIR, exist_ok=True)
+    open(upload.path, 'wb').close()
+    return upload
+
+
+def get(recipe, upload_id):
+    """Return a live upload session of `recipe`"""
+    upload = recipe.image_uploads.filter(pk=upload_id).first()
+    if upload is None:
+        raise NotFound()
+    if upload.created < expiry():
+        upload.delete()
+        raise NotFound()
+    return upload
+
+
+def write_chunk(upload, index, stream, length):
+    """Append chunk `index`, read from `stream` in blocks, to the upload
+
+    Chunks already acknowledged are ignored, so a client unsure whether a
+    chunk arrived can send it again. A chunk past the acknowledged offset,
+    or one with a different length than expected, is rejected.
+    """
+    start = index * upload.chunk_size
+    if start >= upload.size:
+        raise NotFound()
+    if start < upload.offset:
+        return upload
+    if start > upload.offset:
+        raise UploadConflict(upload)
+    expected = min(upload.chunk_size, upload.size - start)
+    if length != expected:
+        raise ParseError(_('Chunk %(index)d must be %(size)d bytes.') % {
+            'index': index, 'size': expected})
+
+    remaining = expected
+    with open(upload.path, 'r+b') as f:
+        f.seek(start)
+        while remaining:
+            block = stream.read(min(remaining, BLOCK_SIZE))
+            if not block:
+                break
+            f.write(block)
+            remaining -= len(block)
+    if remaining:
+        raise ParseError(_('Chunk ended before all bytes were received.'))
+
+    acknowledged = ImageUpload.objects.filter(
+        pk=upload.pk, offset=start
+    ).update(offset=start + expected)
+    if not acknowledged:
+        upload.refresh_from_db()
+        raise UploadConflict(upload)
+    upload.offset = start + expected
+    return upload
+
+
+def assembled(upload):
+    """Open the completely received file of an upload"""
+    if upload.offset < upload.size:
+        raise UploadConflict(upload, _('Upload is incomplete.'))
+    with open(upload.path, 'r+b') as f:
+        f.truncate(upload.size)
+    return open(upload.path, 'rb')
+
+
+def discard(upload):
+    """Remove the partial file of a finished or deleted upload"""
+    try:
+        os.remove(upload.path)
+    except FileNotFoundError:
+        pass
@@ -1,18 +1,45 @@
+from functools import partial
+
 from core.models import Ingredient, Recipe, Tag
-from recipe import serializers
-from rest_framework import mixins, viewsets, status
-from rest_framework.authentication import TokenAuthentication
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from django.http import StreamingHttpResponse
+from django.utils.translation import ugettext_lazy as _
+from recipe import exports, images, search, serializers, uploads
+from recipe.mixins import (BulkWriteMixin, CachedListMixin,
+                           CollectChangesMixin, ConditionalGetMixin,
+                           RowReadMixin, ServerTimingMixin)
+from recipe.pagination import KeysetPagination
+from rest_framework import mixins, renderers, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from user.authentication import TokenAuthentication
+
+UPLOAD_PATH = (r'uploads/(?P<upload_id>[0-9a-f]{8}-'
+               r'[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})')
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+class BaseRecipeAttrViewSet(ServerTimingMixin,
+                            CollectChangesMixin,
+                            ConditionalGetMixin,
+                            CachedListMixin,
+                            BulkWriteMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """Base viewset for user owned resipe attributes"""
     authentication_classes = (TokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    ordering = ('-name', 'id')
+    orderings = {
+        '-name': ordering,
+        'recipe_count': ('recipe_count', '-name', 'id'),
+        '-recipe_count': ('-recipe_count', '-name', 'id'),
+    }
 
     def get_queryset(self):
         """return objects for the current authenticated user only"""
@@ -21,8 +48,18 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
         )
         qs = self.queryset
         if assigned_only:
-            qs = qs.filter(recipe__isnull=False)
-        return qs.filter(user=self.request.user).order_by('-name').distinct()
+            qs = qs.filter(recipe_count__gt=0)
+        return qs.filter(
+            user=self.request.user
+        ).order_by(*self.get_ordering())
+
+    def get_ordering(self):
+        """Return the ordering chosen with the `ordering` parameter"""
+        ordering = self.request.query_params.get('ordering', '-name')
+        if ordering not in self.orderings:
+            raise ValidationError({'ordering': _('Must be one of %s.') %
+                                   ', '.join(self.orderings)})
+        return self.orderings[ordering]
 
     def perform_create(self, serializer):
         """Create new object"""
@@ -34,6 +71,7 @@ class TagViewSet(BaseRecipeAttrViewSet):
 
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    bulk_kinds = ('tag',)
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
@@ -41,17 +79,30 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
 
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    bulk_kinds = ('ingredient',)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ServerTimingMixin,
+                    CollectChangesMixin,
+                    ConditionalGetMixin,
+                    RowReadMixin,
+                    BulkWriteMixin,
+                    viewsets.ModelViewSet):
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
+    bulk_kinds = ('tag', 'ingredient')
     authentication_classes = (TokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    ordering = ('-id',)
 
-    def _params_to_ints(self, qs):
+    def _params_to_ints(self, qs, param):
         """convert a list of string IDs to integers list"""
-        return [int(x) for x in qs.split(',')]
+        try:
+            return [int(x) for x in qs.split(',')]
+        except ValueError:
+            raise ValidationError(
+                {param: _('Must be comma separated integer ids.')})
 
     def get_queryset(self):
         """retrive the recipes for the authenticated user"""
@@ -59,41 +110,178 @@ class RecipeViewSet(viewsets.ModelViewSet):
         ingredients = self.request.query_params.get('ingredients')
         qs = self.queryset
         if tags:
-            tag_ids = self._params_to_ints(tags)
-            qs = qs.filter(tags__id__in=tag_ids)
+            tag_ids = self._params_to_ints(tags, 'tags')
+            qs = self._filter_related(qs, 'tags', tag_ids)
         if ingredients:
-            ings_ids = self._params_to_ints(ingredients)
-            qs = qs.filter(ingredients__id__in=ings_ids)
+            ings_ids = self._params_to_ints(ingredients, 'ingredients')
+            qs = self._filter_related(qs, 'ingredients', ings_ids)
+        if self.search_terms:
+            qs = search.search_recipes(qs, self.search_terms)
+
+        serializer = self.get_serializer_class()
+        if not issubclass(serializer, serializers.SparseFieldsetMixin):
+            serializer = self.serializer_class
+        fields, expand = self.get_fieldset()
+        return serializer.select(
+            qs.filter(user=self.request.user), fields, expand
+        ).order_by(*self.get_ordering())
+
+    def get_fieldset(self):
+        """Return the `fields` and `expand` parameters of a read request
+
+        Both are comma separated field names; `fields` limits the output
+        to the named fields and `expand` nests related objects in place
+        of their ids.
+        """
+        if self.action not in ('list', 'retrieve'):
+            return None, ()
+        serializer = self.get_serializer_class()
+        fieldset = []
+        for param, allowed in (('fields', serializer.Meta.fields),
+                               ('expand', serializer.expandable)):
+            names = [name for name in self.request.query_params.get(
+                param, '').split(',') if name]
+            unknown = sorted(set(names) - set(allowed))
+            if unknown:
+                raise ValidationError({param: _('Unknown fields: %s.') %
+                                       ', '.join(unknown)})
+            fieldset.append(names)
+        fields, expand = fieldset
+        return fields or None, expand
+
+    def get_serializer_context(self):
+        """Pass the requested fieldset on to the serializer"""
+        context = super().get_serializer_context()
+        context['fields'], context['expand'] = self.get_fieldset()
+        return context
+
+    def _filter_related(self, qs, field, ids):
+        """Filter recipes linked to any or all (`<field>_mode`) of `ids`
+
+        Both modes query the through table in a subquery, so recipes are
+        never repeated and the recipe rows need no DISTINCT.
+        """
+        mode = self.request.query_params.get(f'{field}_mode', 'any')
+        if mode not in ('any', 'all'):
+            raise ValidationError(
+                {f'{field}_mode': _('Must be "any" or "all".')})
+        through = getattr(Recipe, field).through
+        related = Recipe._meta.get_field(field).m2m_reverse_field_name()
+        links = through.objects.filter(**{f'{related}__in': ids})
+        if mode == 'any':
+            return qs.filter(Exists(links.filter(recipe=OuterRef('pk'))))
+        matching = links.values('recipe').annotate(
+            matched=Count('pk')
+        ).filter(matched=len(set(ids))).values('recipe')
+        return qs.filter(pk__in=matching)
+
+    @property
+    def search_terms(self):
+        """Return the `search` query parameter of a list request"""
+        if self.action != 'list':
+            return ''
+        return self.request.query_params.get('search', '').strip()
 
-        return qs.filter(user=self.request.user)
+    def get_ordering(self):
+        """Order search results by relevance, others by recency"""
+        if self.search_terms:
+            return ('-search_rank', '-id')
+        return self.ordering
+
+    def retrieve(self, request, *args, **kwargs):
+        """Answer conditional requests for a single recipe"""
+        return self.conditional(super().retrieve, request, *args, **kwargs)
 
     def get_serializer_class(self):
         """override serializer for detail url"""
         if self.action == 'retrieve':
             return serializers.RecipeDetailSerializer
-        elif self.action == 'upload_image':
+        elif self.action in ('upload_image', 'finalize_upload'):
             return serializers.RecipeImageSerializer
+        elif self.action in ('start_upload', 'upload_status',
+                             'upload_chunk'):
+            return serializers.ImageUploadSerializer
         return self.serializer_class
 
     def perform_create(self, serializer):
         """Create a new  recipe"""
         serializer.save(user=self.request.user)
 
+    @action(methods=['GET'], detail=False, renderer_classes=[
+        exports.NDJSONRenderer, renderers.JSONRenderer])
+    def export(self, request):
+        """Stream every recipe of the user as newline delimited JSON"""
+        response = StreamingHttpResponse(
+            exports.ndjson(self.get_queryset(),
+                           self.get_serializer_context()),
+            content_type=exports.NDJSONRenderer.media_type
+        )
+        response['Content-Disposition'] = \
+            'attachment; filename="recipes.ndjson"'
+        # read from a cursor while sent, see core.asgi
+        response.uses_database = True
+        return response
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """Upload Image to recipe"""
         recipe = self.get_object()
+        return self._queue_image(recipe, request.data)
+
+    def _queue_image(self, recipe, data):
+        """Store an uploaded image and queue it for processing"""
         serializer = self.get_serializer(
             recipe,
-            data=request.data
+            data=data
         )
         if serializer.is_valid():
             serializer.save()
+            transaction.on_commit(partial(images.dispatch, recipe.pk))
             return Response(
                 serializer.data,
-                status=status.HTTP_200_OK
+                status=status.HTTP_202_ACCEPTED
             )
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+    @action(methods=['POST'], detail=True, url_path='uploads',
+            url_name='upload-start')
+    def start_upload(self, request, pk=None):
+        """Open a resumable upload of the recipe image"""
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = uploads.start(recipe, **serializer.validated_data)
+        return Response(self.get_serializer(upload).data,
+                        status=status.HTTP_201_CREATED)
+
+    @action(methods=['GET'], detail=True, url_path=UPLOAD_PATH,
+            url_name='upload')
+    def upload_status(self, request, pk=None, upload_id=None):
+        """Report how much of an upload was received"""
+        upload = uploads.get(self.get_object(), upload_id)
+        return Response(self.get_serializer(upload).data)
+
+    @action(methods=['PUT'], detail=True,
+            url_path=UPLOAD_PATH + r'/chunks/(?P<index>[0-9]+)',
+            url_name='upload-chunk')
+    def upload_chunk(self, request, pk=None, upload_id=None, index=None):
+        """Receive the raw bytes of one numbered chunk of an upload"""
+        upload = uploads.get(self.get_object(), upload_id)
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        uploads.write_chunk(upload, int(index), request.stream, length)
+        return Response(self.get_serializer(upload).data)
+
+    @action(methods=['POST'], detail=True,
+            url_path=UPLOAD_PATH + '/finalize', url_name='upload-finalize')
+    def finalize_upload(self, request, pk=None, upload_id=None):
+        """Hand a completely received upload to the image pipeline"""
+        recipe = self.get_object()
+        upload = uploads.get(recipe, upload_id)
+        with uploads.assembled(upload) as f:
+            response = self._queue_image(
+                recipe, {'image': File(f, name=upload.file_name)})
+        upload.delete()
+        return response
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# cache backends whose entries are not seen by other processes
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+@register(Tags.security)
+def check_token_cache(app_configs, **kwargs):
+    """Require a shared cache for the revocations of signed tokens"""
+    if settings.AUTH_TOKEN_MODE != 'signed':
+        return []
+    alias = settings.AUTH_TOKEN_CACHE_ALIAS
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f"AUTH_TOKEN_MODE 'signed' needs a shared cache, but the "
+        f"'{alias}' cache uses {backend}.",
+        hint='Revoked tokens would stay valid in every other process. '
+             'Point AUTH_TOKEN_CACHE_ALIAS at a cache such as memcached '
+             'or the database cache.',
+        id='user.E001',
+    )]
@@ -3,6 +3,8 @@ from django.contrib.auth import get_user_model, authenticate
 from rest_framework import serializers
 from django.utils.translation import ugettext_lazy as _
 
+from user import tokens
+
 
 class UserSerializer(serializers.ModelSerializer):
     """ Serializer for users object """
@@ -53,3 +55,25 @@ class AuthTokenSerializer(serializers.Serializer):
         attrs['user'] = user
 
         return attrs
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer to exchange a refresh token for a new token pair"""
+    refresh = serializers.CharField()
+
+    def validate(self, attrs):
+        """Validate the refresh token and its user"""
+        msg = _('Invalid or expired refresh token')
+        try:
+            payload = tokens.verify(attrs['refresh'], tokens.REFRESH)
+        except tokens.InvalidToken:
+            raise serializers.ValidationError(msg, code='authentication')
+
+        active = get_user_model().objects.filter(
+            pk=payload['u'], is_active=True
+        ).exists()
+        if not active:
+            raise serializers.ValidationError(msg, code='authentication')
+
+        attrs['payload'] = payload
+        return attrs
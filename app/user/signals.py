@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from user import tokens
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, **kwargs):
+    """Revoke the signed tokens of users changing password or deactivated
+
+    `set_password()` keeps the raw password on the instance until it is
+    saved, which tells a password change from any other update.
+    """
+    if created:
+        return
+    if instance._password is not None or not instance.is_active:
+        tokens.revoke_user(instance.pk)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_deleted(sender, instance, **kwargs):
+    """Revoke the signed tokens of deleted users"""
+    tokens.revoke_user(instance.pk)
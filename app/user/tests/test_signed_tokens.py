@@ -0,0 +1,222 @@
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from user import checks, tokens
+
+TOKEN_URL = reverse('user:token')
+REFRESH_URL = reverse('user:token-refresh')
+REVOKE_URL = reverse('user:token-revoke')
+ME_URL = reverse('user:me')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+@override_settings(AUTH_TOKEN_MODE='signed')
+class SignedTokenApiTest(TestCase):
+    """Test the signed token authentication mode"""
+
+    def setUp(self):
+        self.credentials = {'email': 'signed@test.com',
+                            'password': 'signedpass'}
+        self.user = get_user_model().objects.create_user(
+            name='signed', **self.credentials)
+        self.client = APIClient()
+
+    def obtain(self):
+        res = self.client.post(TOKEN_URL, self.credentials)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def authorize(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+    def test_obtain_token_pair(self):
+        """Test that a signed access and refresh token are issued"""
+        data = self.obtain()
+
+        self.assertIn('token', data)
+        self.assertIn('refresh', data)
+        self.assertNotEqual(data['token'], data['refresh'])
+
+    def test_authenticate_without_token_lookup(self):
+        """Test signed tokens are verified without auth queries"""
+        self.authorize(self.obtain()['token'])
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(RECIPES_URL, {
+                'title': 'signed recipe',
+                'time_minutes': 3,
+                'price': '2.00',
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('authtoken', sql)
+        self.assertNotIn('FROM "core_user"', sql)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.user, self.user)
+
+    def test_profile_with_signed_token(self):
+        """Test the profile endpoint loads the full user"""
+        self.authorize(self.obtain()['token'])
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data, {'name': 'signed',
+                                    'email': self.credentials['email']})
+
+    def test_tampered_token_rejected(self):
+        """Test a token with a broken signature is rejected"""
+        self.authorize(self.obtain()['token'] + 'x')
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_token_not_accepted_as_access(self):
+        """Test refresh tokens cannot authenticate requests"""
+        self.authorize(self.obtain()['refresh'])
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_ACCESS_TOKEN_LIFETIME=60)
+    def test_expired_token_rejected(self):
+        """Test an access token stops working after its lifetime"""
+        self.authorize(self.obtain()['token'])
+
+        with patch('django.core.signing.time.time',
+                   return_value=time.time() + 120):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoke_token(self):
+        """Test a revoked access token is rejected"""
+        self.authorize(self.obtain()['token'])
+
+        res = self.client.post(REVOKE_URL)
+        after = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(after.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_rotates_pair(self):
+        """Test a refresh token can be used exactly once"""
+        refresh = self.obtain()['refresh']
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+        again = self.client.post(REFRESH_URL, {'refresh': refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['refresh'], refresh)
+        self.assertEqual(again.status_code, status.HTTP_400_BAD_REQUEST)
+        self.authorize(res.data['token'])
+        self.assertEqual(self.client.get(RECIPES_URL).status_code,
+                         status.HTTP_200_OK)
+
+    def test_refresh_inactive_user(self):
+        """Test that deactivated users cannot refresh"""
+        refresh = self.obtain()['refresh']
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_password_change_revokes_tokens(self):
+        """Test changing the password ends every earlier session"""
+        pair = self.obtain()
+        self.authorize(pair['token'])
+
+        res = self.client.patch(ME_URL, {'password': 'changedpass'})
+        refresh = self.client.post(REFRESH_URL, {'refresh': pair['refresh']})
+        access = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(refresh.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(access.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.credentials['password'] = 'changedpass'
+        self.authorize(self.obtain()['token'])
+        self.assertEqual(self.client.get(RECIPES_URL).status_code,
+                         status.HTTP_200_OK)
+
+    def test_deactivation_revokes_access(self):
+        """Test access tokens of deactivated users are rejected"""
+        self.authorize(self.obtain()['token'])
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deletion_revokes_tokens(self):
+        """Test the tokens of a deleted user no longer verify"""
+        pair = self.obtain()
+        self.user.delete()
+
+        for token, kind in ((pair['token'], tokens.ACCESS),
+                            (pair['refresh'], tokens.REFRESH)):
+            with self.assertRaises(tokens.InvalidToken):
+                tokens.verify(token, kind)
+
+    def test_process_local_cache_rejected(self):
+        """Test signed tokens require a cache shared between workers"""
+        local = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        shared = {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                  'LOCATION': 'tokens'}
+
+        with self.settings(CACHES={'default': local}):
+            errors = checks.check_token_cache(None)
+        self.assertEqual([error.id for error in errors], ['user.E001'])
+        with self.settings(CACHES={'default': local, 'tokens': shared},
+                           AUTH_TOKEN_CACHE_ALIAS='tokens'):
+            self.assertEqual(checks.check_token_cache(None), [])
+        with self.settings(CACHES={'default': local},
+                           AUTH_TOKEN_MODE='db'):
+            self.assertEqual(checks.check_token_cache(None), [])
+
+    def test_profile_update_keeps_tokens(self):
+        """Test updates without a new password keep the session"""
+        self.authorize(self.obtain()['token'])
+
+        self.client.patch(ME_URL, {'name': 'renamed'})
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class DatabaseTokenModeTest(TestCase):
+    """Test the default database backed token mode is unchanged"""
+
+    def test_refresh_disabled(self):
+        """Test refresh is unavailable without signed tokens"""
+        res = APIClient().post(REFRESH_URL, {'refresh': 'x'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_token_authenticates(self):
+        """Test database tokens still authenticate and can be revoked"""
+        credentials = {'email': 'db@test.com', 'password': 'dbtokenpass'}
+        get_user_model().objects.create_user(**credentials)
+        client = APIClient()
+        token = client.post(TOKEN_URL, credentials).data['token']
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+        ok = client.get(RECIPES_URL)
+        client.post(REVOKE_URL)
+        revoked = client.get(RECIPES_URL)
+
+        self.assertEqual(ok.status_code, status.HTTP_200_OK)
+        self.assertEqual(revoked.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -1,5 +1,10 @@
-from rest_framework import generics, authentication, permissions
-from .serializers import UserSerializer, AuthTokenSerializer
+from rest_framework import generics, permissions, status, views
+from rest_framework.response import Response
+from .authentication import (TokenAuthentication, load_user,
+                             signed_tokens_enabled)
+from .serializers import (UserSerializer, AuthTokenSerializer,
+                          RefreshTokenSerializer)
+from . import tokens
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
@@ -13,14 +18,61 @@ class CreateTokenView(ObtainAuthToken):
     """Create Token for User"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+
+    def post(self, request, *args, **kwargs):
+        """Issue a signed token pair when signed tokens are enabled"""
+        if not signed_tokens_enabled():
+            return super().post(request, *args, **kwargs)
+        serializer = self.serializer_class(data=request.data,
+                                           context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        return Response(tokens.issue_pair(user.pk))
+
+
+class RefreshTokenView(generics.GenericAPIView):
+    """Exchange a signed refresh token for a new token pair"""
+    serializer_class = RefreshTokenSerializer
+    authentication_classes = ()
+    permission_classes = ()
+
+    def post(self, request, *args, **kwargs):
+        if not signed_tokens_enabled():
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        payload = serializer.validated_data['payload']
+        tokens.revoke(payload)
+        return Response(tokens.issue_pair(payload['u']))
+
+
+class RevokeTokenView(views.APIView):
+    """Revoke the token used to authenticate the request"""
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        if isinstance(request.auth, dict):
+            tokens.revoke(request.auth)
+            try:
+                refresh = tokens.verify(request.data.get('refresh', ''),
+                                        tokens.REFRESH)
+            except tokens.InvalidToken:
+                refresh = None
+            if refresh and refresh['u'] == request.user.pk:
+                tokens.revoke(refresh)
+        elif request.auth is not None:
+            request.auth.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         """Retrive user class"""
-        return self.request.user
+        return load_user(self.request.user)